@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# Startup and throughput benchmarks for the scan generator parameter evaluator
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+home_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0,str(home_dir))
+
+#----------------------------------------------------------
+# Benchmarks
+#----------------------------------------------------------
+def import_time(module):
+    ''' Seconds needed to import module in a fresh interpreter '''
+    start = time.perf_counter()
+    # "python -c" puts the working directory first on sys.path
+    subprocess.run([sys.executable,'-c',f'import {module}'],check=True,cwd=home_dir)
+    return time.perf_counter()-start
+
+def gen_expressions(n,unique):
+    ''' Returns n cell width expressions of which "unique" are distinct '''
+    return [f'clog2(DEPTH*{i % unique + 1})+WIDTH*{i % 7}' for i in range(n)]
+
+def eval_throughput(n,unique):
+    ''' Expressions per second with pysilicon.expr_eval '''
+    from pysilicon.expr_eval import ExprEvaluator
+    exprs = gen_expressions(n,unique)
+    start = time.perf_counter()
+    ev = ExprEvaluator({'DEPTH': 1024,'WIDTH': 'clog2(DEPTH)'})
+    for expr in exprs:
+        ev.evaluate(expr)
+    return n/(time.perf_counter()-start)
+
+def sympy_throughput(n,unique):
+    ''' Expressions per second with sympy parse_expr (previous implementation) '''
+    import math
+    from sympy.parsing.sympy_parser import parse_expr
+    exprs = gen_expressions(n,unique)
+    params = {
+        "log2": lambda x: math.ceil(math.log2(x)),
+        "clog2": lambda x: math.ceil(math.log2(x)),
+        "flog2": lambda x: math.floor(math.log2(x)),
+        "DEPTH": 1024,
+        "WIDTH": 10
+    }
+    start = time.perf_counter()
+    for expr in exprs:
+        parse_expr(expr,params)
+    return n/(time.perf_counter()-start)
+
+def run(n=20000,unique=500,sympy=True):
+    ''' Returns dict of benchmark results '''
+    results = {
+        'import_scan_generator_s': import_time('pysilicon.scan_generator'),
+        'expr_eval_per_s': eval_throughput(n,unique),
+        'expr_eval_unique_per_s': eval_throughput(n,n),
+    }
+    if sympy:
+        results['import_sympy_s'] = import_time('sympy.parsing.sympy_parser')
+        results['sympy_per_s'] = sympy_throughput(min(n,2000),min(unique,2000))
+    return results
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks scan generator parameter evaluation.")
+    parser.add_argument('-n',type=int,default=20000,help='Number of expressions evaluated.')
+    parser.add_argument('-u','--unique',type=int,default=500,help='Number of distinct expressions.')
+    parser.add_argument('--no-sympy',action='store_true',help='Skip sympy comparison.')
+    args = parser.parse_args()
+    for name,value in run(args.n,args.unique,not args.no_sympy).items():
+        print(f'{name:<28}{value:>14.3f}')
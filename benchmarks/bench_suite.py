@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# Benchmark suite for pysilicon generation and task loading paths
+# Usage:
+#   bench_suite.py --save benchmarks/baseline.json     (store baseline)
+#   bench_suite.py --compare benchmarks/baseline.json  (flag regressions)
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+
+bench_dir = Path(__file__).resolve().parent
+home_dir = Path(os.getenv('PYSILICON_HOME',bench_dir.parent))
+sys.path.insert(0,str(bench_dir.parent))
+sys.path.insert(0,str(bench_dir))
+
+#----------------------------------------------------------
+# Workloads (every function returns elapsed seconds)
+#----------------------------------------------------------
+def scan_config(cells):
+    ''' Synthetic scan chain with parameterized widths and mixed R/W cells '''
+    return {
+        'name': f'bench_chain_{cells}',
+        'parameters': {'W': 8,'D': 'clog2(W*4)'},
+        'cells': [{'name': f'c{i}','width': ('W+D' if i % 3 else i % 17 + 1),'mult': i % 4 + 1,
+            'R/W': 'RW'[i % 2]} for i in range(cells)]
+    }
+
+def bench_scan_chain(cells):
+    ''' Build and render src/defines/bypass files of a chain '''
+    from pysilicon.scan_generator import ScanGenerator
+    config = scan_config(cells)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ScanGenerator(config,bypass=True,home_dir=home_dir).render(out_dir=tmp,force=True)
+        return time.perf_counter()-start
+
+def bench_file_gen(instances):
+    ''' Render a module with many instances and deeply nested task bodies '''
+    from pysilicon.file_gen import vlog_file, vlog_mod_inst, vlog_task, Block, Statement
+    ports = [{'name': f'p{i}','io': 'input','datatype': 'wire','vec': '[7:0]'} for i in range(16)]
+    start = time.perf_counter()
+    internals = [vlog_mod_inst('sub',f'u{i}',[{'param': 'W','value': 8}],
+        [{'port': f'p{j}','signal': f'p{j}'} for j in range(16)]) for i in range(instances)]
+    body = Statement.assign('x','1')
+    for i in range(200):
+        body = Block('begin\n',[body],'end\n')
+    internals.append(vlog_task('nested',[],[{'name': 'x','datatype': 'integer','length': 1}],body))
+    vlog_file('bench',ports,[{'param': 'W','value': 8}],internals)
+    return time.perf_counter()-start
+
+def task_tree(root,yamls):
+    ''' Writes yamls sim_rtl.yml task files spread over a directory tree '''
+    for i in range(yamls):
+        d = Path(root) / 'blocks' / f'group{i % 20}' / f'block{i}'
+        d.mkdir(parents=True)
+        (d / 'sim_rtl.yml').write_text(
+            f'name: block{i}\ntestbench: block{i}_tb\ntcl_template:\n'
+            'filelist:\n  defines_src:\n  rtl_src:\n  - a.v\n  test_src:\nsim_flags:\n')
+        (d / f'block{i}.v').write_text('module m; endmodule\n')
+
+def bench_find_tasks(yamls):
+    ''' find_tasks + validate_yaml for every task file of a synthetic tree '''
+    from tests.conftest import pysilicon_stub
+    with tempfile.TemporaryDirectory() as tmp:
+        task_tree(tmp,yamls)
+        ps = pysilicon_stub(tmp,task_dirs=['blocks'])
+        start = time.perf_counter()
+        for f in ps.find_tasks(['sim_rtl.yml']):
+            ps.validate_yaml(f,ps.schemata['sim_rtl'])
+        return time.perf_counter()-start
+
+def bench_jinja_render(renders):
+    ''' Render the sim_rtl.yml template renders times '''
+    from tests.conftest import pysilicon_stub
+    with tempfile.TemporaryDirectory() as tmp:
+        ps = pysilicon_stub(tmp)
+        start = time.perf_counter()
+        for i in range(renders):
+            ps.jinja_render(home_dir / 'templates' / 'sim_rtl.yml',Path(tmp) / 'sim_rtl.yml',
+                top_module=f'block{i}',rel_home='..')
+        return time.perf_counter()-start
+
+def bench_expr_eval(n):
+    ''' Parameter expression evaluation (see bench_expr_eval.py) '''
+    from bench_expr_eval import gen_expressions
+    from pysilicon.expr_eval import ExprEvaluator
+    exprs = gen_expressions(n,n//10)
+    start = time.perf_counter()
+    ev = ExprEvaluator({'DEPTH': 1024,'WIDTH': 'clog2(DEPTH)'})
+    for expr in exprs:
+        ev.evaluate(expr)
+    return time.perf_counter()-start
+
+def workloads(quick=False):
+    ''' Returns list of (name,function,argument) '''
+    sizes = [10,100,1000,10000] + ([] if quick else [100000])
+    return ([(f'scan_chain_{n}',bench_scan_chain,n) for n in sizes] + [
+        ('file_gen_10k_inst',bench_file_gen,10000),
+        ('find_tasks_2k_yml',bench_find_tasks,2000),
+        ('jinja_render_500',bench_jinja_render,500),
+        ('expr_eval_100k',bench_expr_eval,100000),
+    ])
+
+#----------------------------------------------------------
+# Running and comparing
+#----------------------------------------------------------
+def run(quick=False,repeat=3,only=None):
+    ''' Returns dict name -> best time in seconds out of repeat runs '''
+    results = {}
+    for name,fn,arg in workloads(quick):
+        if only and not any(o in name for o in only):
+            continue
+        # Long running workloads are only run once
+        runs = 1 if name in ('scan_chain_100000','find_tasks_2k_yml') else repeat
+        results[name] = min(fn(arg) for _ in range(runs))
+        print(f'{name:<24}{results[name]:>12.4f} s',flush=True)
+    return results
+
+def compare(results,baseline,threshold):
+    ''' Prints ratio to baseline per benchmark. Returns names that regressed by more than threshold '''
+    regressed = []
+    print(f'\n{"benchmark":<24}{"baseline":>12}{"current":>12}{"ratio":>8}')
+    for name,value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f'{name:<24}{"-":>12}{value:>12.4f}{"new":>8}')
+            continue
+        ratio = value/base if base else float('inf')
+        flag = ''
+        if ratio > 1+threshold:
+            flag = '  REGRESSION'
+            regressed.append(name)
+        print(f'{name:<24}{base:>12.4f}{value:>12.4f}{ratio:>8.2f}{flag}')
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks pysilicon generation and task loading.")
+    parser.add_argument('--save',default=None,help='Store results as baseline JSON file.')
+    parser.add_argument('--compare',default=None,help='Compare results against baseline JSON file.')
+    parser.add_argument('--threshold',type=float,default=0.2,help='Allowed slowdown before flagging a regression. Default: 0.2')
+    parser.add_argument('--quick',action='store_true',help='Skip the 100k cell scan chain.')
+    parser.add_argument('--repeat',type=int,default=3,help='Runs per benchmark (best is reported). Default: 3')
+    parser.add_argument('-k',dest='only',action='append',help='Only run benchmarks containing this string.')
+    args = parser.parse_args(argv)
+    results = run(args.quick,args.repeat,args.only)
+    if args.save:
+        with open(args.save,'w') as fp:
+            json.dump({'python': platform.python_version(),'machine': platform.machine(),'results': results},fp,indent=2)
+    if args.compare:
+        with open(args.compare,'r') as fp:
+            baseline = json.load(fp)['results']
+        if compare(results,baseline,args.threshold):
+            sys.exit(1)
+
+if __name__=='__main__':
+    main()
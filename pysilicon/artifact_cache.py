@@ -0,0 +1,230 @@
+import os
+import json
+import stat
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+from pathlib import Path
+from contextlib import contextmanager
+from pysilicon.file_index import hash_file, atomic_write
+
+# NOTE Layout of the cache root (shared by every user of the scratch dir):
+# NOTE   objects/<key[:2]>/<key>/  one entry: cached files/dirs + meta.json
+# NOTE   tmp/                      entries being written (renamed into objects/ when complete)
+# NOTE   stats.json                hit/miss/put/eviction counters
+# NOTE   lock                      flock'd shared by readers/writers and exclusive by eviction
+# NOTE The mtime of meta.json is the last use of an entry and drives LRU eviction.
+# NOTE Directories are group writable and setgid and files group writable, so every
+# NOTE member of the group can read, refresh, add and evict entries of other users.
+
+#----------------------------------------------------------
+# Cache keys
+#----------------------------------------------------------
+def cache_key(files=(),stamped=(),**params):
+    '''
+    Returns hex key over everything that determines a tool run
+    :param files files whose contents are hashed (design sources, templates, ...)
+    :param stamped large read-only files (e.g. liberty/lef installs) keyed by path, size and mtime
+    :param params tool name, flags and other JSON serializable settings
+    '''
+    h = hashlib.sha1()
+    h.update(json.dumps(params,sort_keys=True,default=str).encode())
+    for f in files:
+        h.update(hash_file(f).encode())
+    for f in stamped:
+        st = os.stat(f)
+        h.update(f'{Path(f).resolve()}:{st.st_size}:{st.st_mtime_ns}'.encode())
+    return h.hexdigest()
+
+def path_size(path):
+    ''' Size of file or directory tree in bytes '''
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+    return path.stat().st_size
+
+def share(path):
+    ''' Makes path group writable (directories also setgid). Paths of other users are left alone '''
+    try:
+        mode = os.stat(path).st_mode
+        extra = stat.S_IRWXG | stat.S_ISGID if stat.S_ISDIR(mode) else stat.S_IRGRP | stat.S_IWGRP
+        if mode & extra != extra:
+            os.chmod(path,mode | extra)
+    except PermissionError:
+        pass
+
+def share_tree(path):
+    ''' share() of path and everything below it '''
+    share(path)
+    for root,dirs,files in os.walk(path):
+        for name in dirs+files:
+            share(os.path.join(root,name))
+
+def copy_path(src,dst):
+    ''' Copies file or directory tree src to dst '''
+    if Path(src).is_dir():
+        shutil.copytree(src,dst,symlinks=True)
+    else:
+        shutil.copy2(src,dst)
+
+#----------------------------------------------------------
+# Content addressed artifact cache
+#----------------------------------------------------------
+class ArtifactCache:
+    '''
+    Team-wide cache of tool outputs keyed by the hash of all inputs.
+    Entries are written to tmp/ and renamed into place, so a reader never sees a
+    partial entry and the first of two concurrent writers wins.
+    :param root cache directory (e.g. <scratch_dir>/artifact_cache)
+    :param max_size size cap in bytes (least recently used entries are evicted)
+    '''
+    def __init__(self,root,max_size=None):
+        self.root = Path(root)
+        self.max_size = max_size
+        for d in ('objects','tmp'):
+            (self.root / d).mkdir(parents=True,exist_ok=True)
+        for d in (self.root,self.root / 'objects',self.root / 'tmp'):
+            share(d)
+
+    def entry_dir(self,key):
+        return self.root / 'objects' / key[:2] / key
+
+    @contextmanager
+    def lock(self,exclusive=False):
+        ''' Shared (readers/writers) or exclusive (eviction/stats) lock of the whole cache '''
+        # flock works on read only descriptors, so a lock file of another user is fine
+        fd = os.open(self.root / 'lock',os.O_RDONLY | os.O_CREAT,0o664)
+        try:
+            share(self.root / 'lock')
+            fcntl.flock(fd,fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd,fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    #----------------------------------------------------------
+    # Get/put
+    #----------------------------------------------------------
+    def get(self,key,dest_dir):
+        ''' Copies files of entry key into dest_dir. Returns list of restored paths or None on a miss '''
+        with self.lock():
+            entry = self.entry_dir(key)
+            try:
+                with open(entry / 'meta.json','r') as fp:
+                    meta = json.load(fp)
+                restored = []
+                for name in meta['files']:
+                    copy_path(entry / name,Path(dest_dir) / name)
+                    restored.append(Path(dest_dir) / name)
+                self.touch(entry / 'meta.json')
+            except (FileNotFoundError,PermissionError,ValueError):
+                # Missing or unreadable (foreign permissions) entries are misses
+                restored = None
+        self.count('hits' if restored is not None else 'misses')
+        return restored
+
+    def put(self,key,paths,**info):
+        '''
+        Publishes files/directories paths as entry key. Returns False if the entry
+        already existed (e.g. written by a concurrent run)
+        :param info JSON serializable data stored in meta.json (task, user, ...)
+        '''
+        entry = self.entry_dir(key)
+        if entry.is_dir():
+            return False
+        tmp = self.root / 'tmp' / f'{key}.{uuid.uuid4().hex}'
+        try:
+            tmp.mkdir()
+            for p in paths:
+                copy_path(p,tmp / Path(p).name)
+            names = [Path(p).name for p in paths]
+            size = sum(path_size(tmp / name) for name in names)
+            atomic_write(tmp / 'meta.json',json.dumps(dict(info,key=key,files=names,size=size,created=time.time())))
+            entry.parent.mkdir(exist_ok=True)
+            share(entry.parent)
+            share_tree(tmp)
+            with self.lock():
+                os.rename(tmp,entry)
+        except OSError:
+            # Lost the race against another writer, no permission or disk trouble: store is skipped
+            shutil.rmtree(tmp,ignore_errors=True)
+            return False
+        self.count('puts')
+        if self.max_size is not None:
+            self.evict()
+        return True
+
+    def touch(self,meta):
+        '''
+        Marks entry of meta.json as used. Setting the current time only needs write
+        permission, so entries of other users are refreshed as well (else LRU is kept)
+        '''
+        try:
+            os.utime(meta)
+        except PermissionError:
+            pass
+
+    #----------------------------------------------------------
+    # Eviction and statistics
+    #----------------------------------------------------------
+    def entries(self):
+        ''' Returns list of (last use,size,entry dir) '''
+        entries = []
+        for meta in self.root.glob('objects/*/*/meta.json'):
+            try:
+                with open(meta,'r') as fp:
+                    size = json.load(fp)['size']
+                entries.append((meta.stat().st_mtime,size,meta.parent))
+            except (FileNotFoundError,ValueError,KeyError):
+                continue
+        return entries
+
+    def evict(self,max_size=None):
+        ''' Removes least recently used entries until the cache fits max_size. Returns number of evicted entries '''
+        max_size = self.max_size if max_size is None else max_size
+        with self.lock(exclusive=True):
+            entries = sorted(self.entries())
+            total = sum(size for _,size,_ in entries)
+            evicted = 0
+            for _,size,entry in entries:
+                if total <= max_size:
+                    break
+                shutil.rmtree(entry,ignore_errors=True)
+                total -= size
+                evicted += 1
+        if evicted:
+            self.count('evictions',evicted)
+        return evicted
+
+    def count(self,name,n=1):
+        ''' Adds n to counter name of stats.json '''
+        with self.lock(exclusive=True):
+            stats = self.stats()
+            stats[name] = stats.get(name,0)+n
+            try:
+                atomic_write(self.root / 'stats.json',json.dumps(stats))
+                share(self.root / 'stats.json')
+            except PermissionError:
+                pass
+
+    def stats(self):
+        ''' Returns dict of hit/miss/put/eviction counters '''
+        try:
+            with open(self.root / 'stats.json','r') as fp:
+                return json.load(fp)
+        except (FileNotFoundError,ValueError):
+            return {}
+
+    def summary(self):
+        ''' Returns one line report of the cache state '''
+        stats = self.stats()
+        entries = self.entries()
+        lookups = stats.get('hits',0)+stats.get('misses',0)
+        rate = f'{100*stats.get("hits",0)/lookups:.1f}%' if lookups else '-'
+        return (f'{len(entries)} entries, {sum(s for _,s,_ in entries)/2**20:.1f} MiB, '
+            f'hits {stats.get("hits",0)}, misses {stats.get("misses",0)} (hit rate {rate}), '
+            f'puts {stats.get("puts",0)}, evictions {stats.get("evictions",0)}')
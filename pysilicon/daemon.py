@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import socketserver
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from pysilicon.watch import Watcher, SimWatch
+
+# NOTE Protocol: the client sends one JSON request line {"cmd": ..., ...} and the
+# NOTE daemon answers with one JSON line {"ok": true, "result": ...} or
+# NOTE {"ok": false, "error": ...}. See pysilicon/daemon_client.py.
+
+SOCKET_NAME = '.pysilicon.sock'
+# Number of finished jobs kept for status requests (older ones are evicted)
+KEEP_JOBS = 256
+
+#----------------------------------------------------------
+# Loaded project model
+#----------------------------------------------------------
+class ProjectDaemon:
+    '''
+    Holds a loaded PySilicon project (global filelist, config and validated task
+    files) and keeps it up to date in the background. Task runs are executed in
+    process like in watch mode.
+    :param ps PySilicon instance of the project
+    :param jobs number of task runs executed in parallel
+    '''
+    def __init__(self,ps,jobs=1,watcher=None):
+        self.lock = threading.RLock()
+        self.sw = SimWatch(ps,['rtl','syn','par'],watcher=watcher or Watcher())
+        self.pool = ThreadPoolExecutor(jobs)
+        self.jobs = {}
+        self.next_id = 0
+        self.reloads = 0
+        self.reload_error = None
+        self.started = time.time()
+
+    @property
+    def ps(self):
+        return self.sw.ps
+
+    def watch(self):
+        ''' Reloads changed task files, hdl lists and global files whenever something changes (runs forever) '''
+        while True:
+            changed,woke = self.sw.watcher.wait()
+            if changed or woke:
+                with self.lock:
+                    try:
+                        self.sw.affected(changed)
+                        self.ps.syn_configs = None
+                        self.reload_error = None
+                    except (Exception,SystemExit) as err:
+                        # Keep serving the previous model (ping reports the error) until the next change
+                        self.reload_error = f'{err!r}'
+                        self.ps.logger.error(f'Reload failed: {err!r}')
+                    self.reloads += 1
+
+    #----------------------------------------------------------
+    # Requests
+    #----------------------------------------------------------
+    def handle(self,request):
+        ''' Returns result of request dict (raises KeyError/ValueError on bad requests) '''
+        cmd = request['cmd']
+        if cmd not in ('ping','tasks','filelist','run','status','reload'):
+            raise ValueError(f'Unknown command "{cmd}"')
+        with self.lock:
+            return getattr(self,'cmd_'+cmd)(**{k: v for k,v in request.items() if k != 'cmd'})
+
+    def cmd_ping(self):
+        return {'pid': os.getpid(),'wd': str(self.ps.wd),'uptime': time.time()-self.started,'reloads': self.reloads,
+            'error': self.reload_error or self.sw.project_error}
+
+    def tasks(self):
+        ''' Returns dict task name -> (action type,task file,config or None if invalid) '''
+        tasks = {}
+        for (sim_type,f),(_,config) in self.sw.configs.items():
+            name = config['name'] if config else Path(f).parent.name
+            tasks[f'sim_{sim_type}:{name}'] = ('sim_'+sim_type,f,config)
+        for name,config in self.ps.get_syn_configs().items():
+            tasks[f'syn:{name}'] = ('syn',None,config)
+        return tasks
+
+    def cmd_tasks(self,prefix=''):
+        return [{'name': name,'file': f,'valid': config is not None}
+            for name,(kind,f,config) in sorted(self.tasks().items()) if name.startswith(prefix)]
+
+    def cmd_filelist(self,test=True,task=None):
+        if task is None:
+            return [str(f) for f in self.ps.create_filelist_from_dict(self.ps.filelist,test)]
+        kind,f,config = self.tasks()[task]
+        return [str(f) for f in config['hdl_files']]
+
+    def cmd_reload(self):
+        ''' Rebuilds the project model from scratch '''
+        self.sw.affected([self.sw.globals[0]])
+        self.reloads += 1
+        return len(self.sw.configs)
+
+    def cmd_run(self,tasks):
+        ''' Submits task runs. Returns list of job ids '''
+        known = self.tasks()
+        ids = []
+        for name in tasks:
+            kind,f,config = known[name]
+            if config is None:
+                raise ValueError(f'Task file of "{name}" is invalid')
+            job = {'id': self.next_id,'task': name,'state': 'queued','passed': None,'submitted': time.time()}
+            if kind == 'syn':
+                self.pool.submit(self.run_job,job,self.ps.syn_action,config)
+            else:
+                self.pool.submit(self.run_job,job,self.ps.sim_action,kind[4:],config)
+            self.jobs[job['id']] = job
+            self.next_id += 1
+            ids.append(job['id'])
+        self.evict_jobs()
+        return ids
+
+    def evict_jobs(self,keep=KEEP_JOBS):
+        ''' Drops the oldest finished jobs so that at most keep finished jobs remain '''
+        done = [i for i,job in self.jobs.items() if job['state'] == 'done']
+        for i in done[:max(len(done)-keep,0)]:
+            del self.jobs[i]
+
+    def run_job(self,job,action,*args):
+        job['state'] = 'running'
+        try:
+            job['passed'] = action(*args) is not False
+        except Exception as err:
+            self.ps.logger.error(f'{err!r}')
+            job['passed'] = False
+        job['state'] = 'done'
+        job['finished'] = time.time()
+
+    def cmd_status(self,ids=None):
+        ids = list(self.jobs) if ids is None else ids
+        unknown = [i for i in ids if i not in self.jobs]
+        if unknown:
+            raise ValueError(f'Unknown or evicted job ids {unknown}')
+        return [dict(self.jobs[i]) for i in ids]
+
+#----------------------------------------------------------
+# Unix socket server
+#----------------------------------------------------------
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            if request.get('cmd') == 'shutdown':
+                threading.Thread(target=self.server.shutdown).start()
+                response = {'ok': True,'result': None}
+            else:
+                response = {'ok': True,'result': self.server.daemon.handle(request)}
+        except (KeyError,ValueError,TypeError) as err:
+            response = {'ok': False,'error': f'{type(err).__name__}: {err}'}
+        except SystemExit:
+            response = {'ok': False,'error': 'Invalid task file (see daemon log)'}
+        except Exception as err:
+            # Any other failure is reported to the client instead of dropping the connection
+            self.server.daemon.ps.logger.error(f'Request failed: {err!r}')
+            response = {'ok': False,'error': str(err)}
+        self.wfile.write(json.dumps(response).encode()+b'\n')
+
+class DaemonServer(socketserver.ThreadingMixIn,socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self,socket_path,daemon):
+        self.daemon = daemon
+        socket_path = Path(socket_path)
+        if socket_path.is_socket():
+            # Stale socket of a daemon that did not shut down cleanly
+            socket_path.unlink()
+        super().__init__(str(socket_path),RequestHandler)
+        self.socket_path = socket_path
+
+    def server_close(self):
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+def serve(ps,socket_path,jobs=1,watcher=None):
+    ''' Serves project of ps on socket_path until a shutdown request arrives '''
+    daemon = ProjectDaemon(ps,jobs,watcher)
+    threading.Thread(target=daemon.watch,daemon=True).start()
+    server = DaemonServer(socket_path,daemon)
+    ps.logger.info(f'pysilicon daemon listening on "{socket_path}" ({len(daemon.sw.configs)} sim tasks loaded)')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        daemon.pool.shutdown(wait=False)
+
+#----------------------------------------------------------
+# Command line
+#----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves the loaded pysilicon project of the working directory over a Unix socket.")
+    parser.add_argument('-s','--socket',default=SOCKET_NAME,help=f'Socket path. Default: {SOCKET_NAME}')
+    parser.add_argument('-j','--jobs',type=int,default=1,help='Number of task runs executed in parallel. Default: 1')
+    parser.add_argument('--poll',action='store_true',help='Poll for file changes even if inotify is available.')
+    args = parser.parse_args(argv)
+    from pysilicon.dodo_utility import PySilicon
+    try:
+        serve(PySilicon(),args.socket,args.jobs,Watcher(poll=args.poll))
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,92 @@
+import sys
+import json
+import time
+import socket
+import argparse
+
+# NOTE Only the standard library is imported here so that a client call costs a
+# NOTE python startup and one socket round trip (see pysilicon/daemon.py).
+
+SOCKET_NAME = '.pysilicon.sock'
+
+class DaemonError(Exception):
+    pass
+
+#----------------------------------------------------------
+# Client
+#----------------------------------------------------------
+def request(cmd,socket_path=SOCKET_NAME,timeout=None,**kwargs):
+    ''' Sends request cmd to the daemon and returns its result (raises DaemonError) '''
+    with socket.socket(socket.AF_UNIX,socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(socket_path))
+        except (FileNotFoundError,ConnectionRefusedError):
+            raise DaemonError(f'No pysilicon daemon listening on "{socket_path}" (start it with ps_daemon)')
+        sock.sendall(json.dumps(dict(kwargs,cmd=cmd)).encode()+b'\n')
+        with sock.makefile('rb') as fp:
+            response = json.loads(fp.readline())
+    if not response['ok']:
+        raise DaemonError(response['error'])
+    return response['result']
+
+def wait_jobs(ids,socket_path=SOCKET_NAME,interval=0.2):
+    ''' Polls status of jobs ids and yields each job once it is done '''
+    pending = set(ids)
+    while pending:
+        for job in request('status',socket_path,ids=sorted(pending)):
+            if job['state'] == 'done':
+                pending.discard(job['id'])
+                yield job
+        if pending:
+            time.sleep(interval)
+
+#----------------------------------------------------------
+# Command line
+#----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Queries or drives a running pysilicon daemon.")
+    parser.add_argument('-s','--socket',default=SOCKET_NAME,help=f'Socket path. Default: {SOCKET_NAME}')
+    sub = parser.add_subparsers(dest='cmd')
+    sub.required = True
+    sub.add_parser('ping',help='Prints daemon status.')
+    p = sub.add_parser('tasks',help='Lists tasks (optionally only those starting with prefix).')
+    p.add_argument('prefix',nargs='?',default='')
+    p = sub.add_parser('filelist',help='Prints global filelist or hdl files of a task.')
+    p.add_argument('task',nargs='?',default=None)
+    p.add_argument('--no-test',dest='test',action='store_false',help='Leave out test sources.')
+    p = sub.add_parser('run',help='Runs tasks in the daemon.')
+    p.add_argument('tasks',nargs='+')
+    p.add_argument('-w','--wait',action='store_true',help='Wait for and print results.')
+    p = sub.add_parser('status',help='Prints status of submitted runs.')
+    p.add_argument('ids',nargs='*',type=int)
+    sub.add_parser('reload',help='Reloads the project from scratch.')
+    sub.add_parser('shutdown',help='Stops the daemon.')
+    args = parser.parse_args(argv)
+    try:
+        if args.cmd == 'tasks':
+            for task in request('tasks',args.socket,prefix=args.prefix):
+                print(task['name'] if task['valid'] else f'{task["name"]} (invalid: {task["file"]})')
+        elif args.cmd == 'filelist':
+            print('\n'.join(request('filelist',args.socket,test=args.test,task=args.task)))
+        elif args.cmd == 'run':
+            ids = request('run',args.socket,tasks=args.tasks)
+            if not args.wait:
+                print(' '.join(str(i) for i in ids))
+                return
+            failed = 0
+            for job in wait_jobs(ids,args.socket):
+                print(f'[{"PASS" if job["passed"] else "FAIL"}] {job["task"]} ({job["finished"]-job["submitted"]:.1f} s)')
+                failed += not job['passed']
+            sys.exit(1 if failed else 0)
+        elif args.cmd == 'status':
+            for job in request('status',args.socket,ids=args.ids or None):
+                print(f'{job["id"]:>4} {job["state"]:<8} {job["task"]}' +
+                    ('' if job['passed'] is None else (' passed' if job['passed'] else ' failed')))
+        else:
+            result = request(args.cmd,args.socket)
+            if result is not None:
+                print(json.dumps(result))
+    except DaemonError as err:
+        print(f'error: {err}',file=sys.stderr)
+        sys.exit(2)
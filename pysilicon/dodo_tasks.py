@@ -24,6 +24,7 @@
 # 14. Need to make sure that SDC path in syn.yml is relative to working directory!
 
 from pysilicon.dodo_utility import *
+from doit.tools import config_changed
 
 #----------------------------------------------------------
 # DOIT Config 
@@ -39,17 +40,13 @@ ps = PySilicon()
 #----------------------------------------------------------
 def task_syn():
     ''' Basic synthesis method '''
-    # Search in Analog, Digital, and Misc
-    fnames = ps.find_tasks(['syn.yml'])
-    # Generate tasks
-    for f in fnames:
-        config = ps.validate_yaml(f,ps.schemata['syn'])
-        filelist = ps.create_new_filelist(config['filelist'],test=False)
-        config['hdl_files'] = ps.create_filelist_from_dict(filelist,test=False) 
+    # Generate tasks (results are published to stable paths so that gate level sims can depend on them)
+    for config in ps.get_syn_configs().values():
         yield {
             'name': config['name'],
-            'file_dep': config['hdl_files'],
-            'targets': [config['name']+'syn.txt'],
+            'file_dep': config['hdl_files']+[ps.wd / config['sdc'],ps.wd / config['tcl_template']],
+            'targets': [str(p) for p in ps.syn_artifacts(config).values()],
+            'uptodate': [config_changed({k: config[k] for k in ('top','syn_flags','std_cells')})],
             'actions': [(ps.syn_action,[config])],
             'verbosity': 2
         }
@@ -63,12 +60,14 @@ def sim(sim_type):
     fnames = ps.find_tasks(['sim_'+sim_type+'.yml'])
     # Generate tasks
     for f in fnames:
-        config = ps.validate_yaml(f,ps.schemata['sim_'+sim_type])
-        filelist = ps.create_new_filelist(config['filelist']) 
-        config['hdl_files'] = ps.create_filelist_from_dict(filelist) 
+        config = ps.load_sim_config(f,sim_type)
+        file_dep = list(config['hdl_files'])
+        if config.get('syn_artifacts'):
+            # Depending on the published netlist schedules the syn task whenever its inputs changed
+            file_dep += [str(config['syn_artifacts']['netlist']),str(config['syn_artifacts']['sdf'])]
         yield {
             'name': config['name'],
-            'file_dep': config['hdl_files'],
+            'file_dep': file_dep,
             'targets': [sim_type+'_'+config['name']+'_target.txt'],
             'actions': [(ps.sim_action,[sim_type,config])],
             'verbosity': 2
@@ -99,7 +98,7 @@ def clean_sim(sim_type):
         exp_dir = ps.return_scratch_path('sim_'+sim_type,config['name'])
         yield {
             'name': config['name'],
-            'actions': [f'rm -rf {exp_dir.parents[0]}'],
+            'actions': [f'rm -rf {exp_dir.parents[0]}',ps.gc_snapshots_action],
             'verbosity': 2
         }
 
@@ -125,7 +124,7 @@ def task_clean_syn():
         exp_dir = ps.return_scratch_path('syn',config['name'])
         yield {
             'name': config['name'],
-            'actions': [f'rm -rf {exp_dir.parents[0]}'],
+            'actions': [f'rm -rf {exp_dir.parents[0]}',ps.gc_snapshots_action],
             'verbosity': 2 
         }
 
@@ -136,12 +135,61 @@ def task_clean_scratch():
         'verbosity': 2
     }
 
+#----------------------------------------------------------
+# Artifact cache task
+#----------------------------------------------------------
+def task_cache_stats():
+    ''' Reports size and hit/miss statistics of the shared artifact cache '''
+    return {
+        'actions': [ps.cache_stats_action],
+        'verbosity': 2
+    }
+
+#----------------------------------------------------------
+# Rerun task
+#----------------------------------------------------------
+def task_rerun():
+    ''' Reproduces a historical sim or syn run from its input snapshot (doit rerun --run <run dir>) '''
+    return {
+        'params': [{'name': 'run','long': 'run','default': '','help': 'Run directory to reproduce'}],
+        'actions': [ps.rerun_action],
+        'verbosity': 2
+    }
+
+#----------------------------------------------------------
+# Module interface index task
+#----------------------------------------------------------
+def task_index():
+    ''' Updates on-disk index of verilog module ports and parameters '''
+    return {
+        'file_dep': [str(f) for f in ps.filelist_list],
+        'actions': [ps.index_action],
+        'verbosity': 2
+    }
+
+#----------------------------------------------------------
+# Standard cell index task
+#----------------------------------------------------------
+def task_lib_index():
+    ''' Updates on-disk index of cells, areas and corners of every std_cells entry '''
+    for name,sc in ps.std_cells.items():
+        yield {
+            'name': name,
+            'file_dep': [str(f) for f in ps.check_and_resolve(sc['libs_syn'])+ps.check_and_resolve(sc['lefs'])],
+            'actions': [(ps.lib_index_action,[name])],
+            'verbosity': 2
+        }
+
 #----------------------------------------------------------
 # Module generation tasks 
 #----------------------------------------------------------
 def task_gen_mod():
-    ''' Generates a new module directory w/ default sim, syn, and par config files '''
+    ''' Generates a new module directory w/ default sim, syn, and par config files (or all modules of --manifest) '''
     return {
+        'params': [
+            {'name': 'manifest','long': 'manifest','default': '','help': 'YAML manifest of modules to generate (non-interactive)'},
+            {'name': 'jobs','long': 'jobs','type': int,'default': 0,'help': 'Number of render threads (0: default)'}
+        ],
         'actions': [ps.gen_mod_action],
         'verbosity': 2
     }
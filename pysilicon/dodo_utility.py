@@ -1,11 +1,34 @@
 from pathlib import Path
 import yaml,json
 import getpass 
+import shutil
 from datetime import datetime
 from jinja2 import Template, Environment, BaseLoader, FileSystemLoader
 import logging
+import threading
+import uuid
 import sys,os
 import jsonschema 
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pysilicon.vlog_index import VlogIndex, include_dirs, included_files
+from pysilicon.lib_index import LibIndex
+from pysilicon.netlist import NetlistIndex
+from pysilicon.file_index import hash_file, atomic_write
+from pysilicon.artifact_cache import ArtifactCache, cache_key
+from pysilicon.run_snapshot import SnapshotStore, write_manifest, read_manifest, rerun_mapping, substitute
+
+# Task files generated for every module by gen_mod (output name = default template name)
+GEN_MOD_FILES = ('syn.yml','sim_rtl.yml','sim_syn.yml','sim_par.yml','timing.sdc')
+
+class ThreadFilter(logging.Filter):
+    ''' Passes only records logged by the thread that created the filter '''
+    def __init__(self):
+        super().__init__()
+        self.thread = threading.get_ident()
+
+    def filter(self,record):
+        return record.thread == self.thread
 
 class PySilicon:
     
@@ -43,6 +66,14 @@ class PySilicon:
         self.prj_scratch_dir = self.scratch_base_dir / self.config['project_name'] / 'build'
         # Check and resolve search directories
         self.task_dirs = self.check_and_resolve(self.config['task_dirs'],True)
+        # Standard cells by name
+        self.std_cells = {scs['name']: scs for scs in self.config['std_cells'] or []}
+        # Syn task configs by name (loaded on first use)
+        self.syn_configs = None
+        # Team-wide artifact cache (opt-in)
+        self.artifact_cache = self.create_artifact_cache()
+        # Content addressed store of run inputs (on by default)
+        self.snapshots = self.create_snapshot_store()
 
     def validate_yaml(self,yaml_fname,schema):
         ''' loads and validates yaml using schema dict '''
@@ -74,8 +105,11 @@ class PySilicon:
     @staticmethod
     def create_logger(name,log_fname):
         ''' creates a logger with stream and filehandler '''
-        # Create logger
+        # Create logger (handlers of a previous instance are replaced)
         logger = logging.getLogger(name)
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+            h.close()
         logger.setLevel(logging.INFO)
         formatter = logging.Formatter("[%(asctime)s] [%(threadName)s] [%(levelname)s] %(message)s");
         # Filehandler - outputs to file
@@ -157,13 +191,13 @@ class PySilicon:
         new_filelist = {'defines_src':[],'rtl_src':[],'test_src':[]}
         # DEFINES
         if defines and filelist['defines_src']:
-            new_filelist['defines_src'] += filter_files('defines_src',filelist)
+            new_filelist['defines_src'] += self.filter_files('defines_src',filelist)
         # RTL 
         if rtl and filelist['rtl_src']:
-            new_filelist['rtl_src'] += filter_files('rtl_src',filelist)
+            new_filelist['rtl_src'] += self.filter_files('rtl_src',filelist)
         # SRC 
         if test and filelist['test_src']:
-            new_filelist['test_src'] += filter_files('test_src',filelist)
+            new_filelist['test_src'] += self.filter_files('test_src',filelist)
         # Return new filelist
         if new_filelist['defines_src'] or new_filelist['rtl_src'] or new_filelist['test_src']:
             return new_filelist
@@ -184,8 +218,9 @@ class PySilicon:
         return fnames
 
     def return_scratch_path(self,dirname,module):
+        ''' Returns unique run directory (timestamp keeps runs sorted, suffix keeps parallel runs apart) '''
         now = datetime.now()
-        return self.prj_scratch_dir / dirname / module / now.strftime("%m-%d-%Y-%H:%M:%S") 
+        return self.prj_scratch_dir / dirname / module / f'{now.strftime("%m-%d-%Y-%H:%M:%S")}-{uuid.uuid4().hex[:8]}'
     
     @staticmethod
     def unlink_missing_ok(dirname):
@@ -194,13 +229,37 @@ class PySilicon:
             (dirname).unlink()
         except FileNotFoundError:
             pass
+
+    @staticmethod
+    def symlink_atomic(link,target):
+        ''' Points symlink link at target. Readers always see either the old or the new link '''
+        if os.path.islink(link) and os.readlink(link) == str(target):
+            return
+        tmp = link.parent / f'.{link.name}.{uuid.uuid4().hex}'
+        tmp.symlink_to(target,target_is_directory=True)
+        try:
+            os.replace(tmp,link)
+        except OSError:
+            PySilicon.unlink_missing_ok(tmp)
+            raise
     
     def symlink_scratch(self,exp_dir):
-        ''' Unlinks and then relinks project build dir from scratch '''
-        self.unlink_missing_ok(self.wd / 'build')
-        self.unlink_missing_ok(exp_dir.parents[0] / 'current')
-        Path(self.wd / 'build').symlink_to(self.prj_scratch_dir,target_is_directory=True)
-        (exp_dir.parents[0] / 'current').symlink_to(exp_dir)
+        ''' Relinks project build dir and current run of exp_dir (safe for parallel tasks) '''
+        self.symlink_atomic(self.wd / 'build',self.prj_scratch_dir)
+        self.symlink_atomic(exp_dir.parents[0] / 'current',exp_dir)
+
+    @contextmanager
+    def task_log(self,exp_dir):
+        ''' Copies log messages of the calling thread into exp_dir/dodo.log while active '''
+        fh = logging.FileHandler(exp_dir / 'dodo.log',mode='w')
+        fh.setFormatter(self.logger.handlers[0].formatter)
+        fh.addFilter(ThreadFilter())
+        self.logger.addHandler(fh)
+        try:
+            yield fh
+        finally:
+            self.logger.removeHandler(fh)
+            fh.close()
    
     def check_and_cat(self,filelist):
         ''' Checks list of files and then concatenates them into string '''
@@ -254,9 +313,10 @@ class PySilicon:
         return define_flags
 
     def create_scratch_dir(self,dirname,module):
-        ''' creates scratch directory and builds symlink '''
+        ''' creates unique scratch directory and builds symlink '''
         exp_dir = self.return_scratch_path(dirname,module)
-        exp_dir.mkdir(parents=True,exist_ok=True)
+        exp_dir.parent.mkdir(parents=True,exist_ok=True)
+        exp_dir.mkdir()
         self.symlink_scratch(exp_dir)
         return exp_dir
 
@@ -270,11 +330,173 @@ class PySilicon:
         return Path(rel_parent_path)
     
     def get_std_cells(self,name):
-        ''' loops everytime, but should never have a lot of std cells to loop thru... '''
-        for scs in self.config['std_cells']:
-            if name == scs['name']:
-                return scs
-        self.error_if_empty(None,f'Cannot find standard cells "{name}"')
+        ''' Returns std_cells entry name of config.yml '''
+        scs = self.std_cells.get(name)
+        self.error_if_empty(scs,f'Cannot find standard cells "{name}"')
+        return scs
+
+    def get_lib_index(self,name):
+        ''' Returns Liberty/LEF cell index of std_cells entry name that is up to date (only changed files are rescanned) '''
+        sc = self.get_std_cells(name)
+        index = LibIndex(self.prj_scratch_dir / 'lib_index' / f'{name}.json')
+        rescanned = index.update(self.check_and_resolve(sc['libs_syn'])+self.check_and_resolve(sc['lefs']))
+        if rescanned:
+            self.logger.info(f'Indexed {len(rescanned)} changed liberty/lef file(s) of "{name}"')
+        index.save()
+        return index
+
+    def get_vlog_index(self,files=None,cache_fname=None):
+        ''' Returns module-interface index that is up to date for files (default: global filelist) '''
+        files = self.filelist_list if files is None else files
+        index = VlogIndex(cache_fname or self.prj_scratch_dir / 'vlog_index.json')
+        reparsed = index.update(files)
+        if reparsed:
+            self.logger.info(f'Indexed {len(reparsed)} changed verilog file(s)')
+        index.save()
+        return index
+
+    def get_syn_configs(self):
+        ''' Returns dict of validated syn task configs (with resolved hdl files) by name (task files are only loaded once) '''
+        if self.syn_configs is None:
+            self.syn_configs = {}
+            for f in self.find_tasks(['syn.yml']):
+                config = self.validate_yaml(f,self.schemata['syn'])
+                config['task_file'] = str(Path(f).resolve())
+                filelist = self.create_new_filelist(config['filelist'],test=False)
+                config['hdl_files'] = self.create_filelist_from_dict(filelist,test=False) 
+                self.syn_configs[config['name']] = config
+        return self.syn_configs
+
+    def get_syn_config(self,name):
+        ''' Returns config of syn task name '''
+        config = self.get_syn_configs().get(name)
+        self.error_if_empty(config,f'Cannot find syn task "{name}"')
+        return config
+
+    def load_sim_config(self,fname,sim_type):
+        ''' Loads and validates sim task file fname and resolves its hdl files (and syn artifacts) '''
+        config = self.validate_yaml(fname,self.schemata['sim_'+sim_type])
+        config['task_file'] = str(Path(fname).resolve())
+        filelist = self.create_new_filelist(config['filelist']) 
+        config['hdl_files'] = self.create_filelist_from_dict(filelist) 
+        if config.get('syn_task'):
+            config['syn_artifacts'] = self.syn_artifacts(self.get_syn_config(config['syn_task']))
+        return config
+
+    def syn_artifacts(self,config):
+        ''' Returns stable paths that syn task config publishes its results to '''
+        pub_dir = self.prj_scratch_dir / 'syn' / config['name'] / 'published'
+        return {
+            'netlist': pub_dir / f'{config["top"]}.mapped.v',
+            'sdc': pub_dir / 'constraints.sdc',
+            'sdf': pub_dir / f'{config["top"]}.sdf',
+            'manifest': pub_dir / 'manifest.json'
+        }
+
+    def publish_syn(self,config,exp_dir):
+        ''' Copies results of synthesis run exp_dir to the stable artifact paths and writes manifest '''
+        artifacts = self.syn_artifacts(config)
+        artifacts['manifest'].parent.mkdir(parents=True,exist_ok=True)
+        published = {}
+        for kind,path in artifacts.items():
+            if kind == 'manifest':
+                continue
+            src = exp_dir / path.name
+            if not src.is_file():
+                self.logger.error(f'Synthesis run "{exp_dir}" did not write {kind} "{src.name}"')
+                return False
+            # Copy next to target and rename so readers never see a partial file
+            tmp = path.parent / f'.{path.name}.{uuid.uuid4().hex}'
+            shutil.copy2(src,tmp)
+            os.replace(tmp,path)
+            published[kind] = {'path': str(path),'sha1': hash_file(path)}
+        inputs = [Path(f) for f in config['hdl_files']] + [self.wd / config['sdc']]
+        atomic_write(artifacts['manifest'],json.dumps({
+            'task': config['name'],
+            'top': config['top'],
+            'run_dir': str(exp_dir),
+            'inputs': {str(f): hash_file(f) for f in inputs if f.is_file()},
+            'artifacts': published
+        },indent=2))
+        self.logger.info(f'Published synthesis results of "{config["name"]}" to "{artifacts["manifest"].parent}"')
+        return True
+
+    def create_artifact_cache(self):
+        ''' Returns shared ArtifactCache if "artifact_cache" is set in config.yml, else None '''
+        settings = self.config.get('artifact_cache')
+        if not settings:
+            return None
+        root = self.check_and_resolve_single(settings.get('dir'),dirs=True) if settings.get('dir') else None
+        root = root or self.scratch_base_dir.parent / 'artifact_cache'
+        max_size = settings.get('max_size_gb')
+        return ArtifactCache(root,None if max_size is None else int(max_size*2**30))
+
+    def syn_cache_key(self,config):
+        ''' Artifact cache key of a syn task: design, constraints, template, std cells, top and flags '''
+        sc = self.get_std_cells(config['std_cells'])
+        tech = [self.check_and_resolve_single(sc[k]) for k in ('cap_table_file','qrc_tech_file')]
+        return cache_key(
+            files=[Path(f) for f in config['hdl_files']]+[self.wd / config['sdc'],self.wd / config['tcl_template']],
+            stamped=self.check_and_resolve(sc['libs_syn'])+self.check_and_resolve(sc['lefs'])+[f for f in tech if f],
+            tool='genus',top=config['top'],flags=config['syn_flags'])
+
+    def create_snapshot_store(self):
+        ''' Returns SnapshotStore of run inputs unless disabled by "run_snapshots" in config.yml '''
+        settings = self.config.get('run_snapshots') or {}
+        if settings.get('enable') is False:
+            return None
+        max_mb = settings.get('max_file_mb')
+        return SnapshotStore(self.prj_scratch_dir / 'objects',1<<30 if max_mb is None else int(max_mb*2**20))
+
+    def snapshot_run(self,exp_dir,task,files,command,scripts):
+        '''
+        Links input files of run exp_dir into exp_dir/inputs and writes the manifest
+        exp_dir/inputs.json that rerun_action reproduces the run (command and rendered scripts) from
+        '''
+        if self.snapshots is None:
+            return
+        entries = self.snapshots.snapshot([f for f in files if f],exp_dir / 'inputs',self.wd)
+        write_manifest(exp_dir,
+            task=task,
+            user=getpass.getuser(),
+            date=datetime.now().strftime("%m/%d/%Y-%H:%M:%S"),
+            run_dir=str(exp_dir),
+            command=command,
+            scripts=scripts,
+            files=entries)
+        linked = [e for e in entries.values() if e['snapshot']]
+        self.logger.info(f'Snapshot of {len(linked)} input file(s) ({sum(e["size"] for e in linked)/2**20:.1f} MB) '
+            f'in "{exp_dir / "inputs"}" ({len(entries)-len(linked)} recorded by hash only)')
+
+    def check_netlists(self,netlists,models,flags,name):
+        '''
+        Logs cell counts of gate level netlists and checks that every instantiated cell is
+        a module of the netlists, of models (hdl and std cell rtl) or of a "-v <file>" flag.
+        Returns False if cells are unresolved (only warns if "-y" library dirs are used)
+        '''
+        if not netlists:
+            return True
+        cache_dir = self.prj_scratch_dir / 'netlist_index'
+        index = NetlistIndex(cache_dir / f'{name}.json')
+        rescanned = index.update(netlists)
+        index.save()
+        if rescanned:
+            self.logger.info(f'Scanned {len(rescanned)} changed netlist(s)')
+        for top in index.tops():
+            leaves = index.leaf_cells(top)
+            common = ', '.join(f'{cell} x{count}' for cell,count in leaves.most_common(5))
+            self.logger.info(f'Netlist "{top}": {sum(leaves.values())} cells of {len(leaves)} types ({common})')
+        flags = [str(f).strip() for f in flags or []]
+        models = list(models) + [f.split(None,1)[1] for f in flags if f.startswith('-v ')]
+        known = self.get_vlog_index(self.check_and_resolve(models),cache_dir / f'{name}.models.json').lookup_table()
+        missing = index.unresolved(known)
+        if not missing:
+            return True
+        libdirs = any(f.startswith('-y') for f in flags)
+        log = self.logger.warning if libdirs else self.logger.error
+        for cell,users in sorted(missing.items()):
+            log(f'Unresolved cell "{cell}" instantiated in {", ".join(sorted(users))}')
+        return libdirs
 
     def retrieve_std_cell_rtl(self,std_cell_names):
         ''' Returns list of valid std cell rtl '''
@@ -291,18 +513,35 @@ class PySilicon:
 #----------------------------------------------------------
     def sim_action(self,sim_type,config):
         ''' Action fn for simulation '''
+        # Create scratch directory
+        exp_dir = self.create_scratch_dir('sim_'+sim_type,config['name'])
+        with self.task_log(exp_dir):
+            return self.sim_run(sim_type,config,exp_dir)
+
+    def sim_run(self,sim_type,config,exp_dir):
+        ''' Runs simulation in exp_dir '''
         self.logger.info(f'Start sim_{sim_type} task "{config["name"]}"')
         # Retrieve syn and par behavior models - as well as auto define flags
-        filelist = config['hdl_files']
+        filelist = list(config['hdl_files'])
+        syn_fl = []
         define_flags = []
         if sim_type != 'rtl':
             syn_fl = self.check_and_resolve(config['syn_par_filelist'])
+            if config.get('syn_artifacts'):
+                # Netlist and SDF published by the syn task this sim depends on
+                netlist = config['syn_artifacts']['netlist']
+                syn_fl.append(netlist)
+                define_flags.append(f"-define {netlist.name.split('.')[0].upper()}_SDF='\"{config['syn_artifacts']['sdf']}\"'")
+            std_cell_rtl = self.retrieve_std_cell_rtl(config['std_cells'])
+            # Catch unresolved cells before a long gate level sim starts
+            if not self.check_netlists(syn_fl,list(config['hdl_files'])+std_cell_rtl,config['sim_flags'],
+                    f'sim_{sim_type}_{config["name"]}'):
+                self.logger.error(f'Netlists of "{config["name"]}" instantiate undefined cells. Simulation not started')
+                return False
             filelist += syn_fl 
-            filelist += self.retrieve_std_cell_rtl(config['std_cells'])
-            define_flags = self.return_define_flags(syn_fl) 
+            filelist += std_cell_rtl
+            define_flags += self.return_define_flags(syn_fl) 
         flist_str = self.strip_and_cat(filelist)
-        # Create scratch directory
-        exp_dir = self.create_scratch_dir('sim_'+sim_type,config['name'])
         # Format flags
         try:
             flags = self.strip_and_cat(config['sim_flags']+define_flags)
@@ -310,47 +549,194 @@ class PySilicon:
             flags = self.strip_and_cat(define_flags)
         tb = config['testbench']
         # Generate simulation TCL file
-        try:
-            self.gen_sim_tcl(self.wd / config['tcl_template'],exp_dir,config)
-        except TypeError:
-            self.gen_sim_tcl(self.home_dir / "templates/sim_default.tcl",exp_dir,config)
+        template = self.wd / config['tcl_template'] if config['tcl_template'] else self.home_dir / "templates/sim_default.tcl"
+        self.gen_sim_tcl(template,exp_dir,config)
+        command = f'cd {exp_dir}; xrun {flags} {flist_str} -top {tb} -input {exp_dir / "sim.tcl"}'
+        sdf = [config['syn_artifacts']['sdf']] if sim_type != 'rtl' and config.get('syn_artifacts') else []
+        self.snapshot_run(exp_dir,f'sim_{sim_type}:{config["name"]}',
+            filelist+sdf+[template,config.get('task_file')],command,['sim.tcl'])
         # CD into scratch dir and run simulation 
-        self.shell(f'cp dodo.log {exp_dir}; cd {exp_dir}; xrun {flags} {flist_str} -top {tb} -input {exp_dir / "sim.tcl"}')
+        if self.artifact_cache is None:
+            return self.shell(command) == 0
+        # Compiled snapshot (xcelium.d) is shared through the artifact cache. The key covers the
+        # SDF (only referenced by a define) and `included headers, which are not in the filelist
+        headers = included_files([f for f in filelist if f not in syn_fl],include_dirs(flags,exp_dir))
+        key = cache_key(files=filelist+[f for f in sdf if Path(f).is_file()]+headers,tool='xrun',flags=flags,top=tb)
+        if self.artifact_cache.get(key,exp_dir) is not None:
+            self.logger.info(f'Artifact cache hit for snapshot of "{config["name"]}" ({key})')
+        else:
+            if self.shell(f'cd {exp_dir}; xrun -elaborate {flags} {flist_str} -top {tb}') != 0:
+                self.logger.error(f'Elaboration of "{config["name"]}" failed')
+                return False
+            self.artifact_cache.put(key,[exp_dir / 'xcelium.d'],task=f'sim_{sim_type}:{config["name"]}',user=getpass.getuser())
+        return self.shell(f'cd {exp_dir}; xrun -R -input {exp_dir / "sim.tcl"}') == 0
     
     def syn_action(self,config):
         ''' Action fn for synthesis '''
-        self.logger.info(f'Start syn task "{config["name"]}"')
         # Create scratch directory
         exp_dir = self.create_scratch_dir('syn',config['name'])
+        with self.task_log(exp_dir):
+            return self.syn_run(config,exp_dir)
+
+    def syn_run(self,config,exp_dir):
+        ''' Runs synthesis in exp_dir '''
+        self.logger.info(f'Start syn task "{config["name"]}"')
         # Generate syn.tcl
         self.gen_syn_tcl(self.wd / config['tcl_template'],exp_dir,config),
         # Format flags
         flags = self.strip_and_cat(config['syn_flags'])
-        # CD into scratch dir and run simulation 
-        self.shell(f'cp dodo.log {exp_dir}; cd {exp_dir}; genus {flags} -f {exp_dir / "syn.tcl"}')
+        command = f'cd {exp_dir}; genus {flags} -f {exp_dir / "syn.tcl"}'
+        sc = self.get_std_cells(config['std_cells'])
+        self.snapshot_run(exp_dir,f'syn:{config["name"]}',
+            list(config['hdl_files'])+[self.check_and_resolve_single(config['sdc']),self.wd / config['tcl_template'],config.get('task_file')]+
+            self.check_and_resolve(sc['libs_syn'])+self.check_and_resolve(sc['lefs'])+
+            [self.check_and_resolve_single(sc[k]) for k in ('cap_table_file','qrc_tech_file')],command,['syn.tcl'])
+        # Reuse results of an identical run (of any user) from the artifact cache
+        key = self.syn_cache_key(config) if self.artifact_cache else None
+        if key and self.artifact_cache.get(key,exp_dir) is not None:
+            self.logger.info(f'Artifact cache hit for syn task "{config["name"]}" ({key})')
+            return self.publish_syn(config,exp_dir)
+        # CD into scratch dir and run synthesis 
+        if self.shell(command) != 0:
+            self.logger.error(f'Synthesis of "{config["name"]}" failed. Nothing published')
+            return False
+        if not self.publish_syn(config,exp_dir):
+            return False
+        if key:
+            outputs = [exp_dir / p.name for k,p in self.syn_artifacts(config).items() if k != 'manifest']
+            self.artifact_cache.put(key,outputs,task=f'syn:{config["name"]}',user=getpass.getuser())
+        return True
     
-    def gen_mod_action(self):
-        ''' action portion of gen_module task '''
+    def rerun_action(self,run):
+        ''' Action fn for reproducing historical run dir run from its input snapshot '''
+        self.error_if_empty(run,'No run given. Usage: doit rerun --run <run dir>')
+        run_dir = Path(run).resolve()
+        try:
+            manifest = read_manifest(run_dir)
+        except FileNotFoundError:
+            self.logger.error(f'"{run_dir}" has no input snapshot (inputs.json)')
+            sys.exit(-1)
+        kind,name = manifest['task'].split(':',1)
+        exp_dir = self.create_scratch_dir(kind,name)
+        with self.task_log(exp_dir):
+            return self.rerun(run_dir,manifest,exp_dir)
+
+    def rerun(self,run_dir,manifest,exp_dir):
+        '''
+        Reruns command of manifest (of run_dir) in exp_dir on the snapshot of its inputs.
+        Results are not published nor cached
+        '''
+        self.logger.info(f'Rerun of "{manifest["task"]}" from "{run_dir}" ({manifest["date"]})')
+        # Hardlinks: a rerun owns a complete snapshot even if run_dir is deleted later
+        if (run_dir / 'inputs').is_dir():
+            shutil.copytree(run_dir / 'inputs',exp_dir / 'inputs',copy_function=os.link)
+        mapping,changed = rerun_mapping(manifest,exp_dir)
+        for f in changed:
+            self.logger.warning(f'"{f}" was only recorded by hash and changed since the run')
+        for script in manifest['scripts']:
+            with open(run_dir / script,'r') as fp:
+                fstr = substitute(fp.read(),mapping)
+            with open(exp_dir / script,'w') as fp:
+                fp.write(fstr)
+        write_manifest(exp_dir,**dict(manifest,run_dir=str(exp_dir),rerun_of=str(run_dir)))
+        return self.shell(substitute(manifest['command'],mapping)) == 0
+
+    def lib_index_action(self,name):
+        ''' Action fn for updating the Liberty/LEF cell index of std_cells entry name '''
+        index = self.get_lib_index(name)
+        for lib in index.libraries():
+            self.logger.info(f'"{lib["name"]}": {lib["cells"]} cells, process {lib.get("nom_process")}, '
+                f'{lib.get("nom_voltage")} V, {lib.get("nom_temperature")} C ({lib["file"]})')
+        self.logger.info(f'{len(index.lookup_table())} cells of "{name}" indexed in "{index.cache_fname}"')
+
+    def cache_stats_action(self):
+        ''' Action fn for reporting artifact cache statistics '''
+        if self.artifact_cache is None:
+            self.logger.info('Artifact cache is disabled (set "artifact_cache" in config.yml)')
+        else:
+            self.logger.info(f'Artifact cache "{self.artifact_cache.root}": {self.artifact_cache.summary()}')
+
+    def gc_snapshots_action(self):
+        ''' Action fn for deleting run snapshot objects of cleaned runs '''
+        root = self.prj_scratch_dir / 'objects'
+        if root.is_dir():
+            count,size = SnapshotStore(root).gc()
+            self.logger.info(f'Deleted {count} unused snapshot objects ({size/2**20:.1f} MB)')
+
+    def index_action(self):
+        ''' Action fn for updating the verilog module-interface index '''
+        index = self.get_vlog_index()
+        self.logger.info(f'{len(index.lookup_table())} modules indexed in "{index.cache_fname}"')
+
+    def gen_mod_action(self,manifest='',jobs=0):
+        ''' action portion of gen_module task (batch mode if manifest is given) '''
+        if manifest:
+            return self.gen_mod_batch(manifest,jobs or None)
         # Get module and directory names
         module_name = input("Module name: ")
         rel_parent_path = self.determine_valid_directory("Path to module directory: ")
-        parent_path = rel_parent_path.resolve()
         rel_mod_dir = Path(rel_parent_path) / module_name
-        mod_dir = parent_path / module_name
+        mod_dir = rel_parent_path.resolve() / module_name
         mod_dir.mkdir()
         # Render jinja templates
-        self.jinja_render(self.home_dir/"templates/syn.yml",mod_dir/"syn.yml",
-            top_module=module_name,mod_dir=rel_mod_dir,rel_home=self.rel_home)
-        self.jinja_render(self.home_dir / "templates/sim_rtl.yml",mod_dir / "sim_rtl.yml",
-            top_module=module_name,rel_home=self.rel_home)
-        self.jinja_render(self.home_dir / "templates/sim_syn.yml",mod_dir / "sim_syn.yml",
-            top_module=module_name,rel_home=self.rel_home)
-        self.jinja_render(self.home_dir / "templates/sim_par.yml",mod_dir / "sim_par.yml",
-            top_module=module_name,rel_home=self.rel_home)
-        self.jinja_render(self.home_dir / "templates/timing.sdc",mod_dir / "timing.sdc",
-            top_module=module_name)
+        self.render_jobs(self.gen_mod_jobs(module_name,rel_mod_dir),workers=1)
         self.logger.info(f'Module "{module_name}" generated at "{mod_dir}"')
 
+    def gen_mod_jobs(self,name,rel_mod_dir,templates=None,variables=None):
+        '''
+        Returns [(template path,output path,kwargs)] for the task files of module name
+        :param templates dict output file name -> template path (relative to working dir) overriding the default
+        :param variables extra template variables
+        '''
+        templates = templates or {}
+        kwargs = dict(variables or {},top_module=name,mod_dir=rel_mod_dir,rel_home=self.rel_home)
+        return [(self.wd / templates[f] if templates.get(f) else self.home_dir / 'templates' / f,self.wd / rel_mod_dir / f,kwargs)
+            for f in GEN_MOD_FILES]
+
+    def gen_mod_batch(self,manifest,workers=None):
+        ''' Generates all module directories of manifest yml. Existing files are kept. Returns True '''
+        manifest = self.validate_yaml(manifest,self.schemata['gen_mod'])
+        jobs = {}
+        for mod in manifest['modules']:
+            parent = mod.get('path') or manifest.get('path') or '.'
+            templates = dict(manifest.get('templates') or {},**(mod.get('templates') or {}))
+            variables = dict(manifest.get('vars') or {},**(mod.get('vars') or {}))
+            for job in self.gen_mod_jobs(mod['name'],Path(parent) / mod['name'],templates,variables):
+                if job[1] in jobs:
+                    self.logger.warning(f'"{job[1]}" is generated by more than one manifest entry (first one wins)')
+                    continue
+                jobs[job[1]] = job
+        written = self.render_jobs(list(jobs.values()),workers)
+        self.logger.info(f'{len(manifest["modules"])} module(s): {written} file(s) generated, '
+            f'{len(jobs)-written} existing file(s) kept')
+        return True
+
+    def render_jobs(self,jobs,workers=None):
+        '''
+        Renders (template path,output path,kwargs) jobs concurrently through one jinja
+        environment (every template is compiled once). Existing outputs are not touched.
+        Returns number of files written
+        '''
+        env = Environment(loader=FileSystemLoader(f"{self.home_dir / 'templates'}"))
+        compiled = {}
+        lock = threading.Lock()
+        now = datetime.now().strftime("%m/%d/%Y-%H:%M:%S")
+        uname = getpass.getuser()
+        def render(job):
+            template_path,output_path,kwargs = job
+            if output_path.exists():
+                return False
+            with lock:
+                if template_path not in compiled:
+                    with open(template_path,'r') as fp:
+                        compiled[template_path] = env.from_string(fp.read())
+                template = compiled[template_path]
+            output_path.parent.mkdir(parents=True,exist_ok=True)
+            atomic_write(output_path,template.render(kwargs,uname=uname,date=now))
+            return True
+        with ThreadPoolExecutor(workers) as pool:
+            return sum(pool.map(render,jobs))
+
     def gen_config_action(self,possible_to_overwrite=False):
         ''' action portion of gen_config task '''
         # Filelist
@@ -0,0 +1,208 @@
+import ast
+import sys
+import operator
+from functools import lru_cache
+
+# NOTE Only integer arithmetic is evaluated natively. Anything else (floats, unknown
+# NOTE functions, non-integer division...) is handed to sympy, which is imported lazily.
+
+#----------------------------------------------------------
+# Exceptions
+#----------------------------------------------------------
+class ExprError(ValueError):
+    ''' Raised when a parameter expression cannot be evaluated '''
+    pass
+
+class UnsupportedExpression(ExprError):
+    ''' Raised when an expression is outside of the natively supported subset '''
+    pass
+
+#----------------------------------------------------------
+# Supported operations
+#----------------------------------------------------------
+def clog2(x):
+    ''' ceil(log2(x)) for positive integers '''
+    if x <= 0:
+        raise ExprError(f'log2 of non-positive value {x}')
+    return (x-1).bit_length()
+
+def flog2(x):
+    ''' floor(log2(x)) for positive integers '''
+    if x <= 0:
+        raise ExprError(f'log2 of non-positive value {x}')
+    return x.bit_length()-1
+
+def exact_div(a,b):
+    ''' a/b if it is an integer (sympy would otherwise return a rational) '''
+    q,r = divmod(a,b)
+    if r:
+        raise UnsupportedExpression(f'{a}/{b} is not an integer')
+    return q
+
+def int_pow(a,b):
+    if b < 0:
+        raise UnsupportedExpression(f'{a}**{b} is not an integer')
+    return a**b
+
+FUNCTIONS = {
+    'log2': clog2,
+    'clog2': clog2,
+    'flog2': flog2,
+}
+
+BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: exact_div,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: int_pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+}
+
+UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+UNSAFE_NODES = (ast.Attribute,ast.Subscript,ast.Lambda,getattr(ast,'NamedExpr',()),ast.comprehension,
+    ast.Starred,ast.Dict,ast.Set,ast.List,ast.JoinedStr)
+
+# Python 3.7 parses literals to ast.Num/ast.Str/ast.Bytes instead of ast.Constant
+if sys.version_info < (3,8):
+    LITERAL_NODES = (ast.Constant,ast.Num,ast.Str,ast.Bytes)
+else:
+    LITERAL_NODES = (ast.Constant,)
+
+def literal_value(node):
+    ''' Returns value of literal node (None for other nodes) '''
+    if isinstance(node,LITERAL_NODES):
+        for attr in ('value','n','s'):
+            if hasattr(node,attr):
+                return getattr(node,attr)
+    return None
+
+#----------------------------------------------------------
+# Expression compilation
+#----------------------------------------------------------
+@lru_cache(maxsize=None)
+def compile_expr(expr):
+    '''
+    Parses expression into a tree of tuples that only contains supported nodes
+    ('const',v), ('name',n), ('bin',op,l,r), ('unary',op,x), ('call',fn,x)
+    '''
+    try:
+        tree = ast.parse(expr.strip(),mode='eval')
+    except SyntaxError:
+        raise UnsupportedExpression(f'Cannot parse "{expr}"')
+    # Never hand anything that looks like python code to sympy (parse_expr uses eval)
+    for node in ast.walk(tree):
+        if (isinstance(node,UNSAFE_NODES) or (isinstance(node,ast.Name) and '__' in node.id)
+                or isinstance(literal_value(node),(str,bytes))):
+            raise ExprError(f'Unsafe expression "{expr}"')
+    return _compile_node(tree.body,expr)
+
+def _compile_node(node,expr):
+    value = literal_value(node)
+    if type(value) is int:
+        return ('const',value)
+    if isinstance(node,ast.Name):
+        return ('name',node.id)
+    if isinstance(node,ast.BinOp) and type(node.op) in BIN_OPS:
+        return ('bin',BIN_OPS[type(node.op)],_compile_node(node.left,expr),_compile_node(node.right,expr))
+    if isinstance(node,ast.UnaryOp) and type(node.op) in UNARY_OPS:
+        return ('unary',UNARY_OPS[type(node.op)],_compile_node(node.operand,expr))
+    if (isinstance(node,ast.Call) and isinstance(node.func,ast.Name) and node.func.id in FUNCTIONS
+            and len(node.args) == 1 and not node.keywords):
+        return ('call',FUNCTIONS[node.func.id],_compile_node(node.args[0],expr))
+    raise UnsupportedExpression(f'Unsupported syntax in "{expr}"')
+
+#----------------------------------------------------------
+# Evaluator
+#----------------------------------------------------------
+class ExprEvaluator:
+    '''
+    Evaluates integer parameter expressions such as "clog2(DEPTH)*WIDTH+1"
+    Parameters may reference each other in any order. Results are memoized
+    per unique expression string.
+    '''
+    def __init__(self,params=None):
+        self.raw_params = dict(params) if params else {}
+        self.params = {}
+        self.cache = {}
+        self.pending = set()
+
+    def evaluate(self,expr):
+        ''' Returns integer value of expression (int or str) '''
+        if isinstance(expr,int):
+            return expr
+        try:
+            return self.cache[expr]
+        except KeyError:
+            pass
+        try:
+            value = self.eval_node(compile_expr(expr))
+        except UnsupportedExpression:
+            value = self.sympy_evaluate(expr)
+        self.cache[expr] = value
+        return value
+
+    def evaluate_params(self):
+        ''' Returns dict of all parameters evaluated to integers '''
+        return {name: self.param(name) for name in self.raw_params}
+
+    def param(self,name):
+        ''' Returns evaluated value of parameter name '''
+        try:
+            return self.params[name]
+        except KeyError:
+            pass
+        if name not in self.raw_params:
+            raise ExprError(f'Unknown parameter "{name}"')
+        if name in self.pending:
+            raise ExprError(f'Parameter "{name}" is defined in terms of itself')
+        self.pending.add(name)
+        try:
+            value = self.evaluate(self.raw_params[name])
+        finally:
+            self.pending.discard(name)
+        self.params[name] = value
+        return value
+
+    def eval_node(self,node):
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        if kind == 'name':
+            return self.param(node[1])
+        if kind == 'bin':
+            try:
+                return node[1](self.eval_node(node[2]),self.eval_node(node[3]))
+            except ZeroDivisionError:
+                raise ExprError('Division by zero')
+        if kind == 'unary':
+            return node[1](self.eval_node(node[2]))
+        return node[1](self.eval_node(node[2]))
+
+    def sympy_evaluate(self,expr):
+        ''' Fallback for expressions outside of the supported subset '''
+        from sympy.parsing.sympy_parser import parse_expr
+        import math
+        local_dict = {
+            "log2": lambda x: math.ceil(math.log2(x)),
+            "clog2": lambda x: math.ceil(math.log2(x)),
+            "flog2": lambda x: math.floor(math.log2(x))
+        }
+        local_dict.update({name: self.param(name) for name in self.raw_params if name not in self.pending})
+        try:
+            value = parse_expr(str(expr),local_dict)
+        except Exception as err:
+            raise ExprError(f'Cannot evaluate "{expr}": {err}')
+        if not getattr(value,'is_integer',False):
+            raise ExprError(f'"{expr}" does not evaluate to an integer ({value})')
+        return int(value)
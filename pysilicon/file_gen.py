@@ -1,9 +1,15 @@
 import os,sys
 import jsonschema
 import json,yaml
+import hashlib
 from pathlib import Path
+from pysilicon.file_index import hash_file
 
-# TODO Replace parameters, ports etc... with List[NamedTuples]!
+# libyaml bindings are much faster than the pure python loader and dumper
+YamlLoader = getattr(yaml,'CSafeLoader',yaml.SafeLoader)
+YamlDumper = getattr(yaml,'CSafeDumper',yaml.SafeDumper)
+
+# NOTE Helpers accept dicts or IR objects (Port, Param, ...) and render through the IR
 # NOTE Any function that returns a string should add a new line! 
 # NOTE I.e. always assume that you are starting from a new line
 
@@ -15,7 +21,7 @@ def validate_yaml(yaml_fname,schema_fname):
     with open(schema_fname,'r') as fp:
         loaded_schema = json.load(fp)
     with open(yaml_fname,'r') as fp:
-        loaded_yaml = yaml.load(fp,Loader=yaml.SafeLoader)
+        loaded_yaml = yaml.load(fp,Loader=YamlLoader)
     try:
         jsonschema.validate(instance=loaded_yaml,schema=loaded_schema)
     except jsonschema.exceptions.ValidationError as err:
@@ -42,13 +48,245 @@ def end_section(sym='//'):
     return f'{sym}{80*"-"}\n\n'
 
 def yaml_comment(yml_obj,msg):
-    rstr = ''
-    rstr += begin_section(msg)
-    for line in yaml.dump(yml_obj).splitlines():
-        rstr += comment(line)
+    ''' Writes yml_obj as comment block. yml_obj may also be an already dumped YAML str '''
+    yml_str = yml_obj if isinstance(yml_obj,str) else yaml.dump(yml_obj,Dumper=YamlDumper)
+    rstr = begin_section(msg)
+    rstr += ''.join(comment(line) for line in yml_str.splitlines())
     rstr += end_section()
     return rstr
     
+#----------------------------------------------------------
+# Verilog IR 
+#----------------------------------------------------------
+TAB = 4*' '
+
+def indent_text(text,indent):
+    ''' Prefixes every line of text with indent '''
+    return add_tabs(text,indent) if indent else text
+
+def emit_nodes(nodes,indent=''):
+    ''' Yields rendered chunks of a str, node or iterable of both '''
+    if isinstance(nodes,str):
+        yield indent_text(nodes,indent)
+    elif isinstance(nodes,Node):
+        yield from nodes.emit(indent)
+    else:
+        for node in nodes:
+            yield from emit_nodes(node,indent)
+
+def render(nodes,indent=''):
+    ''' Renders nodes into one str '''
+    return ''.join(emit_nodes(nodes,indent))
+
+class Node:
+    ''' 
+    Base class of the IR. emit(indent) yields chunks of complete lines that are
+    already indented, so nesting never re-splits rendered text
+    '''
+    __slots__ = ()
+
+    def emit(self,indent=''):
+        raise NotImplementedError
+
+    def __str__(self):
+        return render(self)
+
+class Port:
+    ''' Module/task port '''
+    __slots__ = ('name','io','datatype','vec')
+
+    def __init__(self,name,io='input',datatype='wire',vec=None):
+        self.name = name
+        self.io = io
+        self.datatype = datatype
+        self.vec = vec
+
+    @classmethod
+    def get(cls,p):
+        ''' Port from {name:,io:,datatype:,vec:} (ports are passed through) '''
+        return p if isinstance(p,Port) else cls(p['name'],p['io'],p['datatype'],p['vec'])
+
+    def declaration(self):
+        if self.vec is not None:
+            return f'{self.io} {self.datatype} {self.vec} {self.name}'
+        return f'{self.io} {self.datatype} {self.name}'
+
+    def task_declaration(self):
+        return f'{self.io} {self.datatype} {self.vec} {self.name}'.replace('  ',' ')
+
+class Param:
+    ''' Module parameter (declaration) or parameter override (instance) '''
+    __slots__ = ('name','value')
+
+    def __init__(self,name,value):
+        self.name = name
+        self.value = value
+
+    @classmethod
+    def get(cls,p):
+        ''' Param from {param:,value:} '''
+        return p if isinstance(p,Param) else cls(p['param'],p['value'])
+
+class Connection:
+    ''' Instance port connection '''
+    __slots__ = ('port','signal')
+
+    def __init__(self,port,signal):
+        self.port = port
+        self.signal = signal
+
+    @classmethod
+    def get(cls,p):
+        ''' Connection from {port:,signal:} '''
+        return p if isinstance(p,Connection) else cls(p['port'],p['signal'])
+
+class Variable:
+    ''' Task/function variable. Memories have vec and depth '''
+    __slots__ = ('name','datatype','length','vec','depth')
+
+    def __init__(self,name,datatype,length=1,vec=None,depth=None):
+        self.name = name
+        self.datatype = datatype
+        self.length = length
+        self.vec = vec
+        self.depth = depth
+
+    @classmethod
+    def get(cls,v):
+        ''' Variable from {name:,datatype:,length:} or {name:,datatype:,vec:,depth:} '''
+        if isinstance(v,Variable):
+            return v
+        return cls(v['name'],v['datatype'],v.get('length',1),v.get('vec'),v.get('depth'))
+
+    def declaration(self,tab=TAB):
+        if self.depth is not None:
+            return declare_memory(self.datatype,self.name,self.vec,self.depth,tab)
+        return declare_signal_packed_1d(self.datatype,self.name,self.length,tab)
+
+class Text(Node):
+    ''' Verbatim lines '''
+    __slots__ = ('text',)
+
+    def __init__(self,text):
+        self.text = text
+
+    def emit(self,indent=''):
+        yield indent_text(self.text,indent)
+
+class Statement(Node):
+    ''' Single statement e.g. Statement.assign("a","b") -> "a = b;" '''
+    __slots__ = ('text',)
+
+    def __init__(self,text):
+        self.text = text
+
+    @classmethod
+    def assign(cls,lhs,rhs):
+        return cls(f'{lhs} = {rhs};')
+
+    def emit(self,indent=''):
+        yield f'{indent}{self.text}\n'
+
+class Block(Node):
+    ''' head, body indented by one level, tail (e.g. "begin\\n",[...],"end\\n") '''
+    __slots__ = ('head','body','tail')
+
+    def __init__(self,head,body,tail):
+        self.head = head
+        self.body = body
+        self.tail = tail
+
+    def emit(self,indent=''):
+        yield indent_text(self.head,indent)
+        yield from emit_nodes(self.body,indent+TAB)
+        yield indent_text(self.tail,indent)
+
+class Instance(Node):
+    ''' Module instantiation '''
+    __slots__ = ('module','name','params','ports')
+
+    def __init__(self,module,name,params=(),ports=()):
+        self.module = module
+        self.name = name
+        self.params = [Param.get(p) for p in params]
+        self.ports = [Connection.get(p) for p in ports]
+
+    def params_str(self,tab=TAB):
+        if not self.params:
+            return f'{self.name} (\n'
+        return '#(\n' + ',\n'.join(f'{tab}.{p.name}({p.value})' for p in self.params) + f'\n) {self.name} (\n'
+
+    def ports_str(self,tab=TAB):
+        return ',\n'.join(f'{tab}.{p.port}({p.signal})' for p in self.ports) + '\n);\n' if self.ports else ''
+
+    def emit(self,indent=''):
+        yield indent_text(f'{self.module} {self.params_str()}{self.ports_str()}',indent)
+
+class Task(Node):
+    ''' Task (or function if ret is not None) with ports, variables and body (indented by tab) '''
+    __slots__ = ('name','ports','variables','body','ret','tab')
+
+    def __init__(self,name,ports=(),variables=(),body=(),ret=None,tab=TAB):
+        self.name = name
+        self.ports = [Port.get(p) for p in ports]
+        self.variables = [Variable.get(v) for v in variables]
+        self.body = body
+        self.ret = ret
+        self.tab = tab
+
+    def emit(self,indent=''):
+        kind = 'task' if self.ret is None else 'function'
+        head = begin_section(f"{kind.capitalize()} Declaration: {self.name} ")
+        name = self.name if self.ret is None else f'{self.ret} {self.name}'
+        if self.ports:
+            head += f'{kind} {name} (\n'
+            head += ',\n'.join(self.tab+p.task_declaration() for p in self.ports) + '\n);\n'
+        else:
+            head += f'{kind} {name} ();\n'
+        head += ''.join(v.declaration(self.tab) for v in self.variables)
+        yield indent_text(head+'begin\n',indent)
+        yield from emit_nodes(self.body,indent+self.tab)
+        yield indent_text(f'end\nend{kind}\n'+end_section(),indent)
+
+class Module(Node):
+    ''' Module declaration with body. config (dict or dumped YAML) is embedded as a comment '''
+    __slots__ = ('name','params','ports','body','time_unit','time_precision','config')
+
+    def __init__(self,name,params=(),ports=(),body=(),time_unit='1ns',time_precision='1ps',config=None):
+        self.name = name
+        self.params = [Param.get(p) for p in params]
+        self.ports = [Port.get(p) for p in ports]
+        self.body = body
+        self.time_unit = time_unit
+        self.time_precision = time_precision
+        self.config = config
+
+    def params_str(self,tab=TAB):
+        if not self.params:
+            return ''
+        return '#(\n' + ',\n'.join(f'{tab}parameter {p.name} = {p.value}' for p in self.params) + '\n) ('
+
+    def ports_str(self,tab=TAB):
+        if not self.ports:
+            return ');\n\n'
+        return '\n' + ',\n'.join(tab+p.declaration() for p in self.ports) + '\n);\n\n'
+
+    def declaration(self):
+        ''' "module name #(...) (...);" '''
+        return f'module {self.name} {self.params_str()}{self.ports_str()}'
+
+    def emit(self,indent=''):
+        if self.config is not None:
+            yield yaml_comment(self.config,"Autogenerated verilog module: {name}")
+        yield begin_section(f"Module declaration: {self.name}") 
+        yield default_nettype("none")
+        yield timescale(self.time_unit,self.time_precision)
+        yield self.declaration()
+        yield from emit_nodes(self.body)
+        yield 'endmodule\n'
+        yield default_nettype("wire")
+        yield end_section()
+
 #----------------------------------------------------------
 # Verilog code gen functions 
 #----------------------------------------------------------
@@ -71,8 +309,8 @@ def set_var(name,value):
     return f'{name} = {value};\n'
 
 def declare_signal_packed_1d(signal_type,name,length,tab=4*' '):
-    if length > 1:
-        return f'{tab}{signal_type} [{length-1}:0] {name};\n'
+    if isinstance(length,str) or length > 1:
+        return f'{tab}{signal_type} {vec_range(length)} {name};\n'
     else:
         return f'{tab}{signal_type} {name};\n'
 
@@ -80,6 +318,14 @@ def declare_signal_2d(signal_type,name,packed_length,unpacked_length,tab=''):
     """ Declares a 2d unpacked array """
     return f'{tab}{signal_type} [{packed_length-1}:0] {name} [{unpacked_length-1}:0];\n'
 
+def declare_memory(signal_type,name,vec,depth,tab=''):
+    """ Declares a memory. vec and depth may be defines e.g. vec='[`W-1:0]',depth='`D' """
+    return f'{tab}{signal_type} {vec} {name} [0:{depth}-1];\n'
+
+def vec_range(length):
+    """ Returns [length-1:0] for int or define/parameter length """
+    return f'[{length-1}:0]' if isinstance(length,int) else f'[{length}-1:0]'
+
 def wire(name,length=1,tab=''):
     """ Wire supports simple packed array """
     return declare_signal_packed_1d('wire',name,length,tab)
@@ -167,32 +413,15 @@ def vlog_mod_inst(name,inst,parameters,ports):
     :param ports list of {port:,signal:} 
     :param parameters list of {param:,value:} 
     '''
-    rstr = f'{name} '
-    rstr += vlog_mod_inst_params(inst,parameters)
-    rstr += vlog_mod_inst_ports(ports)
-    return rstr
+    return render(Instance(name,inst,parameters,ports))
 
 def vlog_mod_inst_ports(ports,tab=4*" "):
     ''' ports for instantiation '''
-    rstr = ''
-    for i,port in enumerate(ports):
-        rstr += f"{tab}.{port['port']}({port['signal']})" 
-        if (len(ports)-1)==i:
-            rstr += '\n);\n'
-        else:
-            rstr += ',\n'
-    return rstr
+    return Instance(None,None,ports=ports).ports_str(tab)
 
 def vlog_mod_inst_params(inst,parameters,tab=4*' '):
     ''' parameters for instantiation '''
-    rstr = '#(\n' if parameters else f'{inst} (\n' 
-    for i,p in enumerate(parameters):
-        rstr += f"{tab}.{p['param']}({p['value']})" 
-        if (len(parameters)-1)==i:
-            rstr += f'\n) {inst} (\n'
-        else:
-            rstr += ',\n'
-    return rstr
+    return Instance(None,inst,parameters).params_str(tab)
 
 def vlog_mod_dec_params(parameters,tab=4*' '):
     ''' 
@@ -200,73 +429,69 @@ def vlog_mod_dec_params(parameters,tab=4*' '):
     For declaration. parameter is a dict with 'param' field and 'value' field 
     :param parameters {param: str, value: Any} 
     '''
-    rstr = '#(\n' if parameters else ''
-    for i,p in enumerate(parameters):
-        rstr += f"{tab}parameter {p['param']} = {p['value']}" 
-        if (len(parameters)-1)==i:
-            rstr += '\n) ('
-        else:
-            rstr += ',\n'
-    return rstr
+    return Module(None,parameters).params_str(tab)
 
 def vlog_mod_dec_ports(ports,tab=4*" "):
     ''' ports for declaration '''
-    rstr = '\n' if ports else ');\n\n'
-    for i,p in enumerate(ports):
-        if p["vec"] is not None:
-            rstr += f'{tab}{p["io"]} {p["datatype"]} {p["vec"]} {p["name"]}'
-        else:
-            rstr += f'{tab}{p["io"]} {p["datatype"]} {p["name"]}'
-        if (len(ports)-1)==i:
-            rstr += '\n);\n\n'
-        else:
-            rstr += ',\n'
-    return rstr
+    return Module(None,ports=ports).ports_str(tab)
 
 def vlog_mod_dec(name,ports,parameters):
     ''' Writes beginning of verilog module
     :param ports list of {name:,io:,datatype:,vec:} 
     :param parameters list of {param:,value:} 
     '''
-    rstr = f'module {name} '
-    rstr += vlog_mod_dec_params(parameters)
-    rstr += vlog_mod_dec_ports(ports)
-    return rstr
+    return Module(name,parameters,ports).declaration()
 
 def add_tabs(string,tab=4*' '):
     """ Adds tabs to every new line """
-    string_list = [s+'\n' for s in string.splitlines()]
-    string_list[0] = tab + string_list[0]
-    return tab.join(string_list) 
+    return ''.join(tab+line+'\n' for line in string.splitlines())
 
 def vlog_task(name,ports,variables,internals='',tab=4*' '):
     ''' Writes beginning of verilog module
     :param name name of task
     :param ports list of {name:,io:,datatype:,vec:} 
-    :param variables list of {name:,datatype:,length} 
-    :param func function to fill out internal (returns str)
+    :param variables list of {name:,datatype:,length} or {name:,datatype:,vec:,depth:} for memories
+    :param internals str, IR node or list of both
+    :param tab indentation of ports, variables and internals
     '''
-    rstr = begin_section(f"Task Declaration: {name} ")
-    # Declare ports
-    rstr += f'task {name} (\n' if ports else f'task {name} ();\n'
-    for i,p in enumerate(ports):
-        rstr += tab + f'{p["io"]} {p["datatype"]} {p["vec"]} {p["name"]}'.replace('  ',' ')
-        if (len(ports)-1)==i:
-            rstr += '\n);\n'
-        else:
-            rstr += ',\n'
-    # Declare variables
-    for v in variables:
-        rstr += declare_signal_packed_1d(v['datatype'],v['name'],v['length'],tab)
-    rstr += "begin\n"
-    rstr += add_tabs(internals,tab)
-    rstr += "end\nendtask\n"
-    rstr += end_section()
+    return render(Task(name,ports,variables,internals,tab=tab))
+
+def vlog_function(name,ret,ports,variables,internals='',tab=4*' '):
+    ''' Verilog function (same arguments as vlog_task)
+    :param ret return type/range e.g. "integer" or "[0:0]"
+    '''
+    return render(Task(name,ports,variables,internals,ret=ret,tab=tab))
+
+def two_phase_scan_task(name,clk_en,s_in,s_out,s_en,s_update,scan_cycle,length=4096,chains=None,max_length=None):
+    """ 
+    Two phase scan task 
+    :param length max scan chain length in bits (int or define e.g. "`chain_ScanChainLength")
+    :param chains list of (offset,length) of parallel chains (see parallel_scan_str)
+    :param max_length length of the longest parallel chain
+    """
+    ports = [
+        {"name": "scan_in_data", "io": "input", "datatype": '', "vec": vec_range(length)},
+        {"name": "scan_out_data", "io": "output", "datatype": "reg", "vec": vec_range(length)},
+    ]
+    if chains is None:
+        ports.append({"name": "length", "io": "input", "datatype": "integer","vec":''})
+        internals = two_phase_scan_str(clk_en,s_in,s_out,s_en,s_update,scan_cycle)
+    else:
+        internals = parallel_scan_str(clk_en,s_in,s_out,s_en,s_update,scan_cycle,chains,max_length)
+    rstr = vlog_task(
+        name=name,
+        ports=ports,
+        variables=[
+            {"name": "i", "datatype": "integer", "length": 1},
+            {"name": "j", "datatype": "integer", "length": 1}
+        ],
+        internals=internals
+    )
     return rstr
 
-def two_phase_scan_task(name,clk_en,s_in,s_out,s_en,s_update,scan_cycle):
-    """ Two phase scan task """
-    scan_str="""// Enable scan
+def two_phase_scan_str(clk_en,s_in,s_out,s_en,s_update,scan_cycle):
+    """ Shifts length bits of scan_in_data in (and scan_out_data out) and then updates """
+    return f"""// Enable scan
 {clk_en} = 1'b1;
 {s_en} = 1'b1;
 
@@ -292,20 +517,108 @@ end
 {s_update} = 1'b0;
 #({scan_cycle});
 """
-    rstr = vlog_task(
+
+def parallel_scan_str(clk_en,s_in,s_out,s_en,s_update,scan_cycle,chains,max_length):
+    """ 
+    Shifts all parallel chains at once and then updates. Chain k holds bits
+    [offset+length-1:offset] of scan_in_data/scan_out_data and is driven on
+    s_in[k]. Shorter chains are padded with leading zeros so that every
+    chain is loaded after max_length cycles.
+    :param chains list of (offset,length) (ints or defines)
+    """
+    shift_in = ''
+    shift_out = ''
+    for k,(offset,length) in enumerate(chains):
+        shift_in += f"    {s_in}[{k}] = (i >= {max_length}-{length}) ? scan_in_data[{offset}+{max_length}-1-i] : 1'b0;\n"
+        shift_out += f"    if (i < {length}) scan_out_data[{offset}+{length}-1-i] = {s_out}[{k}];\n"
+    return f"""// Enable scan
+{clk_en} = 1'b1;
+{s_en} = 1'b1;
+
+// MSB bits of every chain are scanned in first            
+for (i = 0; i < {max_length}; i = i + 1) begin
+    // Scan In
+{shift_in}    // Scan Out
+{shift_out}    #({scan_cycle});
+end
+
+// Disable scan 
+#({scan_cycle});
+{clk_en} = 1'b0;
+{s_en} = 1'b0;
+
+// Update
+#({scan_cycle});
+{s_update} = 1'b1;
+#({scan_cycle});
+{s_update} = 1'b0;
+#({scan_cycle});
+"""
+
+def bulk_scan_task(name,clk_en,s_in,s_out,s_en,s_update,scan_cycle,length,depth,fname_len=1024,chains=None,max_length=None):
+    """ 
+    Loads up to depth scan vectors from a $readmemh file and shifts them back-to-back.
+    scan_out_mem[k] holds the bits shifted out while vector k was shifted in.
+    Scan out data of every vector is written to out_fname ($writememh) and, if
+    expected_fname is not "", compared against the expected vectors in bulk
+    (optionally masked by mask_fname) once all vectors have been shifted.
+    :param length scan chain length in bits (int or define)
+    :param depth max number of vectors (int or define)
+    :param chains list of (offset,length) of parallel chains (see parallel_scan_str)
+    """
+    if chains is None:
+        scan_str = two_phase_scan_str(clk_en,s_in,s_out,s_en,s_update,scan_cycle)
+    else:
+        scan_str = parallel_scan_str(clk_en,s_in,s_out,s_en,s_update,scan_cycle,chains,max_length)
+    internals = [Text("""$readmemh(in_fname,scan_in_mem);
+errors = 0;
+
+// Shift all vectors
+"""),Block("for (k = 0; k < count; k = k + 1) begin\n",[
+        Statement.assign('scan_in_data','scan_in_mem[k]'),
+        Statement.assign('length',length),
+        Text(scan_str),
+        Statement.assign('scan_out_mem[k]','scan_out_data')
+    ],"end\n"),Text(f"""if (out_fname != "") $writememh(out_fname,scan_out_mem,0,count-1);
+
+// Compare against expected scan out
+if (expected_fname != "") begin
+    $readmemh(expected_fname,expected_mem);
+    for (k = 0; k < count; k = k + 1) mask_mem[k] = {{{length}{{1'b1}}}};
+    if (mask_fname != "") $readmemh(mask_fname,mask_mem);
+    for (k = 0; k < count; k = k + 1) begin
+        if (((scan_out_mem[k] ^ expected_mem[k]) & mask_mem[k]) !== {{{length}{{1'b0}}}}) begin
+            if (errors < 10) $display("[FAILED] scan vector %0d: expected %h got %h",k,expected_mem[k],scan_out_mem[k]);
+            errors = errors + 1;
+        end
+    end
+    $display("[%s] %0d/%0d scan vectors matched",(errors == 0) ? "PASSED" : "FAILED",count-errors,count);
+end
+""")]
+    return vlog_task(
         name=name,
         ports=[
-            {"name": "scan_in_data", "io": "input", "datatype": '', "vec": f"[4095:0]"},
-            {"name": "scan_out_data", "io": "output", "datatype": "reg", "vec": f"[4095:0]"},
-            {"name": "length", "io": "input", "datatype": "integer","vec":''},
+            {"name": "in_fname", "io": "input", "datatype": '', "vec": vec_range(8*fname_len)},
+            {"name": "out_fname", "io": "input", "datatype": '', "vec": vec_range(8*fname_len)},
+            {"name": "expected_fname", "io": "input", "datatype": '', "vec": vec_range(8*fname_len)},
+            {"name": "mask_fname", "io": "input", "datatype": '', "vec": vec_range(8*fname_len)},
+            {"name": "count", "io": "input", "datatype": "integer", "vec": ''},
+            {"name": "errors", "io": "output", "datatype": "integer", "vec": ''},
         ],
         variables=[
+            {"name": "scan_in_mem", "datatype": "reg", "vec": vec_range(length), "depth": depth},
+            {"name": "scan_out_mem", "datatype": "reg", "vec": vec_range(length), "depth": depth},
+            {"name": "expected_mem", "datatype": "reg", "vec": vec_range(length), "depth": depth},
+            {"name": "mask_mem", "datatype": "reg", "vec": vec_range(length), "depth": depth},
+            {"name": "scan_in_data", "datatype": "reg", "length": length},
+            {"name": "scan_out_data", "datatype": "reg", "length": length},
             {"name": "i", "datatype": "integer", "length": 1},
-            {"name": "j", "datatype": "integer", "length": 1}
+            {"name": "j", "datatype": "integer", "length": 1},
+            {"name": "k", "datatype": "integer", "length": 1},
+            {"name": "length", "datatype": "integer", "length": 1}
         ],
-        internals=scan_str
+        internals=internals
     )
-    return rstr
 
 def vlog_file(name,ports,parameters,internals,time_unit='1ns',time_precision='1ps',config=None):
     """ 
@@ -315,15 +628,50 @@ def vlog_file(name,ports,parameters,internals,time_unit='1ns',time_precision='1p
     :param func function to generate internals of module (returns str)
     :param config dictionary that defines verilog module 
     """
-    rstr = ''
-    if config is not None:
-        rstr += yaml_comment(config,"Autogenerated verilog module: {name}")
-    rstr += begin_section(f"Module declaration: {name}") 
-    rstr += default_nettype("none")
-    rstr += timescale(time_unit,time_precision)
-    rstr += vlog_mod_dec(name,ports,parameters)
-    rstr += internals 
-    rstr += 'endmodule\n'
-    rstr += default_nettype("wire")
-    rstr += end_section()
-    return rstr
+    return ''.join(iter_vlog_file(name,ports,parameters,internals,time_unit,time_precision,config))
+
+def iter_vlog_file(name,ports,parameters,internals,time_unit='1ns',time_precision='1ps',config=None):
+    """ 
+    Same as vlog_file but yields the module piece by piece
+    :param internals str, IR node or iterable of both (e.g. a generator of tasks)
+    """
+    return Module(name,parameters,ports,internals,time_unit,time_precision,config).emit()
+
+def write_file(fname,chunks,buffer_size=1<<16):
+    """ 
+    Streams chunks to file through a large write buffer 
+    :param chunks iterable of str (e.g. generator returned by iter_vlog_file)
+    """
+    with open(fname,'w',buffering=buffer_size) as fp:
+        fp.writelines(chunks)
+
+def write_file_if_changed(fname,chunks,buffer_size=1<<16):
+    """ 
+    Streams chunks to a temporary file and only replaces fname (atomically) if
+    the contents differ, so unchanged files keep their timestamps.
+    Returns True if fname was written
+    """
+    fname = Path(fname)
+    tmp = fname.parent / f'.{fname.name}.{os.getpid()}.tmp'
+    h = hashlib.sha1()
+    try:
+        with open(tmp,'wb',buffering=buffer_size) as fp:
+            for chunk in chunks:
+                chunk = chunk.encode()
+                h.update(chunk)
+                fp.write(chunk)
+    except BaseException:
+        # Keep the original error if the temporary file was never created
+        try:
+            tmp.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    try:
+        if fname.stat().st_size == tmp.stat().st_size and hash_file(fname) == h.hexdigest():
+            tmp.unlink()
+            return False
+    except FileNotFoundError:
+        pass
+    os.replace(tmp,fname)
+    return True
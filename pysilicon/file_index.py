@@ -0,0 +1,113 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+#----------------------------------------------------------
+# Utility functions
+#----------------------------------------------------------
+def hash_file(fname,chunk_size=1<<20):
+    ''' Returns sha1 hex digest of file contents '''
+    h = hashlib.sha1()
+    with open(fname,'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size),b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def atomic_write(fname,fstr,mode='w'):
+    ''' Writes to temporary file next to fname and then renames it into place '''
+    fname = Path(fname)
+    tmp = fname.parent / f'.{fname.name}.{os.getpid()}.tmp'
+    with open(tmp,mode) as fp:
+        fp.write(fstr)
+    os.replace(tmp,fname)
+
+#----------------------------------------------------------
+# Incrementally updated on-disk file index
+#----------------------------------------------------------
+class FileIndex:
+    '''
+    Caches records parsed from files on disk. Entries are keyed by file content
+    hash so that only files whose contents changed are parsed again. The
+    (size,mtime) pair of each file is stored as well so that unchanged files
+    are not even rehashed.
+    Subclasses implement parse(path) which returns a JSON serializable list.
+    '''
+    version = 1
+
+    def __init__(self,cache_fname):
+        self.cache_fname = Path(cache_fname)
+        self.files = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        ''' Loads cache from disk (silently starts empty if missing or stale) '''
+        try:
+            with open(self.cache_fname,'r') as fp:
+                cache = json.load(fp)
+        except (FileNotFoundError,ValueError):
+            return
+        if cache.get('version') == self.version and cache.get('kind') == type(self).__name__:
+            self.files = cache['files']
+
+    def save(self):
+        ''' Writes cache to disk if anything changed '''
+        if self.dirty:
+            self.cache_fname.parent.mkdir(parents=True,exist_ok=True)
+            atomic_write(self.cache_fname,json.dumps({
+                'version': self.version,
+                'kind': type(self).__name__,
+                'files': self.files
+            }))
+            self.dirty = False
+
+    def parse(self,path):
+        ''' Returns list of records for file at path '''
+        raise NotImplementedError
+
+    def update(self,paths,prune=True):
+        '''
+        Brings index up to date for all paths. Returns list of reparsed paths
+        :param prune removes entries of files that are not in paths
+        '''
+        reparsed = []
+        keys = set()
+        for path in paths:
+            key = str(Path(path).resolve())
+            keys.add(key)
+            try:
+                st = os.stat(key)
+            except FileNotFoundError:
+                # Listed files that were deleted are dropped (also without prune)
+                if self.files.pop(key,None) is not None:
+                    self.dirty = True
+                continue
+            entry = self.files.get(key)
+            if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                continue
+            digest = hash_file(key)
+            if entry is None or entry['hash'] != digest:
+                entry = {'hash': digest,'records': self.parse(key)}
+                reparsed.append(key)
+            entry['size'] = st.st_size
+            entry['mtime_ns'] = st.st_mtime_ns
+            self.files[key] = entry
+            self.dirty = True
+        if prune:
+            for key in [k for k in self.files if k not in keys]:
+                del self.files[key]
+                self.dirty = True
+        if self.dirty:
+            self.changed()
+        return reparsed
+
+    def changed(self):
+        ''' Hook for subclasses that keep derived lookup tables '''
+        pass
+
+    def records(self):
+        ''' Iterates over (path,record) for all indexed files '''
+        for key,entry in self.files.items():
+            for record in entry['records']:
+                yield key,record
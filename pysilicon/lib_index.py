@@ -0,0 +1,205 @@
+import re
+import gzip
+import mmap
+from pysilicon.file_index import FileIndex
+
+# NOTE Liberty and LEF files are scanned as bytes straight from an mmap, so a
+# NOTE multi-GB .lib is never decoded or split into lines. Group keywords are
+# NOTE located with bytes.find (memchr speed) and only then matched with a regex,
+# NOTE so timing tables are skipped instead of being tried position by position.
+# NOTE Only the attributes needed for cell lists, areas and corner info are read.
+
+WORD_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+
+def find_all(buf,keyword,regex,start=0,end=None):
+    ''' Yields matches of regex (which starts with keyword) at occurrences of keyword that start a word '''
+    end = len(buf) if end is None else end
+    pos = buf.find(keyword,start,end)
+    while pos >= 0:
+        if pos == 0 or buf[pos-1] not in WORD_BYTES:
+            m = regex.match(buf,pos,end)
+            if m:
+                yield m
+        pos = buf.find(keyword,pos+len(keyword),end)
+
+def find_first(buf,keyword,regex,start=0,end=None):
+    ''' Returns first match of find_all or None '''
+    return next(find_all(buf,keyword,regex,start,end),None)
+
+#----------------------------------------------------------
+# Liberty scanning
+#----------------------------------------------------------
+RE_LIB_LIBRARY = re.compile(rb'library\s*\(\s*"?([^"\s)]+)"?\s*\)')
+RE_LIB_CELL = re.compile(rb'cell\s*\(\s*"?([^"\s)]+)"?\s*\)\s*\{')
+RE_LIB_PIN = re.compile(rb'pin\s*\(\s*"?([^"\s)]+)"?\s*\)\s*\{')
+RE_LIB_OPCOND = re.compile(rb'operating_conditions\s*\(\s*"?([^"\s)]+)"?\s*\)')
+LIB_HEADER_ATTRS = ('nom_process','nom_voltage','nom_temperature','time_unit','voltage_unit',
+    'current_unit','capacitive_load_unit','leakage_power_unit','default_operating_conditions')
+LIB_CELL_ATTRS = ('area','cell_leakage_power','cell_footprint','dont_use')
+
+def lib_attr(name):
+    ''' (keyword,regex) of simple attribute name ("name : value ;") '''
+    return name.encode(),re.compile(name.encode() + rb'\s*[:(]\s*"?([^";)]+?)"?\s*[;)]')
+
+RE_LIB_HEADER = {name: lib_attr(name) for name in LIB_HEADER_ATTRS}
+RE_LIB_ATTR = {name: lib_attr(name) for name in LIB_CELL_ATTRS}
+RE_LIB_DIRECTION = lib_attr('direction')
+
+def to_number(value):
+    ''' Returns float for numeric attribute values, else the string '''
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def scan_liberty(buf):
+    ''' Returns [library record] + [cell records] for Liberty contents buf (bytes or mmap) '''
+    cells = list(find_all(buf,b'cell',RE_LIB_CELL))
+    header_end = cells[0].start() if cells else len(buf)
+    m = find_first(buf,b'library',RE_LIB_LIBRARY,0,header_end)
+    library = {'kind': 'library','name': m.group(1).decode() if m else None,'cells': len(cells)}
+    for name,(keyword,regex) in RE_LIB_HEADER.items():
+        am = find_first(buf,keyword,regex,0,header_end)
+        if am:
+            library[name] = to_number(am.group(1).decode().strip())
+    library['operating_conditions'] = [om.group(1).decode()
+        for om in find_all(buf,b'operating_conditions',RE_LIB_OPCOND,0,header_end)]
+    records = [library]
+    for i,cm in enumerate(cells):
+        end = cells[i+1].start() if i+1 < len(cells) else len(buf)
+        # Cell attributes come before the first pin group
+        pins = list(find_all(buf,b'pin',RE_LIB_PIN,cm.end(),end))
+        attr_end = pins[0].start() if pins else end
+        cell = {'kind': 'cell','name': cm.group(1).decode()}
+        for name,(keyword,regex) in RE_LIB_ATTR.items():
+            am = find_first(buf,keyword,regex,cm.end(),attr_end)
+            if am:
+                cell[name] = to_number(am.group(1).decode().strip())
+        cell['dont_use'] = cell.get('dont_use') == 'true'
+        cell['pins'] = {}
+        for j,pm in enumerate(pins):
+            dm = find_first(buf,*RE_LIB_DIRECTION,pm.end(),pins[j+1].start() if j+1 < len(pins) else end)
+            cell['pins'][pm.group(1).decode()] = dm.group(1).decode().strip() if dm else None
+        records.append(cell)
+    return records
+
+#----------------------------------------------------------
+# LEF scanning
+#----------------------------------------------------------
+RE_LEF_MACRO = re.compile(rb'MACRO[ \t]+(\S+)')
+RE_LEF_PIN = re.compile(rb'PIN[ \t]+(\S+)')
+RE_LEF_CLASS = re.compile(rb'^[ \t]*CLASS[ \t]+([^;\n]+?)[ \t]*;',re.M)
+RE_LEF_SIZE = re.compile(rb'^[ \t]*SIZE[ \t]+(\S+)[ \t]+BY[ \t]+(\S+)[ \t]*;',re.M)
+RE_LEF_SITE = re.compile(rb'^[ \t]*SITE[ \t]+(\S+)',re.M)
+RE_LEF_DIRECTION = re.compile(rb'^[ \t]*DIRECTION[ \t]+(\w+)',re.M)
+RE_LEF_UNITS = re.compile(rb'DATABASE[ \t]+MICRONS[ \t]+(\S+)[ \t]*;')
+
+def scan_lef(buf):
+    ''' Returns [lef record] + [macro records] for LEF contents buf (bytes or mmap) '''
+    macros = list(find_all(buf,b'MACRO',RE_LEF_MACRO))
+    header_end = macros[0].start() if macros else len(buf)
+    um = RE_LEF_UNITS.search(buf,0,header_end)
+    records = [{'kind': 'lef','macros': len(macros),'dbu_per_micron': float(um.group(1)) if um else None,
+        'sites': [sm.group(1).decode() for sm in RE_LEF_SITE.finditer(buf,0,header_end)]}]
+    for i,mm in enumerate(macros):
+        end = macros[i+1].start() if i+1 < len(macros) else len(buf)
+        pins = list(find_all(buf,b'PIN',RE_LEF_PIN,mm.end(),end))
+        attr_end = pins[0].start() if pins else end
+        macro = {'kind': 'macro','name': mm.group(1).decode()}
+        cm = RE_LEF_CLASS.search(buf,mm.end(),attr_end)
+        macro['class'] = cm.group(1).decode().strip() if cm else None
+        sm = RE_LEF_SIZE.search(buf,mm.end(),attr_end)
+        macro['size'] = [float(sm.group(1)),float(sm.group(2))] if sm else None
+        sm = RE_LEF_SITE.search(buf,mm.end(),attr_end)
+        macro['site'] = sm.group(1).decode() if sm else None
+        macro['pins'] = {}
+        for j,pm in enumerate(pins):
+            dm = RE_LEF_DIRECTION.search(buf,pm.end(),pins[j+1].start() if j+1 < len(pins) else end)
+            macro['pins'][pm.group(1).decode()] = dm.group(1).decode().lower() if dm else None
+        records.append(macro)
+    return records
+
+def scan_file(path):
+    ''' Scans Liberty (.lib) or LEF (.lef) file (optionally gzipped) '''
+    name = str(path).lower()
+    scan = scan_lef if name.endswith('.lef') or name.endswith('.lef.gz') else scan_liberty
+    if name.endswith('.gz'):
+        with gzip.open(path,'rb') as fp:
+            return scan(fp.read())
+    with open(path,'rb') as fp:
+        try:
+            buf = mmap.mmap(fp.fileno(),0,access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return scan(b'')
+        with buf:
+            return scan(buf)
+
+#----------------------------------------------------------
+# Standard cell index
+#----------------------------------------------------------
+class LibIndex(FileIndex):
+    '''
+    Index of standard cells of Liberty and LEF files (cached on disk, keyed by
+    file hash). Liberty files yield one library record (name, corner and units)
+    and cell records {name:,area:,cell_leakage_power:,cell_footprint:,dont_use:,pins:}.
+    LEF files yield macro records {name:,class:,size:,site:,pins:}.
+    '''
+    version = 1
+
+    def __init__(self,cache_fname):
+        self.cells = None
+        super().__init__(cache_fname)
+
+    def parse(self,path):
+        return scan_file(path)
+
+    def changed(self):
+        self.cells = None
+
+    def lookup_table(self):
+        ''' Returns (and lazily builds) dict cell name -> {libs: [(file,record)],lef: (file,record)} '''
+        if self.cells is None:
+            self.cells = {}
+            for path,record in self.records():
+                if record['kind'] == 'cell':
+                    self.cells.setdefault(record['name'],{'libs': [],'lef': None})['libs'].append((path,record))
+                elif record['kind'] == 'macro':
+                    self.cells.setdefault(record['name'],{'libs': [],'lef': None})['lef'] = (path,record)
+        return self.cells
+
+    def libraries(self):
+        ''' Returns library records (name, corner and units) with their file '''
+        return [dict(record,file=path) for path,record in self.records() if record['kind'] == 'library']
+
+    def cell_names(self,dont_use=True):
+        ''' Returns sorted names of all cells (optionally without dont_use cells) '''
+        return sorted(name for name,entry in self.lookup_table().items()
+            if dont_use or not any(r['dont_use'] for _,r in entry['libs']))
+
+    def cell(self,name):
+        ''' Returns merged record of cell name (first library wins) or None '''
+        entry = self.lookup_table().get(name)
+        if entry is None:
+            return None
+        cell = dict(entry['libs'][0][1]) if entry['libs'] else {'name': name,'pins': {}}
+        cell['libs'] = [path for path,_ in entry['libs']]
+        if entry['lef']:
+            cell['lef'] = entry['lef'][0]
+            cell['size'] = entry['lef'][1]['size']
+            cell['class'] = entry['lef'][1]['class']
+        return cell
+
+    def area(self,name):
+        ''' Returns area of cell name from Liberty (or LEF size) or None '''
+        cell = self.cell(name)
+        if cell is None:
+            return None
+        if isinstance(cell.get('area'),float):
+            return cell['area']
+        return cell['size'][0]*cell['size'][1] if cell.get('size') else None
+
+    def missing(self,names):
+        ''' Returns names that are not cells of the index '''
+        table = self.lookup_table()
+        return [name for name in names if name not in table]
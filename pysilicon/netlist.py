@@ -0,0 +1,225 @@
+import re
+import sys
+import gzip
+import argparse
+from collections import Counter
+from pysilicon.file_index import FileIndex
+
+# NOTE Structural netlists are read in fixed size chunks, comments are removed and
+# NOTE each block of complete statements is matched with one findall per module
+# NOTE (C speed, one bytes object per instance), so memory use is bounded by the
+# NOTE chunk size and only a counter of cell types is kept per module.
+
+# Escaped identifier containing "//" or "/*" (kept), line comment, block comment, unterminated block comment
+RE_COMMENT = re.compile(rb'(\\(?=\S*/[/*])\S+)|//[^\n]*|/\*.*?\*/|(/\*.*)',re.S)
+IDENT = rb'(?:\\\S+|[A-Za-z_][\w$]*)'
+RE_MODULE_HEAD = re.compile(rb'module\s+(' + IDENT + rb')')
+SPACE_BYTES = frozenset(b' \t\r\n\f\v;')
+# ";" cell type, optional #(parameters) (two nesting levels), instance name, optional array range, "("
+RE_INST = re.compile(rb';\s*(' + IDENT + rb')\s*(?:#\s*\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\)\s*)?'
+    + IDENT + rb'\s*(?:\[[^\]]*\]\s*)?\(')
+KEYWORDS = frozenset(b'''module input output inout wire reg tri tri0 tri1 wand wor supply0 supply1 assign
+    parameter localparam defparam specparam integer real time genvar generate endgenerate function task
+    initial always specify endspecify primitive table buf not and or nand nor xor xnor bufif0 bufif1
+    notif0 notif1 pullup pulldown'''.split())
+
+def open_netlist(path):
+    ''' Opens netlist (optionally gzipped) for reading bytes '''
+    return gzip.open(path,'rb') if str(path).endswith('.gz') else open(path,'rb')
+
+def strip_comments(buf,in_comment=False):
+    '''
+    Returns (buf with comments replaced by spaces,True if buf ends inside a block comment)
+    :param in_comment buf starts inside a block comment
+    '''
+    if in_comment:
+        end = buf.find(b'*/')
+        if end < 0:
+            return b' ',True
+        buf = buf[end+2:]
+    is_open = False
+    def replace(m):
+        nonlocal is_open
+        if m.lastindex == 1:
+            return m.group(1)
+        is_open = m.lastindex == 2
+        return b' '
+    return RE_COMMENT.sub(replace,buf),is_open
+
+def iter_blocks(fp,chunk_size=1<<22):
+    '''
+    Yields blocks of verilog stream fp with comments removed. Every block starts with
+    ";" and (except for the last one) ends right before a ";", so statements never
+    cross blocks
+    '''
+    rest = b''
+    partial = b';'
+    in_comment = False
+    while True:
+        data = fp.read(chunk_size)
+        buf = rest + data
+        if data:
+            # Only complete lines are processed (block comments may span chunks)
+            cut = buf.rfind(b'\n')+1
+            if cut == 0:
+                rest = buf
+                continue
+            rest = buf[cut:]
+            buf = buf[:cut]
+        buf,in_comment = strip_comments(buf,in_comment)
+        block = partial + buf
+        if not data:
+            yield block
+            return
+        last = block.rfind(b';')
+        if last > 0:
+            yield block[:last]
+            block = block[last:]
+        partial = block
+
+def find_modules(block):
+    '''
+    Yields (position,module name) of module headers and (position,None) of endmodule
+    keywords in block. Keywords are located with bytes.find and only count when
+    delimited by whitespace (escaped names may contain "/module/")
+    '''
+    pos = block.find(b'module')
+    while pos >= 0:
+        if pos >= 3 and block[pos-3:pos] == b'end':
+            end = pos+6
+            if (pos == 3 or block[pos-4] in SPACE_BYTES) and (end == len(block) or block[end] in SPACE_BYTES):
+                yield pos-3,None
+        elif pos == 0 or block[pos-1] in SPACE_BYTES:
+            m = RE_MODULE_HEAD.match(block,pos)
+            if m:
+                yield pos,m
+        pos = block.find(b'module',pos+6)
+
+def count_cells(block,start,end,cells):
+    ''' Adds instances of block[start:end] to Counter cells '''
+    if start < end:
+        cells.update(Counter(RE_INST.findall(block,start,end)))
+
+def scan_netlist(fp,chunk_size=1<<22):
+    ''' Returns [{kind: module,name:,cells: {type: count}}] of the modules of netlist stream fp '''
+    modules = []
+    cells = None
+    for block in iter_blocks(fp,chunk_size):
+        start = 0
+        for pos,m in find_modules(block):
+            if cells is not None:
+                count_cells(block,start,pos,cells)
+            if m is None:
+                cells = None
+            else:
+                cells = Counter()
+                modules.append({'kind': 'module','name': m.group(1).decode(),'cells': cells})
+                # Instances start after the ";" of the module header
+                start = block.find(b';',m.end())
+                start = len(block) if start < 0 else start
+        if cells is not None:
+            count_cells(block,start,len(block),cells)
+    for module in modules:
+        module['cells'] = {cell.decode(): count for cell,count in module['cells'].items() if cell not in KEYWORDS}
+    return modules
+
+def scan_file(path,chunk_size=1<<22):
+    with open_netlist(path) as fp:
+        return scan_netlist(fp,chunk_size)
+
+#----------------------------------------------------------
+# Hierarchy helpers (modules: dict module name -> {type: count})
+#----------------------------------------------------------
+def tops(modules):
+    ''' Returns sorted names of modules that are not instantiated by another module '''
+    used = {cell for cells in modules.values() for cell in cells}
+    return sorted(name for name in modules if name not in used)
+
+def leaf_cells(modules,name,memo=None):
+    ''' Returns Counter of leaf cells (types that are not modules) of module name flattened '''
+    memo = {} if memo is None else memo
+    if name not in memo:
+        total = Counter()
+        for cell,count in modules[name].items():
+            if cell in modules:
+                for leaf,n in leaf_cells(modules,cell,memo).items():
+                    total[leaf] += n*count
+            else:
+                total[cell] += count
+        memo[name] = total
+    return memo[name]
+
+def unresolved(modules,known):
+    ''' Returns dict cell type -> [modules instantiating it] for types that are neither modules nor in known '''
+    missing = {}
+    for name,cells in modules.items():
+        for cell in cells:
+            if cell not in modules and cell not in known:
+                missing.setdefault(cell,[]).append(name)
+    return missing
+
+#----------------------------------------------------------
+# Netlist index
+#----------------------------------------------------------
+class NetlistIndex(FileIndex):
+    '''
+    Cell counts of the modules of structural netlists (cached on disk, keyed by
+    file hash so that unchanged multi-GB netlists are not read again)
+    '''
+    version = 1
+
+    def __init__(self,cache_fname):
+        self.modules = None
+        super().__init__(cache_fname)
+
+    def parse(self,path):
+        return scan_file(path)
+
+    def changed(self):
+        self.modules = None
+
+    def lookup_table(self):
+        ''' Returns (and lazily builds) dict module name -> {type: count} '''
+        if self.modules is None:
+            self.modules = {record['name']: record['cells'] for _,record in self.records()}
+        return self.modules
+
+    def tops(self):
+        return tops(self.lookup_table())
+
+    def leaf_cells(self,name):
+        return leaf_cells(self.lookup_table(),name)
+
+    def unresolved(self,known):
+        return unresolved(self.lookup_table(),known)
+
+#----------------------------------------------------------
+# Command line
+#----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reports cell counts of structural verilog netlists (.v or .v.gz).")
+    parser.add_argument('netlists',nargs='+')
+    parser.add_argument('-m','--models',nargs='*',default=[],
+        help='Verilog files (e.g. std cell rtl) defining the cells. Unresolved cells are reported.')
+    parser.add_argument('-n','--top-cells',type=int,default=10,help='Number of most used cells listed. Default: 10')
+    args = parser.parse_args(argv)
+    modules = {}
+    for f in args.netlists:
+        modules.update({m['name']: m['cells'] for m in scan_file(f)})
+    for name in sorted(modules):
+        print(f'{name}: {sum(modules[name].values())} instances of {len(modules[name])} types')
+    for top in tops(modules):
+        leaves = leaf_cells(modules,top)
+        print(f'\n{top} (flattened): {sum(leaves.values())} leaf cells of {len(leaves)} types')
+        for cell,count in leaves.most_common(args.top_cells):
+            print(f'    {cell:<24} {count}')
+    if args.models:
+        from pysilicon.vlog_index import parse_modules
+        known = set()
+        for f in args.models:
+            with open(f,'r',errors='replace') as fp:
+                known.update(m['name'] for m in parse_modules(fp.read()))
+        missing = unresolved(modules,known)
+        for cell,users in sorted(missing.items()):
+            print(f'Unresolved cell "{cell}" (used in {", ".join(sorted(users))})',file=sys.stderr)
+        sys.exit(1 if missing else 0)
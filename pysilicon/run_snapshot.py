@@ -0,0 +1,162 @@
+import os
+import re
+import json
+import uuid
+import fcntl
+import shutil
+import threading
+from pathlib import Path
+from pysilicon.file_index import FileIndex, hash_file, atomic_write
+
+# NOTE Layout: <root>/objects/<sha1[:2]>/<sha1> holds one read-only copy of every
+# NOTE input version (reflinked where the file system supports it). A run dir gets
+# NOTE inputs/<path> hardlinks to these objects plus inputs.json (the manifest),
+# NOTE so unchanged files cost one directory entry per run.
+
+FICLONE = 0x40049409
+MANIFEST = 'inputs.json'
+
+def clone_file(src,dst):
+    ''' Copies src to dst as a reflink (copy-on-write) where supported, else as a plain copy '''
+    with open(src,'rb') as fsrc, open(dst,'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(),FICLONE,fsrc.fileno())
+            return
+        except OSError:
+            pass
+        shutil.copyfileobj(fsrc,fdst,1<<20)
+
+class HashIndex(FileIndex):
+    ''' sha1 of files, only recomputed when (size,mtime) changed '''
+    def parse(self,path):
+        return []
+
+    def digest(self,path):
+        return self.files[str(Path(path).resolve())]['hash']
+
+#----------------------------------------------------------
+# Run input snapshots
+#----------------------------------------------------------
+class SnapshotStore:
+    '''
+    Content addressed store for the inputs of runs.
+    :param root store directory (e.g. <project scratch>/objects)
+    :param max_copy_size files larger than this (bytes) are only recorded by hash, not copied
+    '''
+    def __init__(self,root,max_copy_size=1<<30):
+        self.root = Path(root)
+        self.max_copy_size = max_copy_size
+        self.lock = threading.Lock()
+        self.hashes = HashIndex(self.root / 'hashes.json')
+
+    def object_path(self,digest):
+        return self.root / 'objects' / digest[:2] / digest
+
+    def add(self,path,digest):
+        ''' Stores copy of path as object digest (if missing). Returns digest of the stored copy '''
+        obj = self.object_path(digest)
+        if obj.exists():
+            return digest
+        obj.parent.mkdir(parents=True,exist_ok=True)
+        tmp = obj.parent / f'.{digest}.{uuid.uuid4().hex}'
+        clone_file(path,tmp)
+        # The file may have changed after it was hashed: the copy is what gets stored
+        actual = hash_file(tmp)
+        obj = self.object_path(actual)
+        obj.parent.mkdir(parents=True,exist_ok=True)
+        os.chmod(tmp,0o444)
+        os.replace(tmp,obj)
+        return actual
+
+    def gc(self):
+        '''
+        Deletes objects that no run dir links to anymore (link count 1, i.e. all runs
+        using them were cleaned). Returns (number of objects,bytes) freed
+        '''
+        count,size = 0,0
+        with self.lock:
+            for obj in (self.root / 'objects').glob('*/*'):
+                try:
+                    st = obj.lstat()
+                    if st.st_nlink == 1:
+                        obj.unlink()
+                        count,size = count+1,size+st.st_size
+                except FileNotFoundError:
+                    pass
+            for sub in (self.root / 'objects').glob('*'):
+                try:
+                    sub.rmdir()
+                except OSError:
+                    pass
+        return count,size
+
+    @staticmethod
+    def snapshot_name(path,wd):
+        ''' Path of input inside the snapshot dir (relative to wd if possible) '''
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(wd)
+        except ValueError:
+            return Path('_abs') / path.relative_to(path.anchor)
+
+    def snapshot(self,files,dest_dir,wd):
+        '''
+        Links files into dest_dir and returns dict path -> {sha1:,size:,snapshot:}
+        (keyed by path as given). snapshot is the path relative to dest_dir (None for
+        files above max_copy_size, which are only recorded by hash)
+        '''
+        files = [str(f) for f in files]
+        with self.lock:
+            self.hashes.update(files,prune=False)
+            self.hashes.save()
+        entries = {}
+        for f in dict.fromkeys(files):
+            if not os.path.isfile(f):
+                continue
+            digest = self.hashes.digest(f)
+            size = os.path.getsize(f)
+            entry = {'sha1': digest,'size': size,'snapshot': None}
+            if size <= self.max_copy_size:
+                digest = entry['sha1'] = self.add(f,digest)
+                name = self.snapshot_name(f,wd)
+                dest = Path(dest_dir) / name
+                dest.parent.mkdir(parents=True,exist_ok=True)
+                try:
+                    os.link(self.object_path(digest),dest)
+                except OSError:
+                    clone_file(self.object_path(digest),dest)
+                entry['snapshot'] = str(name)
+            entries[f] = entry
+        return entries
+
+#----------------------------------------------------------
+# Manifest
+#----------------------------------------------------------
+def write_manifest(exp_dir,**manifest):
+    ''' Writes inputs.json of run exp_dir '''
+    atomic_write(Path(exp_dir) / MANIFEST,json.dumps(manifest,indent=2))
+
+def read_manifest(run_dir):
+    with open(Path(run_dir) / MANIFEST,'r') as fp:
+        return json.load(fp)
+
+def substitute(fstr,mapping):
+    ''' Replaces every key of mapping in fstr by its value in a single pass (longest keys first) '''
+    if not mapping:
+        return fstr
+    regex = re.compile('|'.join(re.escape(k) for k in sorted(mapping,key=len,reverse=True)))
+    return regex.sub(lambda m: mapping[m.group(0)],fstr)
+
+def rerun_mapping(manifest,new_dir):
+    '''
+    Returns (mapping of original paths to their snapshot in new_dir/inputs and of the
+    old to the new run dir, list of recorded-only files whose contents changed since)
+    '''
+    mapping = {manifest['run_dir']: str(new_dir)}
+    changed = []
+    for f,entry in manifest['files'].items():
+        if entry['snapshot']:
+            mapping[f] = str(Path(new_dir) / 'inputs' / entry['snapshot'])
+        elif not os.path.isfile(f) or hash_file(f) != entry['sha1']:
+            changed.append(f)
+    return mapping,changed
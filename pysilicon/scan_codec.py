@@ -0,0 +1,232 @@
+import numpy as np
+from pathlib import Path
+
+# NOTE Bit i of a scan vector is ScanBits[i]. Internally vectors are held as
+# NOTE little-endian uint64 words so a field is one (or two) shifts and masks.
+# NOTE Word arrays are (nwords,N) so that every word of a batch is contiguous.
+# NOTE Files hold one vector per line, MSB first, like $readmemh/$readmemb expect.
+
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef',dtype=np.uint8)
+HEX_VALUES = np.full(256,255,dtype=np.uint8)
+HEX_VALUES[HEX_DIGITS] = np.arange(16)
+HEX_VALUES[np.frombuffer(b'ABCDEF',dtype=np.uint8)] = np.arange(10,16)
+# Byte value -> its two hex characters packed into one uint16 (in memory order)
+HEX_PAIRS = np.stack([HEX_DIGITS[np.arange(256) >> 4],HEX_DIGITS[np.arange(256) & 0xF]],axis=1).view(np.uint16).ravel()
+
+def hex_pair_values():
+    ''' Table mapping two hex characters packed into one uint16 -> byte value (0xFFFF if not hex) '''
+    hi,lo = np.meshgrid(HEX_VALUES.astype(np.uint16),HEX_VALUES.astype(np.uint16),indexing='ij')
+    codes = np.stack(np.meshgrid(np.arange(256),np.arange(256),indexing='ij'),axis=-1).astype(np.uint8)
+    table = np.empty(1<<16,dtype=np.uint16)
+    table[codes.view(np.uint16).ravel()] = np.where((hi | lo) > 15,0xFFFF,(hi << 4) | lo).ravel()
+    return table
+
+HEX_PAIR_VALUES = hex_pair_values()
+
+#----------------------------------------------------------
+# Scan vector codec
+#----------------------------------------------------------
+class ScanCodec:
+    '''
+    Encodes field values into scan vectors and decodes scan vectors into field
+    values for batches of vectors at once.
+    Values of a field are uint64 arrays of shape (N,) or (N,mult) if the cell
+    has mult > 1. Fields wider than 64 bits take an extra trailing axis of
+    64-bit words (least significant word first).
+    :param fields list of {name:,width:,mult:,min_pos:} (e.g. evaluated scan cells)
+    :param length total scan chain length in bits
+    '''
+    def __init__(self,fields,length):
+        self.length = int(length)
+        self.nwords = max(1,-(-self.length//64))
+        self.nbytes = max(1,-(-self.length//8))
+        self.fields = {}
+        for f in fields:
+            self.fields[f['name']] = {
+                'name': f['name'],
+                'width': int(f['width']),
+                'mult': int(f['mult']),
+                'min_pos': int(f['min_pos']),
+                'chunks': self.field_chunks(int(f['width']))
+            }
+
+    @classmethod
+    def from_generator(cls,sg):
+        ''' Creates codec from the layout of a ScanGenerator '''
+        return cls(sg.layout_fields(),sg.full_width)
+
+    @staticmethod
+    def field_chunks(width):
+        ''' Splits field into (bit offset,width) chunks of at most 64 bits '''
+        return [(lsb,min(64,width-lsb)) for lsb in range(0,width,64)]
+
+    def field_shape(self,field,n):
+        ''' Shape of decoded values of field for n vectors '''
+        shape = (n,) if field['mult'] == 1 else (n,field['mult'])
+        return shape if len(field['chunks']) == 1 else shape+(len(field['chunks']),)
+
+    #----------------------------------------------------------
+    # Word level bit manipulation
+    #----------------------------------------------------------
+    def put(self,words,pos,width,values):
+        ''' ORs width-bit values into (nwords,N) words at bit position pos '''
+        values = values & np.uint64((1 << width)-1)
+        w,s = divmod(pos,64)
+        if s+width > 64:
+            words[w+1] |= values >> np.uint64(64-s)
+        if s:
+            values <<= np.uint64(s)
+        words[w] |= values
+
+    def get(self,words,pos,width):
+        ''' Returns width-bit values at bit position pos of (nwords,N) words '''
+        w,s = divmod(pos,64)
+        values = words[w] >> np.uint64(s)
+        if s+width > 64:
+            values |= words[w+1] << np.uint64(64-s)
+        if width < 64:
+            values &= np.uint64((1 << width)-1)
+        return values
+
+    def instances(self,field):
+        ''' Yields (index,chunk index,bit position,chunk width) of every chunk of every instance '''
+        for n in range(field['mult']):
+            base = field['min_pos']+n*field['width']
+            for c,(lsb,width) in enumerate(field['chunks']):
+                yield n,c,base+lsb,width
+
+    #----------------------------------------------------------
+    # Encode/decode
+    #----------------------------------------------------------
+    def encode_words(self,values,n=None):
+        '''
+        Returns (nwords,N) uint64 array of scan vectors
+        :param values dict field name -> values (scalars are broadcast, missing fields are 0)
+        :param n number of vectors (default: inferred from values)
+        '''
+        if n is None:
+            n = max([np.shape(v)[0] for v in values.values() if np.ndim(v) > 0],default=1)
+        words = np.zeros((self.nwords,n),dtype=np.uint64)
+        for name,v in values.items():
+            try:
+                field = self.fields[name]
+            except KeyError:
+                raise KeyError(f'Unknown scan field "{name}"')
+            v = np.broadcast_to(np.asarray(v,dtype=np.uint64),self.field_shape(field,n))
+            for i,c,pos,width in self.instances(field):
+                vi = v if field['mult'] == 1 else v[:,i]
+                self.put(words,pos,width,vi if len(field['chunks']) == 1 else vi[...,c])
+        return words
+
+    def decode_words(self,words,names=None):
+        ''' Returns dict field name -> values for (nwords,N) uint64 scan vectors '''
+        words = np.asarray(words,dtype=np.uint64)
+        values = {}
+        for name in (names if names is not None else self.fields):
+            field = self.fields[name]
+            v = np.zeros(self.field_shape(field,words.shape[1]),dtype=np.uint64)
+            for i,c,pos,width in self.instances(field):
+                idx = (slice(None),) + ((i,) if field['mult'] > 1 else ()) + ((c,) if len(field['chunks']) > 1 else ())
+                v[idx] = self.get(words,pos,width)
+            values[name] = v
+        return values
+
+    def encode(self,values,n=None):
+        ''' Returns (N,nbytes) uint8 array of scan vectors (byte k holds ScanBits[8k+7:8k]) '''
+        return self.words_to_bytes(self.encode_words(values,n))
+
+    def decode(self,vectors,names=None):
+        ''' Returns dict field name -> values for (N,nbytes) uint8 scan vectors '''
+        return self.decode_words(self.bytes_to_words(vectors),names)
+
+    def words_to_bytes(self,words):
+        ''' (nwords,N) uint64 -> (N,nbytes) uint8 '''
+        return np.ascontiguousarray(words.T,dtype='<u8').view(np.uint8)[:,:self.nbytes]
+
+    def bytes_to_words(self,vectors):
+        ''' (N,nbytes) uint8 -> (nwords,N) uint64 '''
+        vectors = np.asarray(vectors,dtype=np.uint8)
+        padded = np.zeros((vectors.shape[0],self.nwords*8),dtype=np.uint8)
+        padded[:,:self.nbytes] = vectors[:,:self.nbytes]
+        return np.ascontiguousarray(padded.view('<u8').T,dtype=np.uint64)
+
+    #----------------------------------------------------------
+    # Vector files
+    #----------------------------------------------------------
+    def digits(self,radix):
+        return -(-self.length//4) if radix == 16 else self.length
+
+    def to_text(self,vectors,radix=16):
+        ''' Returns bytes with one vector per line (MSB first) '''
+        vectors = np.asarray(vectors,dtype=np.uint8)
+        if radix == 16:
+            chars = HEX_PAIRS[vectors[:,::-1]].view(np.uint8)
+            chars = chars[:,2*self.nbytes-self.digits(16):]
+        else:
+            bits = np.unpackbits(vectors,axis=1,bitorder='little')[:,:self.length]
+            chars = bits[:,::-1] + ord('0')
+        lines = np.empty((vectors.shape[0],chars.shape[1]+1),dtype=np.uint8)
+        lines[:,:-1] = chars
+        lines[:,-1] = ord('\n')
+        return lines.tobytes()
+
+    def from_text(self,fstr,radix=16):
+        ''' Parses vectors from $readmemh/$readmemb style text (comments and "_" are ignored) '''
+        width = self.digits(radix)
+        raw = np.frombuffer(fstr,dtype=np.uint8)
+        if raw.size % (width+1) == 0 and raw.size and np.all(raw[width::width+1] == ord('\n')):
+            chars = raw.reshape(-1,width+1)[:,:-1]
+        else:
+            chars = self.parse_lines(fstr,width)
+        if radix == 16:
+            padded = np.full((chars.shape[0],2*self.nbytes),ord('0'),dtype=np.uint8)
+            padded[:,2*self.nbytes-width:] = chars
+            values = HEX_PAIR_VALUES[padded.view(np.uint16)]
+            if values.size and values.max() > 0xFF:
+                raise ValueError('Invalid hex digit in scan vector file')
+            vectors = values[:,::-1].astype(np.uint8)
+        else:
+            bits = chars[:,::-1] - ord('0')
+            if bits.size and bits.max() > 1:
+                raise ValueError('Invalid binary digit in scan vector file')
+            vectors = np.packbits(bits,axis=1,bitorder='little')
+        return vectors[:,:self.nbytes]
+
+    @staticmethod
+    def parse_lines(fstr,width):
+        ''' Slow path for files written by a simulator '''
+        rows = []
+        for line in fstr.decode().splitlines():
+            line = line.split('//')[0].replace('_','').strip()
+            if not line or line.startswith('@'):
+                continue
+            rows.append(line.lower().rjust(width,'0')[-width:].encode())
+        return np.frombuffer(b''.join(rows),dtype=np.uint8).reshape(len(rows),width)
+
+    def write(self,fname,vectors,radix=16,append=False,chunk=1<<16):
+        ''' Writes (N,nbytes) vectors to hex (radix=16) or binary (radix=2) memory file '''
+        with open(fname,'ab' if append else 'wb') as fp:
+            for i in range(0,len(vectors),chunk):
+                fp.write(self.to_text(vectors[i:i+chunk],radix))
+
+    def read(self,fname,radix=16,chunk=1<<16):
+        ''' Reads (N,nbytes) vectors from hex (radix=16) or binary (radix=2) memory file '''
+        fstr = Path(fname).read_bytes()
+        line = self.digits(radix)+1
+        if len(fstr) % line or len(fstr) <= line*chunk:
+            return self.from_text(fstr,radix)
+        # Large files written by write() are converted in chunks to bound temporaries
+        return np.concatenate([self.from_text(fstr[i:i+line*chunk],radix)
+            for i in range(0,len(fstr),line*chunk)])
+
+    def write_hex(self,fname,vectors,append=False):
+        self.write(fname,vectors,16,append)
+
+    def read_hex(self,fname):
+        return self.read(fname,16)
+
+    def write_bin(self,fname,vectors,append=False):
+        self.write(fname,vectors,2,append)
+
+    def read_bin(self,fname):
+        return self.read(fname,2)
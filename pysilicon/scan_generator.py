@@ -2,82 +2,184 @@
 import os,sys
 import argparse
 from pathlib import Path
-from sympy.parsing.sympy_parser import parse_expr
 import copy
+import hashlib
+from functools import lru_cache
+import heapq
+import json
+import jsonschema
+from concurrent.futures import ProcessPoolExecutor
 from pysilicon.file_gen import *
-import math
+from pysilicon.expr_eval import ExprEvaluator, ExprError
+from pysilicon.file_index import atomic_write
 import re
 import yaml
 
 #----------------------------------------------------------
-# Scan generator class (uses argparse) 
+# Exceptions
+#----------------------------------------------------------
+class ScanConfigError(Exception):
+    ''' Raised when a scan chain configuration is invalid '''
+    pass
+
+#----------------------------------------------------------
+# Scan generator class
 #----------------------------------------------------------
 class ScanGenerator:
-    ''' Verilog Scan Chain Generator '''
-    def __init__(self):
-        # Pysilicon check
-        self.home_dir = os.getenv('PYSILICON_HOME')
-        if self.home_dir is None:
-            print('PYSILICON_HOME variable not set')
-            sys.exit(-1)
-        self.home_dir = Path(self.home_dir)
-        # Argparse check
-        self.options = self.parse_args()
-        if Path(self.options.config).is_file() is False:
-            print(f'"{self.options.config}" is invalid or does not exist!')
-            sys.exit(-1)
-        self.gen_chain()
-    
-    def parse_args(self):
-        ''' Parse arguments '''
-        parser = argparse.ArgumentParser(description="Generates verilog scan chains.")
-        parser.add_argument(
-            'config',
-            help='Scan chain configuration file.'
-        )
-        parser.add_argument(
-            '-rw', '--read-write',
-            action='store_true',
-            help='Generates final module with separate read and write io ports.'
-        )
-        parser.add_argument(
-            '-p', '--prefix',
-            default=None,
-            help='Optionally define a prefix. Default: Name specified in config'
-        )
-        parser.add_argument(
-            '-b', '--bypass',
-            action='store_true',
-            help='Optionally generate a module for bypassing scan-serial interface for testing purposes.'
-        )
-        parser.add_argument(
-            '-c', '--config-translate',
-            action='store_true',
-            help='Translates legacy *.cfg configuration file into YAML config. Other flags are ignored if this flag is passed.'
+    ''' 
+    Verilog Scan Chain Generator
+    Builds an in-memory chain model from a config dict or YAML path. Files are
+    only written when render() is called.
+    :param config dict or path to YAML config that conforms to schemata/scan.json
+    :param chains number of parallel scan chains the cells are split into
+    :param bypass_table bypass core uses generic set_cell/get_cell tasks driven by a $readmemh cell table
+    :param bypass_wrappers add per-cell set_/get_ wrappers around the generic tasks (bypass_table only)
+    :param parents resolved paths of the configs that include this one as a sub-chain
+    '''
+    # Output name -> (file suffix, emitter method name)
+    outputs = {
+        'src': ('.v','emit_src'),
+        'defines': ('_defines.v','emit_defines'),
+        'bypass_core': ('_bypass_core.v','gen_bypass_core'),
+        'bypass': ('_bypass.v','gen_bypass_wrapper'),
+        'scan_tasks': ('_scan_tasks.v','emit_scan_tasks'),
+        'bypass_table': ('_bypass_table.hex','emit_bypass_table'),
+    }
+    # Testbench signals driven by the generated scan tasks
+    tb_signals = {'clk_en': 'SClkEn','s_in': 'SIn','s_out': 'SOut','s_en': 'SEnable','s_update': 'SUpdate'}
+
+    def __init__(self,config,read_write=False,prefix=None,bypass=False,scan_tasks=False,chains=1,
+            bypass_table=False,bypass_wrappers=False,home_dir=None,parents=()):
+        self.home_dir = Path(home_dir) if home_dir is not None else return_home_dir()
+        self.parents = parents
+        self.options = argparse.Namespace(
+            read_write=read_write,
+            prefix=prefix,
+            bypass=bypass,
+            scan_tasks=scan_tasks,
+            chains=chains,
+            bypass_table=bypass_table,
+            bypass_wrappers=bypass_wrappers
         )
-        return parser.parse_args()
+        self.config = self.load_config(config)
+        # Original config is embedded in every generated file so it is only dumped once
+        self.og_config = yaml.dump(self.config,Dumper=YamlDumper)
+        self.build()
+
+    def load_config(self,config):
+        ''' Returns validated copy of config (dict or path to YAML) '''
+        if isinstance(config,dict):
+            config = copy.deepcopy(config)
+            fname = '<dict>'
+            self.config_dir = Path.cwd()
+        else:
+            fname = config
+            self.config_dir = Path(config).resolve().parent
+            try:
+                with open(config,'r') as fp:
+                    config = yaml.load(fp,Loader=YamlLoader)
+            except OSError:
+                raise ScanConfigError(f'"{fname}" is invalid or does not exist!')
+        with open(self.home_dir / 'schemata/scan.json','r') as fp:
+            schema = json.load(fp)
+        try:
+            jsonschema.validate(instance=config,schema=schema)
+        except jsonschema.exceptions.ValidationError as err:
+            raise ScanConfigError(f'{err}\nYAML file "{fname}" does not conform to schema')
+        # Cell names must be unique (checked here since uniqueItems is quadratic)
+        names = set()
+        for cell in config['cells']:
+            if cell['name'] in names:
+                raise ScanConfigError(f'Cell name "{cell["name"]}" is used more than once in "{fname}"')
+            names.add(cell['name'])
+        return config
+
+    def build(self):
+        ''' Evaluates parameters and computes chain layout '''
+        self.config['cells'] = self.insert_sibs(self.config['cells'])
+        self.load_subchains()
+        try:
+            self.config = self.evaluate_cells(self.config)
+        except ExprError as err:
+            raise ScanConfigError(f'Scan chain "{self.config["name"]}": {err}')
+        self.config['prefix'] = self.options.prefix if self.options.prefix is not None else self.config['name'] 
+        self.config['scan_bits_ports'] = self.get_scan_bits_ports() 
+        self.gen_src()
+
+    def default_outputs(self):
+        ''' Names of outputs that are rendered if none are requested '''
+        outputs = ['src','defines']
+        if self.options.bypass:
+            outputs += ['bypass_core','bypass']
+            if self.options.bypass_table:
+                outputs += ['bypass_table']
+        if self.options.scan_tasks:
+            outputs += ['scan_tasks']
+        return outputs
+
+    def emit(self,output):
+        ''' Returns iterable of str for output name (see ScanGenerator.outputs) '''
+        return getattr(self,self.outputs[output][1])()
+
+    def render(self,outputs=None,out_dir='.',force=False):
+        ''' 
+        Writes outputs to out_dir and returns list of written paths. Outputs whose
+        contents did not change are not touched (see ScanGenerator.unchanged)
+        :param outputs list of output names (default: src, defines and bypass files if enabled)
+        :param force regenerate outputs even if the cached layout hash matches
+        '''
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True,exist_ok=True)
+        cache_fname = out_dir / f'.{self.config["name"]}.scan_gen.json'
+        cache = load_render_cache(cache_fname)
+        digest = self.layout_hash()
+        files = cache['files'] if cache.get('hash') == digest else {}
+        paths = []
+        self.unchanged = []
+        for output in (outputs if outputs is not None else self.default_outputs()):
+            path = out_dir / (self.config['name']+self.outputs[output][0])
+            # Same layout and options and the file was not touched since: nothing to render
+            if not force and path.name in files and files[path.name] == file_stamp(path):
+                self.unchanged.append(path)
+                continue
+            if write_file_if_changed(path,self.emit(output)):
+                paths.append(path)
+            else:
+                self.unchanged.append(path)
+            files[path.name] = file_stamp(path)
+        if cache.get('hash') != digest or cache.get('files') != files:
+            atomic_write(cache_fname,json.dumps({'hash': digest,'files': files}))
+        # Modules and defines of sub-chains (once per distinct sub-chain)
+        rendered = set()
+        for sub in self.subchains.values():
+            if id(sub) not in rendered:
+                rendered.add(id(sub))
+                paths += sub.render(out_dir=out_dir,force=force)
+                self.unchanged += sub.unchanged
+        return paths
+
+    def layout_hash(self):
+        ''' Hash of everything the generated files depend on (generator, options and evaluated layout) '''
+        h = hashlib.sha1(generator_hash().encode())
+        h.update(json.dumps(vars(self.options),sort_keys=True).encode())
+        h.update(self.og_config.encode())
+        h.update(json.dumps(self.config,sort_keys=True,default=str).encode())
+        for name,sub in self.subchains.items():
+            h.update(f'{name}:{sub.layout_hash()}'.encode())
+        return h.hexdigest()
 
     def evaluate_cells(self,config):
         ''' Uses parameters to evaluate cells '''
         self.full_width = 0
-        params = config['parameters']
-        # Supported functions
-        full_params = {
-            "log2": lambda x: math.ceil(math.log2(x)),   
-            "clog2": lambda x: math.ceil(math.log2(x)),   
-            "flog2": lambda x: math.floor(math.log2(x))
-        } 
+        # Supported functions: log2, clog2, flog2 (see pysilicon.expr_eval)
+        evaluator = ExprEvaluator(config['parameters'])
         # Evaluate params
-        for p,val in config['parameters'].items():
-            if not isinstance(val,int):
-                full_params.update(params)
-                params[p] = parse_expr(val,full_params)
+        if config['parameters']:
+            config['parameters'] = evaluator.evaluate_params()
         # Evaluate cells
-        full_params.update(params)
         for cell in config['cells']:
-            for item,val in cell.items():
-                if isinstance(val,str) and item in ['width','mult']:
-                    cell[item] = parse_expr(val,full_params)
+            for item in ('width','mult'):
+                cell[item] = evaluator.evaluate(cell[item])
             self.full_width += cell['width']*cell['mult']
         return config
    
@@ -91,102 +193,207 @@ class ScanGenerator:
             {'name': 'ScanBitsWr','io': 'output','datatype': 'wire','vec': total_def}]
         return scan_bits_ports
 
-    def gen_chain(self):
-        ''' Generates all files for scan chain '''
-        # Read Config
-        if self.options.config_translate:
-            with open(self.options.config,'r') as fp:
-                fstr = fp.read()
-                with open(Path(self.options.config).stem + '.yml','w') as fp:
-                    fp.write(self.translate_cfg(fstr))
-                    print(f'File "{Path(self.options.config).stem}.yml" generated successfully.')
-        else:
-            self.config = validate_yaml(self.options.config,str(self.home_dir/'schemata/scan.json'))
-            self.og_config = copy.deepcopy(self.config)
-            self.config = self.evaluate_cells(self.config)
-            self.config['prefix'] = self.options.prefix if self.options.prefix is not None else self.config['name'] 
-            self.config['scan_bits_ports'] = self.get_scan_bits_ports() 
-            # Generate basic files
-            with open(self.config['name']+'.v','w') as sfp:
-                with open(self.config['name']+'_defines.v','w') as dfp:
-                    self.gen_src(sfp,dfp)
-                    print(f'File "{self.config["name"]}.v" generated successfully.')
-                    print(f'File "{self.config["name"]}_defines.v" generated successfully.')
-            # Generate optional files
-            if self.options.bypass:
-                # Core
-                rstr = self.gen_bypass_core()
-                with open(self.config['name']+'_bypass_core.v','w') as bfp:
-                    bfp.write(rstr)
-                print(f'File "{self.config["name"]}_bypass_core.v" generated successfully.')
-                # Wrapper
-                rstr = self.gen_bypass_wrapper()
-                with open(self.config['name']+'_bypass.v','w') as bfp:
-                    bfp.write(rstr)
-                print(f'File "{self.config["name"]}_bypass.v" generated successfully.')
-
-    def gen_src(self,sfp,dfp):
-        ''' generates the verilog source '''
-        # Populate cell
-        cw = 0 # current width
+    def gen_src(self):
+        ''' Computes segment positions and connections for the verilog source '''
+        n = self.options.chains
+        if n < 1 or n > len(partition_units(self.config['cells'])):
+            raise ScanConfigError(f'Cannot split {len(self.config["cells"])} cells of "{self.config["name"]}" into {n} chains')
         for cell in self.config['cells']:
             cell['full_width'] = cell['width']*cell['mult'] 
             cell['full_name'] = self.config['prefix']+'_'+cell['name'] 
-            cell['min_pos'] = cw 
-            cell['max_pos'] = cell['full_width']+cw-1
-            cw += cell['full_width']
+        # Split into balanced parallel chains. Each chain occupies a contiguous range of ScanBits
+        self.chains = partition_cells(self.config['cells'],n)
+        self.config['cells'] = [cell for chain in self.chains for cell in chain['cells']]
+        # Populate cell
+        cw = 0 # current width
+        for k,chain in enumerate(self.chains):
+            chain['offset'] = cw
+            for cell in chain['cells']:
+                cell['chain'] = k
+                cell['min_pos'] = cw 
+                cell['max_pos'] = cell['full_width']+cw-1
+                cw += cell['full_width']
+            chain['length'] = cw-chain['offset']
         # Sin and Sout
-        for i,cell in enumerate(self.config['cells']):
-            if i == 0:
-                cell['sin'] = 'SIn' 
-            else:
-                cell['sin'] = f"{self.config['cells'][i-1]['full_name']}_to_{cell['full_name']}" 
-            try:
-                cell['sout'] = f"{cell['full_name']}_to_{self.config['cells'][i+1]['full_name']}" 
-            except IndexError:
-                cell['sout'] = 'SOut' 
-        # Generate files 
-        self.write_src(sfp)
-        self.write_defines(dfp)
+        for k,chain in enumerate(self.chains):
+            cells = chain['cells']
+            for i,cell in enumerate(cells):
+                if i == 0:
+                    cell['sin'] = 'SIn' if n == 1 else f'SIn[{k}]'
+                else:
+                    cell['sin'] = f"{cells[i-1]['full_name']}_to_{cell['full_name']}" 
+                if i == len(cells)-1:
+                    cell['sout'] = 'SOut' if n == 1 else f'SOut[{k}]'
+                    cell['last'] = True
+                else:
+                    cell['sout'] = f"{cell['full_name']}_to_{cells[i+1]['full_name']}" 
+                    cell['last'] = False
+                cell['s_enable'] = 'SEnable'
+                cell['s_update'] = 'SUpdate'
+        self.gen_sections()
+
+    def load_subchains(self):
+        ''' 
+        Loads the chains referenced by "subchain" cells. Every distinct sub-chain
+        config is only generated once (see load_subchain)
+        '''
+        self.subchains = {}
+        for cell in self.config['cells']:
+            if cell.get('subchain') is None:
+                continue
+            path = (self.config_dir / cell['subchain']).resolve()
+            if str(path) in self.parents:
+                raise ScanConfigError(f'Sub-chain "{path}" includes itself')
+            sub = load_subchain(str(path),self.options.read_write,str(self.home_dir),self.parents+(str(path),))
+            for other in self.subchains.values():
+                if other.config['name'] == sub.config['name'] and other is not sub:
+                    raise ScanConfigError(f'Sub-chains "{path}" and "{other.config_dir}" both define module "{sub.config["name"]}"')
+            cell['width'] = sub.full_width
+            # Writable unless every cell of the sub-chain is read only (mixed sub-chains keep write access)
+            cell['R/W'] = 'W' if any(c['R/W'] == 'W' for c in sub.config['cells']) else 'R'
+            self.subchains[cell['name']] = sub
+
+    def insert_sibs(self,cells):
+        ''' Inserts a 1 bit select (SIB) write cell in front of the cells of every section '''
+        self.sections = {}
+        names = {cell['name'] for cell in cells}
+        new_cells = []
+        for i,cell in enumerate(cells):
+            sec = cell.get('section')
+            if sec is not None and (i == 0 or cells[i-1].get('section') != sec):
+                if sec in self.sections:
+                    raise ScanConfigError(f'Cells of section "{sec}" must be contiguous')
+                sib = sec+'_SIB'
+                if sib in names:
+                    raise ScanConfigError(f'Cell name "{sib}" is reserved for the select bit of section "{sec}"')
+                self.sections[sec] = {'name': sec,'sib': sib,'index': len(self.sections)}
+                new_cells.append({'name': sib,'width': 1,'mult': 1,'R/W': 'W','section': sec,'is_sib': True})
+            new_cells.append(cell)
+        return new_cells
+
+    def gen_sections(self):
+        '''
+        Routes the cells of every section around its SIB. Shift enable and update
+        of the section are gated by the SIB and its scan out is muxed, so a
+        deselected section only adds the SIB bit to the chain.
+        '''
+        scan_bits_wr = 'ScanBitsWr' if self.options.read_write else 'ScanBits' 
+        sibs,members = {},{name: [] for name in self.sections}
+        for cell in self.config['cells']:
+            if cell.get('is_sib'):
+                sibs[cell['section']] = cell
+            elif cell.get('section') is not None:
+                members[cell['section']].append(cell)
+        for sec in self.sections.values():
+            sec_cells = members[sec['name']]
+            sib,last = sibs[sec['name']],sec_cells[-1]
+            sec['full_name'] = self.config['prefix']+'_'+sec['name']
+            sec['chain'] = sib['chain']
+            sec['offset'] = sec_cells[0]['min_pos']
+            sec['length'] = sum(cell['full_width'] for cell in sec_cells)
+            sec['select'] = f"{scan_bits_wr}[`{sib['full_name']}]"
+            sec['bypass_in'] = sib['sout']
+            sec['sout'] = last['sout']
+            sec['declare_sout'] = not last['last']
+            last['sout'] = sec['full_name']+'_SegmentOut'
+            last['last'] = False
+            for cell in sec_cells:
+                cell['s_enable'] = sec['full_name']+'_SEnable'
+                cell['s_update'] = sec['full_name']+'_SUpdate'
+
+    def active_length(self,sections=(),chain=None):
+        '''
+        Number of shift cycles if only the given sections are selected (SIB bits
+        are always part of the chain). Returns the longest chain unless chain is given
+        '''
+        for sec in sections:
+            if sec not in self.sections:
+                raise ScanConfigError(f'Unknown section "{sec}"')
+        lengths = [chain['length'] for chain in self.chains]
+        for sec in self.sections.values():
+            if sec['name'] not in sections:
+                lengths[sec['chain']] -= sec['length']
+        return max(lengths) if chain is None else lengths[chain]
+
+    def get_serial_ports(self):
+        """Returns clock, control and serial io ports that are used in multiple files""" 
+        serial_vec = None if self.options.chains == 1 else f'[`{self.config["prefix"]}_NumChains-1:0]'
+        return [
+            {'name': 'SClkP','io': 'input','datatype': 'wire','vec': None},
+            {'name': 'SClkN','io': 'input','datatype': 'wire','vec': None},
+            {'name': 'SReset','io': 'input','datatype': 'wire','vec': None},
+            {'name': 'SEnable','io': 'input','datatype': 'wire','vec': None},
+            {'name': 'SUpdate','io': 'input','datatype': 'wire','vec': None},
+            {'name': 'SIn','io': 'input','datatype': 'wire','vec': serial_vec},
+            {'name': 'SOut','io': 'output','datatype': 'wire','vec': serial_vec}]
+
+    def layout_fields(self):
+        ''' 
+        Returns list of {name:,width:,mult:,min_pos:,R/W:} for every cell. Fields of
+        sub-chains are flattened and named "<cell>[<instance>].<field>"
+        '''
+        fields = []
+        for cell in self.config['cells']:
+            if cell.get('subchain') is None:
+                fields.append({k: cell[k] for k in ('name','width','mult','min_pos','R/W')})
+                continue
+            sub_fields = self.subchains[cell['name']].layout_fields()
+            for i in range(cell['mult']):
+                base = cell['min_pos']+i*cell['width']
+                fields += [dict(f,name=f"{cell['name']}[{i}].{f['name']}",min_pos=base+f['min_pos']) for f in sub_fields]
+        return fields
+
+    def codec(self):
+        ''' Returns ScanCodec for packing/unpacking scan vectors of this chain (requires numpy) '''
+        from pysilicon.scan_codec import ScanCodec
+        return ScanCodec.from_generator(self)
+
+    def model(self,**kwargs):
+        ''' Returns bit level ScanModel of this chain (requires numpy, see pysilicon.scan_model) '''
+        from pysilicon.scan_model import ScanModel
+        return ScanModel(self,**kwargs)
 
     def write_src(self,fp):
         ''' Writes src file '''
-        fstr = '' 
+        fp.writelines(self.emit_src())
+
+    def emit_src(self):
+        ''' Yields src file section by section '''
         # YAML config 
-        fstr += yaml_comment(self.og_config,f'Scan chain "{self.config["name"]}" YAML configuration file')
-        fstr += begin_section("Module declaration")
-        fstr += default_nettype('none')
+        yield yaml_comment(self.og_config,f'Scan chain "{self.config["name"]}" YAML configuration file')
+        yield begin_section("Module declaration")
+        yield default_nettype('none')
         # Module Declaration
-        fstr += vlog_mod_dec(self.config['name'],ports=[
-                {'name': 'SClkP','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SClkN','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SReset','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SEnable','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SUpdate','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SIn','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SOut','io': 'output','datatype': 'wire','vec': None}]+self.config['scan_bits_ports'],
+        yield vlog_mod_dec(self.config['name'],ports=self.get_serial_ports()+self.config['scan_bits_ports'],
             parameters=[
                 {'param': 'TwoPhase','value': '1'},
                 {'param': 'ConfigLatch','value': '1'},
             ]
         )
         # Wire declarations for connecting sout to sin of segments
-        fstr += begin_section("Signal declarations for connecting Sin and Sout of segments")
+        yield begin_section("Signal declarations for connecting Sin and Sout of segments")
         for cell in self.config['cells']:
-            if cell['sout'] != 'SOut': 
-                fstr += f"wire {cell['sout']};\n" 
-        fstr += end_section()
+            if not cell['last']: 
+                yield f"wire {cell['sout']};\n" 
+            if cell.get('subchain') is not None:
+                for i in range(cell['mult']-1):
+                    yield f"wire {cell['full_name']}_link{i};\n" 
+        yield end_section()
+        if self.sections:
+            yield from self.emit_section_logic()
         # Define and connect segments
-        fstr += begin_section("Segment instantiation")
+        yield begin_section("Segment instantiation")
         scan_bits_rd = 'ScanBitsRd' if self.options.read_write else 'ScanBits' 
         scan_bits_wr = 'ScanBitsWr' if self.options.read_write else 'ScanBits' 
         for i,cell in enumerate(self.config['cells']):
-            if cell['R/W'] == 'R':
-                fstr += vlog_mod_inst("ReadSegment",cell['full_name'],
+            if cell.get('subchain') is not None:
+                yield from self.emit_subchain_insts(cell,scan_bits_rd,scan_bits_wr)
+            elif cell['R/W'] == 'R':
+                yield vlog_mod_inst("ReadSegment",cell['full_name'],
                     ports=[
                     {'port': 'SClkP','signal': 'SClkP'},
                     {'port': 'SClkN','signal': 'SClkN'},
-                    {'port': 'SEnable','signal': 'SEnable'},
+                    {'port': 'SEnable','signal': cell['s_enable']},
                     {'port': 'CfgIn','signal': f'{scan_bits_rd}[`{cell["full_name"]}]'},
                     {'port': 'SIn','signal': cell['sin']},
                     {'port': 'SOut','signal': cell['sout']}],
@@ -196,13 +403,13 @@ class ScanGenerator:
                     ]
                 )
             else:
-                fstr += vlog_mod_inst("WriteSegment",cell['full_name'],
+                yield vlog_mod_inst("WriteSegment",cell['full_name'],
                     ports=[
                     {'port': 'SClkP','signal': 'SClkP'},
                     {'port': 'SClkN','signal': 'SClkN'},
                     {'port': 'SReset','signal': 'SReset'},
-                    {'port': 'SEnable','signal': 'SEnable'},
-                    {'port': 'SUpdate','signal': 'SUpdate'},
+                    {'port': 'SEnable','signal': cell['s_enable']},
+                    {'port': 'SUpdate','signal': cell['s_update']},
                     {'port': 'CfgOut','signal': f'{scan_bits_wr}[`{cell["full_name"]}]'},
                     {'port': 'SIn','signal': cell['sin']},
                     {'port': 'SOut','signal': cell['sout']}],
@@ -212,44 +419,243 @@ class ScanGenerator:
                     {'param': 'ConfigLatch','value': 'ConfigLatch'}
                     ]
                )
-        fstr += end_section()
-        # Write to file
-        fstr += default_nettype("wire") 
-        fstr += 'endmodule\n'
-        fstr += end_section() 
-        fp.write(fstr)
+        yield end_section()
+        # End of module 
+        yield default_nettype("wire") 
+        yield 'endmodule\n'
+        yield end_section() 
+
+    def emit_subchain_insts(self,cell,scan_bits_rd,scan_bits_wr):
+        ''' Yields mult serially connected instances of a sub-chain module '''
+        sub = self.subchains[cell['name']]
+        for i in range(cell['mult']):
+            bits = f"{cell['min_pos']+i*cell['width']} +: {cell['width']}"
+            scan_ports = [
+                {'port': 'ScanBitsRd','signal': f'{scan_bits_rd}[{bits}]'},
+                {'port': 'ScanBitsWr','signal': f'{scan_bits_wr}[{bits}]'}
+            ] if self.options.read_write else [
+                {'port': 'ScanBits','signal': f'ScanBits[{bits}]'}
+            ]
+            yield vlog_mod_inst(sub.config['name'],f"{cell['full_name']}_{i}",
+                ports=[
+                {'port': 'SClkP','signal': 'SClkP'},
+                {'port': 'SClkN','signal': 'SClkN'},
+                {'port': 'SReset','signal': 'SReset'},
+                {'port': 'SEnable','signal': cell['s_enable']},
+                {'port': 'SUpdate','signal': cell['s_update']},
+                {'port': 'SIn','signal': cell['sin'] if i == 0 else f"{cell['full_name']}_link{i-1}"},
+                {'port': 'SOut','signal': cell['sout'] if i == cell['mult']-1 else f"{cell['full_name']}_link{i}"}]+scan_ports,
+                parameters=[
+                {'param': 'TwoPhase','value': 'TwoPhase'},
+                {'param': 'ConfigLatch','value': 'ConfigLatch'}
+                ]
+            )
+
+    def emit_section_logic(self):
+        ''' Yields SIB gating of shift enable/update and scan out muxes of sections '''
+        yield begin_section("Sections: gated shift enable/update and SIB scan out mux")
+        for sec in self.sections.values():
+            name = sec['full_name']
+            if sec['declare_sout']:
+                yield f"wire {sec['sout']};\n"
+            yield f"wire {name}_SEnable;\n"
+            yield f"wire {name}_SUpdate;\n"
+            yield f"assign {name}_SEnable = SEnable & {sec['select']};\n"
+            yield f"assign {name}_SUpdate = SUpdate & {sec['select']};\n"
+            yield f"assign {sec['sout']} = {sec['select']} ? {name}_SegmentOut : {sec['bypass_in']};\n"
+        yield end_section()
 
     def write_defines(self,fp):
         ''' Writes the defines file '''
-        fstr = '' 
+        fp.writelines(self.emit_defines())
+
+    def emit_defines(self):
+        ''' Yields the defines file section by section '''
         # YAML config 
-        fstr += yaml_comment(self.og_config,
+        yield yaml_comment(self.og_config,
             f'Scan chain "{self.config["name"]}" YAML configuration file')
         # defines total length 
-        fstr += begin_section("Total scan chain length") 
-        fstr += define(self.config['prefix']+'_ScanChainLength',self.full_width,tab='')
-        fstr += end_section() 
+        yield begin_section("Total scan chain length") 
+        yield define(self.config['prefix']+'_ScanChainLength',self.full_width,tab='')
+        yield end_section() 
+        if self.options.chains > 1:
+            yield from self.emit_chain_defines()
+        if self.sections:
+            yield from self.emit_section_defines()
+        if self.subchains:
+            yield from self.emit_subchain_defines()
+        if self.options.bypass_table:
+            yield from self.emit_bypass_table_defines()
         # iterate through cells and define flattened widths 
-        fstr += begin_section("Defines for flattened segment widths") 
+        yield begin_section("Defines for flattened segment widths") 
         for cell in self.config['cells']:
-            fstr += define(cell['full_name']+'_Width',cell['full_width'],tab='')
-        fstr += end_section()
+            yield define(cell['full_name']+'_Width',cell['full_width'],tab='')
+        yield end_section()
         # iterate through cells and define flattened vectors 
-        fstr += begin_section("Defines for flattened vector segments") 
+        yield begin_section("Defines for flattened vector segments") 
         for cell in self.config['cells']:
-            fstr += define(cell['full_name'],f"{cell['max_pos']}:{cell['min_pos']}",tab='')
-        fstr += end_section()
+            yield define(cell['full_name'],f"{cell['max_pos']}:{cell['min_pos']}",tab='')
+        yield end_section()
         # iterate through cells and define mult functions 
-        fstr += begin_section("Defines for multi-vector segments") 
+        yield begin_section("Defines for multi-vector segments") 
         for cell in self.config['cells']:
             name = cell['full_name'] + '_idx(n)'
             value = f"(n * {cell['width']} + {cell['min_pos']}) +: {cell['width']}" 
-            fstr += define(name,value,tab='')
-        fstr += end_section()
-        fp.write(fstr)
+            yield define(name,value,tab='')
+        yield end_section()
+
+    def emit_chain_defines(self):
+        ''' Yields lengths and ScanBits ranges of the parallel chains '''
+        prefix = self.config['prefix']
+        yield begin_section("Parallel scan chains (chain k is driven on SIn[k] and SOut[k])") 
+        yield define(prefix+'_NumChains',self.options.chains,tab='')
+        yield define(prefix+'_MaxChainLength',max(c['length'] for c in self.chains),tab='')
+        for k,chain in enumerate(self.chains):
+            yield define(f'{prefix}_Chain{k}Length',chain['length'],tab='')
+            yield define(f'{prefix}_Chain{k}Offset',chain['offset'],tab='')
+            yield define(f'{prefix}_Chain{k}',f"{chain['offset']+chain['length']-1}:{chain['offset']}",tab='')
+        yield end_section()
+
+    def emit_subchain_defines(self):
+        ''' 
+        Yields base offset of every sub-chain instance and position of the cells
+        of each sub-chain relative to it (deeper levels compose through _Base)
+        '''
+        yield begin_section("Sub-chain instances (cells of instance n of a sub-chain)") 
+        for cell in self.config['cells']:
+            if cell.get('subchain') is None:
+                continue
+            base = cell['full_name']+'_Base'
+            yield define(base+'(n)',f"(n * {cell['width']} + {cell['min_pos']})",tab='')
+            for sub_cell in self.subchains[cell['name']].config['cells']:
+                offset = f"(`{base}(n) + m * {sub_cell['width']} + {sub_cell['min_pos']})"
+                if sub_cell.get('subchain') is not None:
+                    yield define(f"{cell['full_name']}_{sub_cell['name']}_Base(n,m)",offset,tab='')
+                else:
+                    yield define(f"{cell['full_name']}_{sub_cell['name']}_idx(n,m)",f"{offset} +: {sub_cell['width']}",tab='')
+        yield end_section()
+
+    def emit_section_defines(self):
+        ''' Yields index, ScanBits range and length of every section (excluding its SIB) '''
+        prefix = self.config['prefix']
+        yield begin_section("Sections (bit k of a sections mask selects the section with SectionIdx k)") 
+        yield define(prefix+'_NumSections',len(self.sections),tab='')
+        for sec in self.sections.values():
+            yield define(sec['full_name']+'_SectionIdx',sec['index'],tab='')
+            yield define(sec['full_name']+'_SectionLength',sec['length'],tab='')
+            yield define(sec['full_name']+'_SectionOffset',sec['offset'],tab='')
+            yield define(sec['full_name']+'_Section',f"{sec['offset']+sec['length']-1}:{sec['offset']}",tab='')
+        yield end_section()
+
+    def emit_section_tasks(self):
+        ''' Yields functions for reduced shift lengths and a task that only shifts selected sections '''
+        prefix = self.config['prefix']
+        mask = {"name": "sections", "io": "input", "datatype": '', "vec": f'[`{prefix}_NumSections-1:0]'}
+        bypassed = ''
+        length = f'{prefix}_active_length = `{prefix}_ScanChainLength'
+        for sec in self.sections.values():
+            name = sec['full_name']
+            bypassed += (f"if (!sections[`{name}_SectionIdx] && i >= `{name}_SectionOffset && "
+                f"i < `{name}_SectionOffset+`{name}_SectionLength) {prefix}_section_bypassed = 1'b1;\n")
+            length += f"\n    - (sections[`{name}_SectionIdx] ? 0 : `{name}_SectionLength)"
+        yield vlog_function(f'{prefix}_section_bypassed','[0:0]',
+            ports=[{"name": "i", "io": "input", "datatype": "integer", "vec": ''},mask],
+            variables=[],internals=f"{prefix}_section_bypassed = 1'b0;\n"+bypassed)
+        yield vlog_function(f'{prefix}_active_length','integer',ports=[mask],variables=[],internals=length+';\n')
+        sig = self.tb_signals
+        if self.options.chains > 1:
+            yield vlog_function(f'{prefix}_next_active','integer',
+                ports=[{"name": "i", "io": "input", "datatype": "integer", "vec": ''},mask],variables=[],
+                internals=f"""{prefix}_next_active = i;
+while ({prefix}_next_active >= 0 && {prefix}_section_bypassed({prefix}_next_active,sections))
+    {prefix}_next_active = {prefix}_next_active - 1;
+""")
+            variables,shift = self.parallel_section_shift()
+        else:
+            variables = [{"name": "i", "datatype": "integer", "length": 1}]
+            shift = f"""for (i = `{prefix}_ScanChainLength-1; i >= 0; i = i - 1) begin
+    if (!{prefix}_section_bypassed(i,sections)) begin
+        {sig['s_in']} = scan_in_data[i];
+        scan_out_data[i] = {sig['s_out']};
+        #(`{prefix}_ScanCycle);
+    end
+end
+"""
+        yield vlog_task(f'scan_{prefix}_sections',
+            ports=[
+                {"name": "scan_in_data", "io": "input", "datatype": '', "vec": vec_range(f'`{prefix}_ScanChainLength')},
+                {"name": "scan_out_data", "io": "output", "datatype": "reg", "vec": vec_range(f'`{prefix}_ScanChainLength')},
+                mask],
+            variables=variables,
+            internals=f"""// sections holds the SIB values the chain was last updated with. Bits of
+// deselected sections are skipped and their scan_out_data bits read as 0
+scan_out_data = 0;
+{sig['clk_en']} = 1'b1;
+{sig['s_en']} = 1'b1;
+{shift}#(`{prefix}_ScanCycle);
+{sig['clk_en']} = 1'b0;
+{sig['s_en']} = 1'b0;
+#(`{prefix}_ScanCycle);
+{sig['s_update']} = 1'b1;
+#(`{prefix}_ScanCycle);
+{sig['s_update']} = 1'b0;
+#(`{prefix}_ScanCycle);
+""")
+
+    def parallel_section_shift(self):
+        '''
+        Returns (variables,shift loop) of the sections task for parallel chains. Chain k
+        walks its selected bits MSB first with pointers pin<k>/pout<k> and is padded with
+        leading zeros to the longest selected chain (see parallel_scan_str)
+        '''
+        prefix = self.config['prefix']
+        sig = self.tb_signals
+        names = ['i','m']
+        init = 'm = 0;\n'
+        shift_in = shift_out = ''
+        for k in range(self.options.chains):
+            names += [f'len{k}',f'pin{k}',f'pout{k}']
+            offset,length = f'`{prefix}_Chain{k}Offset',f'`{prefix}_Chain{k}Length'
+            init += f'len{k} = {length}'
+            for sec in self.sections.values():
+                if sec['chain'] == k:
+                    init += f" - (sections[`{sec['full_name']}_SectionIdx] ? 0 : `{sec['full_name']}_SectionLength)"
+            init += f';\nif (len{k} > m) m = len{k};\n'
+            init += f'pin{k} = {prefix}_next_active({offset}+{length}-1,sections);\npout{k} = pin{k};\n'
+            shift_in += (f"    if (i >= m-len{k}) begin\n        {sig['s_in']}[{k}] = scan_in_data[pin{k}];\n"
+                f"        pin{k} = {prefix}_next_active(pin{k}-1,sections);\n    end else {sig['s_in']}[{k}] = 1'b0;\n")
+            shift_out += (f"    if (i < len{k}) begin\n        scan_out_data[pout{k}] = {sig['s_out']}[{k}];\n"
+                f"        pout{k} = {prefix}_next_active(pout{k}-1,sections);\n    end\n")
+        variables = [{"name": name, "datatype": "integer", "length": 1} for name in names]
+        return variables,init+f"""for (i = 0; i < m; i = i + 1) begin
+{shift_in}{shift_out}    #(`{prefix}_ScanCycle);
+end
+"""
+
+    def emit_scan_tasks(self):
+        ''' Yields testbench include file with scan tasks sized to the scan chain length '''
+        prefix = self.config['prefix']
+        yield yaml_comment(self.og_config,f'Scan tasks for scan chain "{self.config["name"]}"')
+        yield begin_section(f"Include inside testbench after {self.config['name']}_defines.v")
+        yield comment(f"Drives regs {', '.join(self.tb_signals[s] for s in ('clk_en','s_in','s_en','s_update'))} and samples {self.tb_signals['s_out']}")
+        yield comment(f"Override `{prefix}_ScanCycle (delay per scan step) and `{prefix}_ScanVecDepth (max vectors per file) as needed")
+        yield end_section()
+        for name,value in ((f'{prefix}_ScanCycle',10),(f'{prefix}_ScanVecDepth',1024)):
+            yield f'`ifndef {name}\n' + define(name,value,tab='') + '`endif\n'
+        yield '\n'
+        length = f'`{prefix}_ScanChainLength'
+        chains = {}
+        if self.options.chains > 1:
+            chains['chains'] = [(f'`{prefix}_Chain{k}Offset',f'`{prefix}_Chain{k}Length') for k in range(self.options.chains)]
+            chains['max_length'] = f'`{prefix}_MaxChainLength'
+        yield two_phase_scan_task(f'scan_{prefix}',scan_cycle=f'`{prefix}_ScanCycle',length=length,**chains,**self.tb_signals)
+        yield bulk_scan_task(f'scan_{prefix}_file',scan_cycle=f'`{prefix}_ScanCycle',length=length,
+            depth=f'`{prefix}_ScanVecDepth',**chains,**self.tb_signals)
+        if self.sections:
+            yield from self.emit_section_tasks()
 
     def gen_bypass_wrapper(self):
-        """Wrapper around core file that can be used for custom task generation"""
+        """Yields wrapper around core file that can be used for custom task generation"""
         # Instantiate core
         scan_ports = [
             {'port': 'ScanBitsRd','signal': 'ScanBitsRd'},
@@ -275,16 +681,9 @@ class ScanGenerator:
         internals += begin_section("Custom Tasks")
         internals += end_section()
         # Return Wrapper
-        return vlog_file(
+        return iter_vlog_file(
             name=self.config['name'],
-            ports=[
-                {'name': 'SClkP','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SClkN','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SReset','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SEnable','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SUpdate','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SIn','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SOut','io': 'output','datatype': 'wire','vec': None}]+
+            ports=self.get_serial_ports()+
                 self.config['scan_bits_ports'],
             parameters=[
                 {'param': 'TwoPhase','value': '1'},
@@ -295,37 +694,100 @@ class ScanGenerator:
         )
 
     def gen_bypass_core(self):
-        """Generates bypass core vlog file"""
+        """Yields bypass core vlog file"""
         scan_bits_ports = copy.deepcopy(self.config['scan_bits_ports'])
         if self.options.read_write:
             scan_bits_ports[1]['datatype'] = "reg"
-        return vlog_file(
+        return iter_vlog_file(
             name=self.config['name']+"_bypass_core",
-            ports=[
-                {'name': 'SClkP','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SClkN','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SReset','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SEnable','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SUpdate','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SIn','io': 'input','datatype': 'wire','vec': None},
-                {'name': 'SOut','io': 'output','datatype': 'wire','vec': None}]+scan_bits_ports,
+            ports=self.get_serial_ports()+scan_bits_ports,
             parameters=[
                 {'param': 'TwoPhase','value': '1'},
                 {'param': 'ConfigLatch','value': '1'},
-            ],
-            internals=self.gen_bypass_tasks(),
+            ]+([{'param': 'BypassTable','value': f'"{self.config["name"]}_bypass_table.hex"'}] if self.options.bypass_table else []),
+            internals=self.gen_bypass_table_tasks() if self.options.bypass_table else self.gen_bypass_tasks(),
             config=self.og_config
         )
 
-    def gen_bypass_tasks(self):
-        """Generates string of tasks for setting and getting scan chain bits directly"""
+    #----------------------------------------------------------
+    # Table driven bypass core
+    #----------------------------------------------------------
+    def emit_bypass_table_defines(self):
+        ''' Yields cell ids (rows of the bypass table) and size of the generic bypass tasks '''
+        prefix = self.config['prefix']
+        yield begin_section("Bypass table cell ids") 
+        yield define(prefix+'_NumCells',len(self.config['cells']),tab='')
+        yield define(prefix+'_MaxCellWidth',max(cell['width'] for cell in self.config['cells']),tab='')
+        for i,cell in enumerate(self.config['cells']):
+            yield define(cell['full_name']+'_Id',i,tab='')
+        yield end_section()
+
+    def emit_bypass_table(self):
+        ''' Yields $readmemh table with one {offset,width,mult,writable} row of 32 bit words per cell id '''
+        yield f"// {self.config['name']} bypass table: offset width mult writable\n"
+        for cell in self.config['cells']:
+            yield f"{cell['min_pos']:08x}{cell['width']:08x}{cell['mult']:08x}{int(cell['R/W'] == 'W'):08x}\n"
+
+    def gen_bypass_table_tasks(self):
+        ''' Yields cell table and generic set_cell/get_cell tasks (size is independent of the number of cells) '''
+        prefix = self.config['prefix']
+        rd = "ScanBitsRd" if self.options.read_write else "ScanBits"
+        wr = "ScanBitsWr" if self.options.read_write else "ScanBits"
+        yield begin_section("Cell table (see BypassTable)")
+        yield f"reg [127:0] cell_table [0:`{prefix}_NumCells-1];\n"
+        yield f"initial $readmemh(BypassTable,cell_table);\n"
+        yield end_section()
+        id_ports = [
+            {"name": "id", "io": "input", "datatype": 'integer', "vec": ''},
+            {"name": "idx", "io": "input", "datatype": 'integer', "vec": ''}]
+        variables = [
+            {"name": "i", "datatype": "integer", "length": 1},
+            {"name": "offset", "datatype": "integer", "length": 1},
+            {"name": "width", "datatype": "integer", "length": 1}]
+        lookup = """offset = cell_table[id][127:96] + idx*cell_table[id][95:64];
+width = cell_table[id][95:64];
+if (idx >= cell_table[id][63:32]) $display("[ERROR] %m: index %0d out of range for cell %0d",idx,id);
+"""
+        yield vlog_task('set_cell',
+            ports=id_ports+[{"name": "in", "io": "input", "datatype": '', "vec": f'[`{prefix}_MaxCellWidth-1:0]'}],
+            variables=variables,
+            internals=lookup+f"""if (!cell_table[id][0])
+    $display("[ERROR] %m: cell %0d is read only",id);
+else
+    for (i = 0; i < width; i = i + 1) {wr}[offset+i] = in[i];
+""")
+        yield vlog_task('get_cell',
+            ports=id_ports+[{"name": "out", "io": "output", "datatype": 'reg', "vec": f'[`{prefix}_MaxCellWidth-1:0]'}],
+            variables=variables,
+            internals=lookup+f"""out = 0;
+for (i = 0; i < width; i = i + 1) out[i] = cell_table[id][0] ? {wr}[offset+i] : {rd}[offset+i];
+""")
+        if self.options.bypass_wrappers:
+            for cell in self.config['cells']:
+                yield self.gen_bypass_wrapper_tasks(cell)
+
+    def gen_bypass_wrapper_tasks(self,cell):
+        """Generates per-cell set/get tasks that call the generic table driven tasks"""
         rstr = ''
+        idx_port = [{"name": "idx", "io": "input", "datatype": 'int', "vec": ''}] if cell['mult'] > 1 else []
+        idx = 'idx' if cell['mult'] > 1 else '0'
+        if cell['R/W'] == 'W':
+            in_port = {"name": "in", "io": "input", "datatype": '', "vec": f'[{cell["width"]-1}:0]'}
+            rstr += vlog_task(name='set_' + cell['full_name'],ports=[in_port]+idx_port,variables=[],
+                internals=f"set_cell(`{cell['full_name']}_Id,{idx},in);\n")
+        out_port = {"name": "out", "io": "output", "datatype": 'reg', "vec": f'[{cell["width"]-1}:0]'}
+        tmp = {"name": "value", "datatype": "reg", "length": f"`{self.config['prefix']}_MaxCellWidth"}
+        rstr += vlog_task(name='get_' + cell['full_name'],ports=[out_port]+idx_port,variables=[tmp],
+            internals=f"get_cell(`{cell['full_name']}_Id,{idx},value);\nout = value[{cell['width']-1}:0];\n")
+        return rstr
+
+    def gen_bypass_tasks(self):
+        """Yields tasks for setting and getting scan chain bits directly"""
         for cell in self.config['cells']:
             if cell['R/W'] == 'W':
-                rstr += self.gen_bypass_write_tasks(cell)
+                yield self.gen_bypass_write_tasks(cell)
             else:
-                rstr += self.gen_bypass_read_tasks(cell)
-        return rstr
+                yield self.gen_bypass_read_tasks(cell)
   
     def gen_bypass_read_tasks(self,cell):
         """Generates read task for getting scan chain bits directly"""
@@ -357,48 +819,297 @@ class ScanGenerator:
         internals = set_var('out',rhs)
         rstr += vlog_task(name='get_' + cell['full_name'],ports=ports,variables=[],internals=internals)
         return rstr
-  
-    def translate_cfg(self,cfg_str):
-        """Translates from the legacy *.cfg file format to the new YAML format"""
-        yml = {"name": None,"parameters": {}, "cells": [] }
-        # Regex
-        re_params = re.compile('^\s*\$param{\s*"([a-zA-Z0-9_]+)"\s*}\s*=\s*([^;]+);?\s*$')
-        re_name = re.compile('^\s*Name\s*=\s([a-zA-Z0-9_]+)\s*$')
-        re_cell = re.compile('^\s*([a-zA-Z0-9_]+)\s+([RWrw])\s+([^;\s]+)\s+([^;\s]+)\s*$')
-        for line in cfg_str.split('\n'): 
-            p = re_params.search(line)
-            n = re_name.search(line)
-            c = re_cell.search(line)
-            # Check to see which one matched
-            if p is not None:
-                rhs = self.sub_perl_params(p.group(2))
-                rhs = self.attempt_int_conv(rhs)
-                yml['parameters'][p.group(1)] = rhs
-            elif n is not None:
-                yml['name'] = n.group(1)
-            elif c is not None:
-                width = self.sub_perl_params(c.group(3))
-                width = self.attempt_int_conv(width)
-                mult = self.sub_perl_params(c.group(4))
-                mult = self.attempt_int_conv(mult)
-                yml['cells'].append(self.return_cell(c.group(1),c.group(2),width,mult))
-        return yaml.dump(yml)
-                
-    def attempt_int_conv(self,val):
-        """Attempts to convert to integer"""
+
+#----------------------------------------------------------
+# Sub-chains
+#----------------------------------------------------------
+# Generated sub-chains keyed by (config path,size,mtime,read_write,home_dir)
+subchain_cache = {}
+
+def load_subchain(path,read_write,home_dir,parents):
+    ''' Returns generator of a sub-chain config. Each config is only generated once per process '''
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise ScanConfigError(f'Sub-chain "{path}" is invalid or does not exist!')
+    key = (path,st.st_size,st.st_mtime_ns,read_write,home_dir)
+    if key not in subchain_cache:
+        subchain_cache[key] = ScanGenerator(path,read_write=read_write,home_dir=home_dir,parents=parents)
+    return subchain_cache[key]
+
+#----------------------------------------------------------
+# Render cache
+#----------------------------------------------------------
+@lru_cache(maxsize=None)
+def generator_hash():
+    ''' Hash of the generator sources so that cached outputs are redone after an update '''
+    h = hashlib.sha1()
+    for module in ('scan_generator.py','file_gen.py','expr_eval.py'):
+        h.update((Path(__file__).resolve().parent / module).read_bytes())
+    return h.hexdigest()
+
+def load_render_cache(cache_fname):
+    ''' Returns {hash:,files:{name: [size,mtime_ns]}} or {} if missing or unreadable '''
+    try:
+        with open(cache_fname,'r') as fp:
+            cache = json.load(fp)
+    except (OSError,ValueError):
+        return {}
+    return cache if isinstance(cache,dict) and isinstance(cache.get('files'),dict) else {}
+
+def file_stamp(path):
+    ''' [size,mtime_ns] of path or None if it does not exist '''
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size,st.st_mtime_ns]
+
+#----------------------------------------------------------
+# Chain partitioning
+#----------------------------------------------------------
+def partition_units(cells):
+    ''' Groups cells into units that are never split across chains (a section and its SIB) '''
+    units = []
+    for cell in cells:
+        sec = cell.get('section')
+        if sec is not None and units and units[-1][0].get('section') == sec:
+            units[-1].append(cell)
+        else:
+            units.append([cell])
+    return units
+
+def partition_cells(cells,n):
+    ''' 
+    Splits cells into n chains with balanced lengths (longest processing time
+    first: widest unit goes to the currently shortest chain). Cells keep their
+    config order within each chain. Returns list of {cells:,length:}
+    '''
+    if n == 1:
+        return [{'cells': list(cells),'length': sum(c['full_width'] for c in cells)}]
+    units = partition_units(cells)
+    widths = [sum(c['full_width'] for c in unit) for unit in units]
+    heap = [(0,k) for k in range(n)]
+    assigned = [[] for _ in range(n)]
+    for i in sorted(range(len(units)),key=lambda i: -widths[i]):
+        length,k = heapq.heappop(heap)
+        assigned[k].append(i)
+        heapq.heappush(heap,(length+widths[i],k))
+    return [{'cells': [c for i in sorted(idx) for c in units[i]],'length': sum(widths[i] for i in idx)}
+        for idx in assigned]
+
+#----------------------------------------------------------
+# Legacy config translation 
+#----------------------------------------------------------
+# A legacy line is one of: $param{"NAME"} = value; | Name = name | cell R/W width mult
+RE_CFG_LINE = re.compile(
+    r'^\s*(?:\$param{\s*"(?P<param>[a-zA-Z0-9_]+)"\s*}\s*=\s*(?P<value>[^;]+);?'
+    r'|Name\s*=\s(?P<name>[a-zA-Z0-9_]+)'
+    r'|(?P<cell>[a-zA-Z0-9_]+)\s+(?P<rw>[RWrw])\s+(?P<width>[^;\s]+)\s+(?P<mult>[^;\s]+))\s*$')
+RE_PERL_PARAM = re.compile(r'\$param{\s*"([a-zA-Z0-9_]+)"\s*}')
+
+def translate_cfg(cfg_str):
+    """Translates from the legacy *.cfg file format to the new YAML format"""
+    yml = {"name": None,"parameters": {}, "cells": [] }
+    match = RE_CFG_LINE.match
+    for line in cfg_str.split('\n'): 
+        m = match(line)
+        if m is None:
+            continue
+        # Check to see which alternative matched
+        if m.group('param') is not None:
+            yml['parameters'][m.group('param')] = attempt_int_conv(sub_perl_params(m.group('value')))
+        elif m.group('name') is not None:
+            yml['name'] = m.group('name')
+        else:
+            width = attempt_int_conv(sub_perl_params(m.group('width')))
+            mult = attempt_int_conv(sub_perl_params(m.group('mult')))
+            yml['cells'].append(return_cell(m.group('cell'),m.group('rw'),width,mult))
+    return yaml.dump(yml,Dumper=YamlDumper)
+
+def attempt_int_conv(val):
+    """Attempts to convert to integer"""
+    try:
+        return int(val)
+    except ValueError:
+        return val
+
+def return_cell(name,r_w,width,mult):
+    return {"name": name, "R/W": r_w, "width": width, "mult": mult}
+
+def sub_perl_params(line):
+    """substitute params nonsense with just name of param"""
+    if '$' not in line:
+        return line
+    return RE_PERL_PARAM.sub(r'\1',line)
+
+def translate_cfg_file(cfg_fname,out_dir='.',yml_fname=None,force=False):
+    """
+    Translates legacy *.cfg file into <out_dir>/<stem>.yml (or yml_fname) and
+    returns its path. Returns None if the YAML file is newer than the cfg file
+    """
+    yml_fname = Path(yml_fname) if yml_fname is not None else Path(out_dir) / (Path(cfg_fname).stem + '.yml')
+    if not force:
         try:
-            return int(val)
-        except ValueError:
-            return val
+            if yml_fname.stat().st_mtime_ns >= os.stat(cfg_fname).st_mtime_ns:
+                return None
+        except FileNotFoundError:
+            pass
+    with open(cfg_fname,'r') as fp:
+        fstr = fp.read()
+    yml_fname.parent.mkdir(parents=True,exist_ok=True)
+    atomic_write(yml_fname,translate_cfg(fstr))
+    return yml_fname
+
+def find_cfg_files(paths,out_dir='.'):
+    """
+    Returns list of (cfg file,yml file). Directories are searched recursively
+    for *.cfg files whose outputs mirror the directory tree below out_dir
+    """
+    pairs = []
+    for path in map(Path,paths):
+        if path.is_dir():
+            for root,dirs,files in os.walk(path):
+                dirs.sort()
+                rel = Path(root).relative_to(path)
+                pairs += [(Path(root) / f,Path(out_dir) / rel / (f[:-4] + '.yml')) for f in sorted(files) if f.endswith('.cfg')]
+        else:
+            pairs.append((path,Path(out_dir) / (path.stem + '.yml')))
+    return pairs
+
+#----------------------------------------------------------
+# Command line interface
+#----------------------------------------------------------
+def return_home_dir():
+    ''' PYSILICON_HOME if set, otherwise the directory this package lives in '''
+    home_dir = os.getenv('PYSILICON_HOME')
+    return Path(home_dir) if home_dir else Path(__file__).resolve().parents[1]
+
+def parse_args(argv=None):
+    ''' Parse arguments '''
+    parser = argparse.ArgumentParser(description="Generates verilog scan chains.")
+    parser.add_argument(
+        'configs',
+        nargs='+',
+        help='Scan chain configuration file(s).'
+    )
+    parser.add_argument(
+        '-rw', '--read-write',
+        action='store_true',
+        help='Generates final module with separate read and write io ports.'
+    )
+    parser.add_argument(
+        '-p', '--prefix',
+        default=None,
+        help='Optionally define a prefix. Default: Name specified in config'
+    )
+    parser.add_argument(
+        '-b', '--bypass',
+        action='store_true',
+        help='Optionally generate a module for bypassing scan-serial interface for testing purposes.'
+    )
+    parser.add_argument(
+        '--bypass-table',
+        action='store_true',
+        help='Bypass core uses generic set_cell/get_cell tasks driven by a generated cell table instead of per-cell tasks.'
+    )
+    parser.add_argument(
+        '--bypass-wrappers',
+        action='store_true',
+        help='Adds per-cell set_/get_ tasks that wrap the generic bypass tasks (with --bypass-table).'
+    )
+    parser.add_argument(
+        '-t', '--scan-tasks',
+        action='store_true',
+        help='Optionally generate testbench scan tasks sized to the chain (incl. bulk $readmemh scanning).'
+    )
+    parser.add_argument(
+        '-n', '--chains',
+        type=int,
+        default=1,
+        help='Number of parallel scan chains (SIn/SOut become [n-1:0] vectors). Default: 1'
+    )
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='Rewrite all outputs even if they are up to date.'
+    )
+    parser.add_argument(
+        '-c', '--config-translate',
+        action='store_true',
+        help='Translates legacy *.cfg configuration files (or directories of them) into YAML configs. Up to date outputs are skipped. Other flags are ignored if this flag is passed.'
+    )
+    parser.add_argument(
+        '-o', '--out-dir',
+        default='.',
+        help='Directory that generated files are written to. Default: current directory'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=os.cpu_count(),
+        help='Number of configs that are generated in parallel. Default: number of CPUs'
+    )
+    return parser.parse_args(argv)
+
+def generator_kwargs(options):
+    ''' Returns ScanGenerator keyword arguments from parsed command line options '''
+    return {
+        'read_write': options.read_write,
+        'prefix': options.prefix,
+        'bypass': options.bypass,
+        'scan_tasks': options.scan_tasks,
+        'chains': options.chains,
+        'bypass_table': options.bypass_table,
+        'bypass_wrappers': options.bypass_wrappers,
+    }
+
+def generate(config,out_dir='.',force=False,**kwargs):
+    ''' Generates files for one config. Returns (paths,error message) so it can run in a process pool '''
+    try:
+        return [str(p) for p in ScanGenerator(config,**kwargs).render(out_dir=out_dir,force=force)],None
+    except ScanConfigError as err:
+        return [],str(err)
+
+def translate(cfg_fname,out_dir='.',yml_fname=None,force=False):
+    ''' Translates one legacy config. Returns (paths,error message) '''
+    try:
+        path = translate_cfg_file(cfg_fname,out_dir,yml_fname,force)
+        return ([str(path)] if path is not None else []),None
+    except OSError as err:
+        return [],f'"{cfg_fname}" is invalid or does not exist! ({err})'
 
-    def return_cell(self,name,r_w,width,mult):
-        return {"name": name, "R/W": r_w, "width": width, "mult": mult}
+def main(argv=None):
+    ''' scan_gen entry point. Generates all configs in a process pool '''
+    options = parse_args(argv)
+    Path(options.out_dir).mkdir(parents=True,exist_ok=True)
+    if options.config_translate:
+        jobs = [(translate,(cfg,options.out_dir,yml,options.force),{})
+            for cfg,yml in find_cfg_files(options.configs,options.out_dir)]
+    else:
+        kwargs = generator_kwargs(options)
+        jobs = [(generate,(config,options.out_dir,options.force),kwargs) for config in options.configs]
+    failed = False
+    if options.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=options.jobs) as pool:
+            results = [pool.submit(fn,*args,**kwargs) for fn,args,kwargs in jobs]
+            results = (r.result() for r in results)
+            failed = report_results(results)
+    else:
+        failed = report_results(fn(*args,**kwargs) for fn,args,kwargs in jobs)
+    if failed:
+        sys.exit(-1)
 
-    def sub_perl_params(self,line):
-        """substitute params nonsense with just name of param"""
-        re_param = re.compile('\$param{\s*"([a-zA-Z0-9_]+)"\s*}')
-        p = re_param.sub(r'\1',line)
-        return p 
+def report_results(results):
+    ''' Prints generated files and errors. Returns True if anything failed '''
+    failed = False
+    for paths,err in results:
+        for path in paths:
+            print(f'File "{path}" generated successfully.')
+        if err is not None:
+            print(err)
+            failed = True
+    return failed
 
 if __name__=='__main__':
-    sg = ScanGenerator()
+    main()
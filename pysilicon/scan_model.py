@@ -0,0 +1,182 @@
+import numpy as np
+from pysilicon.scan_codec import ScanCodec
+
+# NOTE Bit i of every array is ScanBits[i]. Chain k enters on SIn[k] at its lowest
+# NOTE bit and leaves on SOut[k] at its highest bit (see ScanGenerator.gen_src).
+# NOTE Segments are modeled as: shift register bits that move one position per
+# NOTE shift cycle while SEnable is high, write cells copy their shift bits to
+# NOTE their configuration on SUpdate (or follow them if ConfigLatch is 0) and
+# NOTE read cells load CfgIn into their shift bits on capture().
+
+#----------------------------------------------------------
+# Scan chain model
+#----------------------------------------------------------
+class ScanModel:
+    '''
+    Bit level behavioral model of a generated scan chain (shift, update, reset,
+    capture, two phase clocking, parallel chains and SIB sections).
+    Shifting k bits costs O(chain length + k) NumPy work regardless of k.
+    :param sg ScanGenerator the chain was generated with
+    :param two_phase model master/slave latches clocked by SClkP/SClkN
+    :param config_latch write cells only change on SUpdate (else they follow the shift register)
+    '''
+    def __init__(self,sg,two_phase=True,config_latch=True):
+        self.length = sg.full_width
+        self.two_phase = two_phase
+        self.config_latch = config_latch
+        self.codec = ScanCodec.from_generator(sg)
+        self.chains = [(c['offset'],c['length']) for c in sg.chains]
+        self.writable = np.zeros(self.length,dtype=bool)
+        for f in sg.layout_fields():
+            if f['R/W'] == 'W':
+                self.writable[f['min_pos']:f['min_pos']+f['width']*f['mult']] = True
+        # (SIB position,first bit,end) of every section
+        sib_pos = {cell['name']: cell['min_pos'] for cell in sg.config['cells'] if cell.get('is_sib')}
+        self.sections = {name: (sib_pos[sec['sib']],sec['offset'],sec['offset']+sec['length'])
+            for name,sec in sg.sections.items()}
+        self.active_cache = {}
+        self.read_bits = np.zeros(self.length,dtype=np.uint8)
+        self.reset()
+
+    #----------------------------------------------------------
+    # Control
+    #----------------------------------------------------------
+    def reset(self):
+        ''' SReset: clears shift registers and configuration (all sections deselected) '''
+        self.shift_bits = np.zeros(self.length,dtype=np.uint8)
+        self.pending = None
+        self.cfg = np.zeros(self.length,dtype=np.uint8)
+        self.cycles = 0
+
+    def update(self):
+        ''' SUpdate: write cells (incl. SIBs) take over their shift register bits '''
+        self.cfg[self.writable] = self.shift_bits[self.writable]
+
+    def set_read(self,values=None,bits=None):
+        ''' Sets CfgIn of read cells from field values (dict) or a bit array '''
+        if values is not None:
+            bits = np.unpackbits(self.codec.encode(values,1)[0],bitorder='little')[:self.length]
+        self.read_bits[:] = bits
+
+    def capture(self):
+        ''' Read cells load CfgIn into their shift register bits '''
+        self.shift_bits[~self.writable] = self.read_bits[~self.writable]
+
+    def scan_bits(self):
+        ''' Current value of the ScanBits bus '''
+        bits = self.read_bits.copy()
+        bits[self.writable] = (self.cfg if self.config_latch else self.shift_bits)[self.writable]
+        return bits
+
+    def selected(self):
+        ''' Names of sections whose SIB is set '''
+        return [name for name,(sib,start,end) in self.sections.items() if self.cfg[sib]]
+
+    def active(self,chain=0):
+        ''' Bit positions that chain k currently shifts through (deselected sections are skipped) '''
+        key = (chain,tuple(self.selected()))
+        if key not in self.active_cache:
+            offset,length = self.chains[chain]
+            keep = np.ones(length,dtype=bool)
+            for name,(sib,start,end) in self.sections.items():
+                if offset <= start < offset+length and name not in key[1]:
+                    keep[start-offset:end-offset] = False
+            self.active_cache[key] = np.flatnonzero(keep)+offset
+        return self.active_cache[key]
+
+    #----------------------------------------------------------
+    # Shifting
+    #----------------------------------------------------------
+    def shift(self,bits,chain=0):
+        '''
+        Shifts bits into SIn[chain] (bits[0] first) and returns the bits that
+        appeared on SOut[chain] in the same cycles
+        '''
+        bits = np.asarray(bits,dtype=np.uint8)
+        self.cycles += len(bits)
+        return self.move(bits,chain)
+
+    def move(self,bits,chain):
+        pos = self.active(chain)
+        stream = np.concatenate([bits[::-1],self.shift_bits[pos]])
+        self.shift_bits[pos] = stream[:len(pos)]
+        return stream[len(pos):][::-1].copy()
+
+    def clock(self,s_in):
+        ''' One shift cycle on all chains (s_in holds SIn[k]). Returns SOut of every chain before the cycle '''
+        s_out = self.s_out()
+        for k in range(len(self.chains)):
+            self.move(np.asarray(s_in[k:k+1],dtype=np.uint8),k)
+        self.cycles += 1
+        return s_out
+
+    def phase_p(self,s_in):
+        ''' SClkP pulse: master latches sample their inputs (single phase: shift cycle) '''
+        if not self.two_phase:
+            return self.clock(s_in)
+        self.pending = [np.concatenate([[s_in[k]],self.shift_bits[self.active(k)][:-1]]).astype(np.uint8)
+            for k in range(len(self.chains))]
+
+    def phase_n(self):
+        ''' SClkN pulse: slave latches (the visible shift register bits) take over the master values '''
+        if self.pending is None:
+            return
+        for k,values in enumerate(self.pending):
+            self.shift_bits[self.active(k)] = values
+        self.pending = None
+        self.cycles += 1
+
+    def s_out(self):
+        ''' Current value of SOut[k] for every chain '''
+        return np.array([self.shift_bits[self.active(k)[-1]] for k in range(len(self.chains))],dtype=np.uint8)
+
+    #----------------------------------------------------------
+    # Vector level (same sequence as the generated scan tasks)
+    #----------------------------------------------------------
+    def scan(self,vector,capture=True,update=True):
+        '''
+        Shifts one (nbytes,) scan vector into all chains at once (MSB of every
+        chain first, shorter chains padded with leading zeros), then updates.
+        Returns the (nbytes,) vector that was shifted out
+        '''
+        if capture:
+            self.capture()
+        bits_in = np.unpackbits(np.asarray(vector,dtype=np.uint8),bitorder='little')[:self.length]
+        bits_out = np.zeros(self.codec.nbytes*8,dtype=np.uint8)
+        active = [self.active(k) for k in range(len(self.chains))]
+        max_length = max(len(pos) for pos in active)
+        for k,pos in enumerate(active):
+            pad = np.zeros(max_length-len(pos),dtype=np.uint8)
+            out = self.move(np.concatenate([pad,bits_in[pos][::-1]]),k)
+            bits_out[pos] = out[:len(pos)][::-1]
+        self.cycles += max_length
+        if update:
+            self.update()
+        return np.packbits(bits_out,bitorder='little')[:self.codec.nbytes]
+
+    def scan_vectors(self,vectors,**kwargs):
+        ''' Scans (N,nbytes) vectors back-to-back like the bulk scan task. Returns (N,nbytes) scan out vectors '''
+        return np.stack([self.scan(v,**kwargs) for v in np.asarray(vectors,dtype=np.uint8)]) if len(vectors) else \
+            np.zeros((0,self.codec.nbytes),dtype=np.uint8)
+
+    def check(self,vectors,sim_out,mask=None,**kwargs):
+        '''
+        Differential check against simulation. Scans vectors through the model
+        and compares the result with the scan out vectors of the simulation.
+        Returns indices of vectors that differ (in bits set in mask)
+        :param vectors (N,nbytes) vectors or $readmemh file that was scanned in
+        :param sim_out (N,nbytes) vectors or $writememh file written by the bulk scan task
+        '''
+        if not isinstance(vectors,np.ndarray):
+            vectors = self.codec.read_hex(vectors)
+        if not isinstance(sim_out,np.ndarray):
+            sim_out = self.codec.read_hex(sim_out)
+        if mask is not None and not isinstance(mask,np.ndarray):
+            mask = self.codec.read_hex(mask)
+        expected = self.scan_vectors(vectors,**kwargs)
+        if len(expected) != len(sim_out):
+            raise ValueError(f'Simulation shifted {len(sim_out)} vectors but {len(expected)} were expected')
+        diff = expected ^ sim_out
+        if mask is not None:
+            diff &= mask
+        return np.flatnonzero(diff.any(axis=1))
@@ -0,0 +1,298 @@
+import re
+import numpy as np
+from pathlib import Path
+from pysilicon.scan_codec import ScanCodec
+from pysilicon.expr_eval import ExprEvaluator
+from pysilicon.file_gen import Module, Block, Statement, Text, TAB, declare_memory, vec_range, write_file_if_changed
+
+# NOTE Stimulus (DUT inputs) and responses (DUT outputs) are packed into one word
+# NOTE per clock cycle with ScanCodec (first port in the LSBs) and streamed to
+# NOTE chunked memory files <prefix>_<k>.hex of at most depth words plus
+# NOTE <prefix>.count. The generated module only takes file prefixes and DEPTH as
+# NOTE parameters, so new vectors never require a recompile. Response word k holds
+# NOTE the outputs one clock after stimulus word k was applied (i.e. just before
+# NOTE word k+1 is applied on the next falling edge).
+
+RE_RANGE = re.compile(r'\[([^:\]]+):([^\]]+)\]')
+# Hex digits -> '0' (x/z -> 'f') and x/z -> '0' for reading simulator output
+X_BITS = bytes.maketrans(b'0123456789abcdefABCDEFxXzZ',b'0000000000000000000000ffff')
+X_TO_ZERO = bytes.maketrans(b'xXzZ',b'0000')
+
+def port_width(port,evaluator=None):
+    ''' Width of port {name:,vec:} (vec like "[WIDTH-1:0]" or "[3:0][7:0]") or port {name:,width:} '''
+    if port.get('width') is not None:
+        return int(port['width'])
+    if not port.get('vec'):
+        return 1
+    evaluator = evaluator or ExprEvaluator()
+    width = 1
+    for msb,lsb in RE_RANGE.findall(port['vec']):
+        width *= abs(evaluator.evaluate(msb.strip())-evaluator.evaluate(lsb.strip()))+1
+    return width
+
+def port_codec(ports,evaluator=None):
+    ''' ScanCodec packing ports (first port in the LSBs) into one word '''
+    fields = []
+    pos = 0
+    for p in ports:
+        width = port_width(p,evaluator)
+        fields.append({'name': p['name'],'width': width,'mult': 1,'min_pos': pos})
+        pos += width
+    return ScanCodec(fields,max(pos,1))
+
+def chunk_fname(prefix,k):
+    return Path(f'{prefix}_{k}.hex')
+
+def count_fname(prefix):
+    return Path(f'{prefix}.count')
+
+def read_count(prefix):
+    ''' Number of vectors written to prefix '''
+    return int(count_fname(prefix).read_text().split()[0],16)
+
+#----------------------------------------------------------
+# Streaming vector files
+#----------------------------------------------------------
+class VectorWriter:
+    '''
+    Streams batches of port values into chunked memory files.
+    :param codec port_codec of the ports
+    :param prefix file prefix (files are <prefix>_<k>.hex and <prefix>.count)
+    :param depth max number of words per file (DEPTH of the generated module)
+    '''
+    def __init__(self,codec,prefix,depth=4096):
+        self.codec = codec
+        self.prefix = Path(prefix)
+        self.depth = int(depth)
+        self.count = 0
+        self.prefix.parent.mkdir(parents=True,exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def write(self,values,n=None):
+        ''' Appends a batch: dict port name -> uint64 array (scalars are broadcast, missing ports are 0) '''
+        self.write_vectors(self.codec.encode(values,n))
+
+    def write_vectors(self,vectors):
+        ''' Appends (N,nbytes) encoded vectors '''
+        i = 0
+        while i < len(vectors):
+            k,used = divmod(self.count,self.depth)
+            n = min(len(vectors)-i,self.depth-used)
+            self.codec.write(chunk_fname(self.prefix,k),vectors[i:i+n],append=used > 0)
+            self.count += n
+            i += n
+
+    def write_rows(self,rows,batch=1<<14):
+        ''' Appends vectors from an iterable of dicts port name -> value (e.g. a generator) '''
+        names = list(self.codec.fields)
+        buf = []
+        for row in rows:
+            buf.append([row.get(name,0) for name in names])
+            if len(buf) == batch:
+                self.write_columns(names,buf)
+                buf = []
+        if buf:
+            self.write_columns(names,buf)
+
+    def write_columns(self,names,buf):
+        values = np.array(buf,dtype=np.uint64)
+        self.write({name: values[:,i] for i,name in enumerate(names)})
+
+    def close(self):
+        ''' Writes <prefix>.count and returns number of vectors '''
+        count_fname(self.prefix).write_text(f'{self.count:08x}\n')
+        return self.count
+
+def iter_vectors(codec,prefix,xmask=False):
+    '''
+    Yields (N,nbytes) vectors of every chunk file of prefix. With xmask, yields
+    (N,2*nbytes) arrays [values (x/z read as 0) | mask of x/z bits] (for simulator output)
+    '''
+    count = read_count(prefix)
+    k = 0
+    while count > 0:
+        fstr = chunk_fname(prefix,k).read_bytes()
+        if xmask:
+            vectors = np.concatenate([codec.from_text(fstr.translate(X_TO_ZERO)),
+                codec.from_text(fstr.translate(X_BITS))],axis=1)
+        else:
+            vectors = codec.from_text(fstr)
+        vectors = vectors[:count]
+        count -= len(vectors)
+        k += 1
+        yield vectors
+
+def aligned(a_iter,b_iter):
+    ''' Yields pairs of equally long arrays from two streams of arrays until one stream ends '''
+    a = b = None
+    while True:
+        while a is None or not len(a):
+            a = next(a_iter,None)
+            if a is None:
+                return
+        while b is None or not len(b):
+            b = next(b_iter,None)
+            if b is None:
+                return
+        n = min(len(a),len(b))
+        yield a[:n],b[:n]
+        a,b = a[n:],b[n:]
+
+def until_missing(vec_iter):
+    ''' Yields arrays of a file stream until one of its files is missing (e.g. the sim died before writing it) '''
+    try:
+        yield from vec_iter
+    except FileNotFoundError:
+        return
+
+def skip(vec_iter,n):
+    ''' Drops the first n vectors of a stream of arrays '''
+    for vectors in vec_iter:
+        if n >= len(vectors):
+            n -= len(vectors)
+            continue
+        yield vectors[n:]
+        n = 0
+
+#----------------------------------------------------------
+# Testbench driver/checker
+#----------------------------------------------------------
+class VectorBench:
+    '''
+    Memory file driven stimulus and response capture for a DUT.
+    Inputs of the DUT (except clock and ignored ports) are driven from stimulus
+    files and outputs are captured to response files, which compare() checks
+    against expected responses after the run.
+    :param name name of the generated module
+    :param ports DUT ports {name:,io:,datatype:,vec:} (e.g. VlogIndex.ports) or {name:,io:,width:}
+    :param params DUT parameters {param:,value:} used to evaluate port widths
+    :param clock name of the clock port
+    :param ignore names of ports that are neither driven nor captured (e.g. resets)
+    :param depth words per memory file
+    '''
+    def __init__(self,name,ports,params=None,clock='clk',ignore=(),depth=4096):
+        self.name = name
+        self.clock = clock
+        self.depth = int(depth)
+        evaluator = ExprEvaluator({p['param']: p['value'] for p in params or []})
+        ports = [p for p in ports if p['name'] != clock and p['name'] not in ignore]
+        self.stim_ports = [dict(p,width=port_width(p,evaluator)) for p in ports if p['io'] == 'input']
+        self.resp_ports = [dict(p,width=port_width(p,evaluator)) for p in ports if p['io'] == 'output']
+        self.stim_codec = port_codec(self.stim_ports)
+        self.resp_codec = port_codec(self.resp_ports)
+
+    def stimulus_writer(self,prefix):
+        ''' VectorWriter for stimulus (DUT inputs) '''
+        return VectorWriter(self.stim_codec,prefix,self.depth)
+
+    def expected_writer(self,prefix):
+        ''' VectorWriter for expected responses (DUT outputs) '''
+        return VectorWriter(self.resp_codec,prefix,self.depth)
+
+    #----------------------------------------------------------
+    # Verilog
+    #----------------------------------------------------------
+    @staticmethod
+    def concat(ports):
+        ''' {last,...,first} so that the first port is in the LSBs '''
+        return '{' + ','.join(p['name'] for p in reversed(ports)) + '}'
+
+    def module(self):
+        ''' file_gen Module that drives the stimulus files and captures the response files '''
+        sw,rw = self.stim_codec.length,self.resp_codec.length
+        ports = [{'name': self.clock,'io': 'input','datatype': 'wire','vec': None}]
+        ports += [{'name': p['name'],'io': 'output','datatype': 'reg','vec': vec_range(p['width']) if p['width'] > 1 else None}
+            for p in self.stim_ports]
+        ports += [{'name': p['name'],'io': 'input','datatype': 'wire','vec': vec_range(p['width']) if p['width'] > 1 else None}
+            for p in self.resp_ports]
+        ports.append({'name': 'done','io': 'output','datatype': 'reg','vec': None})
+        decls = Text(
+            declare_memory('reg',  'stim_mem',vec_range(sw),'DEPTH',TAB) +
+            declare_memory('reg',  'resp_mem',vec_range(rw),'DEPTH',TAB) +
+            declare_memory('reg',  'count_mem','[31:0]',1,TAB) +
+            f'{TAB}reg [8*1024-1:0] fname;\n{TAB}integer count, g, n;\n\n')
+        capture = []
+        if self.resp_ports:
+            capture = [Block('if (g > 0) begin\n',[
+                Statement.assign('resp_mem[(g-1) % DEPTH]',self.concat(self.resp_ports)),
+                Block('if (RESP != "" && (g % DEPTH == 0 || g == count)) begin\n',[
+                    Statement('$sformat(fname,"%0s_%0d.hex",RESP,(g-1)/DEPTH);'),
+                    Statement('$writememh(fname,resp_mem,0,(g-1) % DEPTH);')
+                ],'end\n')
+            ],'end\n')]
+        drive = [Block('if (g < count) begin\n',[
+            Block('if (g % DEPTH == 0) begin\n',[
+                Statement.assign('n','(count-g < DEPTH) ? count-g : DEPTH'),
+                Statement('$sformat(fname,"%0s_%0d.hex",STIM,g/DEPTH);'),
+                Statement('$readmemh(fname,stim_mem,0,n-1);')
+            ],'end\n'),
+            Statement.assign(self.concat(self.stim_ports),'stim_mem[g % DEPTH]') if self.stim_ports else Text('')
+        ],'end\n')]
+        initial = Block('initial begin\n',[
+            Statement.assign('done',"1'b0"),
+            Statement('$sformat(fname,"%0s.count",STIM);'),
+            Statement('$readmemh(fname,count_mem);'),
+            Statement.assign('count','count_mem[0]'),
+            Text('// Response of word g-1 is captured right before word g is applied\n'),
+            Block('for (g = 0; g <= count; g = g + 1) begin\n',[Statement('@(negedge '+self.clock+');')]+capture+drive,'end\n'),
+            Statement.assign('done',"1'b1")
+        ],'end\n')
+        return Module(self.name,
+            params=[{'param': 'STIM','value': '"stim"'},{'param': 'RESP','value': '"resp"'},{'param': 'DEPTH','value': self.depth}],
+            ports=ports,
+            body=[decls,initial])
+
+    def write_module(self,fname):
+        ''' Writes module() to verilog file fname (only if changed). Returns True if written '''
+        return write_file_if_changed(fname,self.module().emit())
+
+    #----------------------------------------------------------
+    # Checking
+    #----------------------------------------------------------
+    def compare(self,expected_prefix,response_prefix,masks=None,latency=0,max_report=10):
+        '''
+        Compares simulator responses against expected responses chunk by chunk.
+        x/z response bits always mismatch (unless masked).
+        :param masks dict port name -> bit mask of compared bits (other ports are fully compared)
+        :param latency expected word k is compared against response word k+latency
+        :param max_report max number of mismatches listed in first
+        Returns {vectors:,failed:,missing:,ports: {name: mismatches},first: [(index,port,expected,got)]}
+        where missing expected vectors without response (e.g. the sim stopped early or never wrote
+        its response files) count as failed
+        '''
+        codec = self.resp_codec
+        nbytes = codec.nbytes
+        bits = np.zeros(8*nbytes,dtype=np.uint8)
+        bits[:codec.length] = 1
+        for name,m in (masks or {}).items():
+            field = codec.fields[name]
+            bits[field['min_pos']:field['min_pos']+field['width']] = [(int(m) >> i) & 1 for i in range(field['width'])]
+        mask = np.packbits(bits,bitorder='little')
+        report = {'vectors': 0,'failed': 0,'missing': 0,'ports': {name: 0 for name in codec.fields},'first': []}
+        responses = skip(until_missing(iter_vectors(codec,response_prefix,xmask=True)),latency)
+        for exp,resp in aligned(iter_vectors(codec,expected_prefix),responses):
+            got,xbits = resp[:,:nbytes],resp[:,nbytes:]
+            diff = ((got ^ exp) | xbits) & mask
+            bad = np.flatnonzero(diff.any(axis=1))
+            if len(bad):
+                per_port = codec.decode(diff[bad])
+                for name,v in per_port.items():
+                    v = v.reshape(len(bad),-1).any(axis=1)
+                    report['ports'][name] += int(v.sum())
+                if len(report['first']) < max_report:
+                    exp_v,got_v = codec.decode(exp[bad]),codec.decode(got[bad])
+                    for j,idx in enumerate(bad[:max_report-len(report['first'])]):
+                        for name,v in per_port.items():
+                            if len(report['first']) < max_report and v.reshape(len(bad),-1)[j].any():
+                                report['first'].append((report['vectors']+int(idx),name,exp_v[name][j].tolist(),got_v[name][j].tolist()))
+            report['vectors'] += len(exp)
+            report['failed'] += len(bad)
+        report['missing'] = read_count(expected_prefix)-report['vectors']
+        report['vectors'] += report['missing']
+        report['failed'] += report['missing']
+        return report
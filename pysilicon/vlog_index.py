@@ -0,0 +1,245 @@
+import re
+from pathlib import Path
+from pysilicon.file_index import FileIndex
+
+#----------------------------------------------------------
+# Verilog interface parsing
+#----------------------------------------------------------
+RE_COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/',re.S)
+RE_DIRECTIVE = re.compile(r'^[ \t]*`(?:ifdef|ifndef|else|elsif|endif|define|undef|include|timescale|default_nettype|resetall|celldefine|endcelldefine)\b[^\n]*',re.M)
+RE_MODULE = re.compile(r'\b(?:module|macromodule)\s+(?:automatic\s+|static\s+)?([A-Za-z_][\w$]*)')
+RE_ENDMODULE = re.compile(r'\bendmodule\b')
+RE_BODY_DECL = re.compile(r'\b(input|output|inout|parameter)\b([^;]*);')
+RE_SPACE = re.compile(r'\s*')
+RE_UNPACKED = re.compile(r'(\s*\[[^\]]*\])+\s*$')
+RE_INCLUDE = re.compile(r'`include\s+"([^"]+)"')
+RE_INCDIR = re.compile(r'-incdir\s+(\S+)|\+incdir((?:\+[^+\s]+)+)')
+DIRECTIONS = ('input','output','inout')
+DATATYPES = ('wire','reg','logic','integer','int','bit','byte','real','time','tri','tri0',
+    'tri1','wand','wor','supply0','supply1','signed','unsigned','var','shortint','longint')
+
+def strip_comments(fstr):
+    ''' Removes comments and compiler directives while keeping line count intact '''
+    fstr = RE_COMMENT.sub(lambda m: '\n'*m.group(0).count('\n'),fstr)
+    return RE_DIRECTIVE.sub('',fstr)
+
+def split_top_level(fstr,sep=','):
+    ''' Splits string on sep when not nested in (), [] or {} '''
+    if '(' not in fstr and '[' not in fstr and '{' not in fstr:
+        return [item.strip() for item in fstr.split(sep) if item.strip()]
+    items = []
+    depth = 0
+    start = 0
+    for i,c in enumerate(fstr):
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif c == sep and depth == 0:
+            items.append(fstr[start:i].strip())
+            start = i+1
+    items.append(fstr[start:].strip())
+    return [item for item in items if item]
+
+def match_paren(fstr,start):
+    ''' Returns index one past the paren that closes the paren at start '''
+    depth = 0
+    for i in range(start,len(fstr)):
+        if fstr[i] == '(':
+            depth += 1
+        elif fstr[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return i+1
+    return len(fstr)
+
+def split_vec(decl):
+    ''' Splits declaration into (words before vector, vector str, words after vector) '''
+    lb = decl.find('[')
+    if lb < 0:
+        return decl.split(),None,[]
+    depth = 0
+    end = lb
+    # Packed dimensions may be chained e.g. [3:0][7:0]
+    while end < len(decl) and (decl[end] == '[' or depth > 0 or decl[end].isspace()):
+        if decl[end] == '[':
+            depth += 1
+        elif decl[end] == ']':
+            depth -= 1
+        end += 1
+    return decl[:lb].split(),decl[lb:end].strip().replace(' ',''),decl[end:].split()
+
+def parse_param_decls(decl):
+    ''' Parses "parameter [type] A = x, B = y" into [{param:,value:}] '''
+    params = []
+    for item in split_top_level(decl):
+        lhs,eq,rhs = item.partition('=')
+        words = split_vec(lhs)[2] or split_vec(lhs)[0]
+        if words:
+            params.append({'param': words[-1],'value': rhs.strip() if eq else None})
+    return params
+
+def parse_port_decls(decl,prev=None):
+    ''' Parses "input wire [3:0] a, b" into [{name:,io:,datatype:,vec:}] '''
+    ports = []
+    for item in split_top_level(decl):
+        before,vec,after = split_vec(RE_UNPACKED.sub('',item.split('=')[0]))
+        words = before + after
+        if not words:
+            continue
+        if words[0] in DIRECTIONS:
+            prev = {
+                'io': words[0],
+                'datatype': ' '.join(words[1:-1]),
+                'vec': vec
+            }
+        elif prev is None or (len(words) > 1 and words[0] not in DATATYPES):
+            # Non-ANSI port name or interface port
+            prev = {'io': None,'datatype': '','vec': None}
+        ports.append({'name': words[-1],'io': prev['io'],'datatype': prev['datatype'],'vec': prev['vec']})
+    return ports,prev
+
+def parse_modules(fstr):
+    ''' Returns module records {name:,line:,params:,ports:} for every module in verilog source '''
+    fstr = strip_comments(fstr)
+    modules = []
+    pos = 0
+    line = 1
+    while True:
+        m = RE_MODULE.search(fstr,pos)
+        if m is None:
+            break
+        name = m.group(1)
+        line += fstr.count('\n',pos,m.start())
+        i = m.end()
+        params = []
+        ports = []
+        # Parameter port list
+        j = RE_SPACE.match(fstr,i).end()
+        has_param_list = fstr.startswith('#',j)
+        if has_param_list:
+            k = fstr.index('(',j)
+            end = match_paren(fstr,k)
+            decl = fstr[k+1:end-1]
+            for item in split_top_level(decl):
+                item = re.sub(r'^\s*parameter\b','',item)
+                params += parse_param_decls(item)
+            i = end
+        # Port list
+        semi = fstr.find(';',i)
+        k = fstr.find('(',i)
+        if k >= 0 and (semi < 0 or k < semi):
+            end = match_paren(fstr,k)
+            prev = None
+            for item in split_top_level(fstr[k+1:end-1]):
+                new_ports,prev = parse_port_decls(item,prev)
+                ports += new_ports
+            semi = fstr.find(';',end)
+        # Module body (non-ANSI port declarations and body parameters)
+        e = RE_ENDMODULE.search(fstr,semi)
+        body_end = e.start() if e else len(fstr)
+        by_name = {p['name']: p for p in ports}
+        for d in RE_BODY_DECL.finditer(fstr,semi,body_end):
+            if d.group(1) == 'parameter':
+                if not has_param_list:
+                    params += parse_param_decls(d.group(2))
+            else:
+                for p in parse_port_decls(d.group(0)[:-1])[0]:
+                    if p['name'] in by_name and by_name[p['name']]['io'] is None:
+                        by_name[p['name']].update(p)
+        modules.append({
+            'name': name,
+            'line': line,
+            'params': params,
+            'ports': ports
+        })
+        line += fstr.count('\n',m.start(),e.end() if e else len(fstr))
+        pos = e.end() if e else len(fstr)
+    return modules
+
+#----------------------------------------------------------
+# Include files
+#----------------------------------------------------------
+def include_dirs(flags,cwd):
+    ''' Include directories of simulator flags str (-incdir dir or +incdir+dir1+dir2), relative to cwd '''
+    dirs = []
+    for m in RE_INCDIR.finditer(flags):
+        names = [m.group(1)] if m.group(1) else m.group(2).split('+')[1:]
+        dirs += [Path(cwd) / name for name in names]
+    return dirs
+
+def included_files(files,incdirs=()):
+    '''
+    Returns resolved paths of the files `included by files (recursively). Includes
+    are searched next to the including file and then in incdirs
+    '''
+    found = {}
+    todo = list(files)
+    while todo:
+        f = Path(todo.pop())
+        try:
+            with open(f,'r',errors='replace') as fp:
+                names = RE_INCLUDE.findall(RE_COMMENT.sub('',fp.read()))
+        except OSError:
+            continue
+        for name in names:
+            for d in [f.parent]+list(incdirs):
+                path = (d / name).resolve()
+                if path.is_file():
+                    if path not in found:
+                        found[path] = True
+                        todo.append(path)
+                    break
+    return list(found)
+
+#----------------------------------------------------------
+# Persistent module-interface index
+#----------------------------------------------------------
+class VlogIndex(FileIndex):
+    '''
+    Index of module ports and parameters for a set of verilog files. Port and
+    parameter records use the same dict format as the file_gen functions:
+    ports: {name:,io:,datatype:,vec:}, parameters: {param:,value:}
+    '''
+    version = 1
+
+    def __init__(self,cache_fname):
+        self.modules = None
+        super().__init__(cache_fname)
+
+    def parse(self,path):
+        with open(path,'r',errors='replace') as fp:
+            return parse_modules(fp.read())
+
+    def changed(self):
+        self.modules = None
+
+    def lookup_table(self):
+        ''' Returns (and lazily builds) dict mapping module name to record '''
+        if self.modules is None:
+            self.modules = {}
+            for path,record in self.records():
+                self.modules[record['name']] = dict(record,file=path)
+        return self.modules
+
+    def module(self,name):
+        ''' Returns module record or None '''
+        return self.lookup_table().get(name)
+
+    def ports(self,name):
+        ''' Returns list of {name:,io:,datatype:,vec:} for module name '''
+        return self.lookup_table()[name]['ports']
+
+    def parameters(self,name):
+        ''' Returns list of {param:,value:} for module name '''
+        return self.lookup_table()[name]['params']
+
+    def inst_ports(self,name,signals=None):
+        ''' Returns {port:,signal:} list for vlog_mod_inst. Signals default to port names '''
+        signals = signals if signals is not None else {}
+        return [{'port': p['name'],'signal': signals.get(p['name'],p['name'])} for p in self.ports(name)]
+
+    def inst_params(self,name,values=None):
+        ''' Returns {param:,value:} list for vlog_mod_inst. Values default to declared defaults '''
+        values = values if values is not None else {}
+        return [{'param': p['param'],'value': values.get(p['param'],p['value'])} for p in self.parameters(name)]
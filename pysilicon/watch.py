@@ -0,0 +1,277 @@
+import os
+import sys
+import time
+import select
+import ctypes
+import ctypes.util
+import argparse
+import yaml
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# NOTE inotify (Linux) is only used to wake up the watcher. What changed is always
+# NOTE determined by comparing (size,mtime) stamps of the watched files, so the
+# NOTE polling fallback behaves exactly the same (just with more latency).
+
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+# Errors of loading half edited or deleted task and project files (SystemExit: invalid file, already logged)
+LOAD_ERRORS = (SystemExit,OSError,yaml.YAMLError)
+
+def stamp(path):
+    ''' (size,mtime) of path or None if it does not exist '''
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size,st.st_mtime_ns)
+
+#----------------------------------------------------------
+# File change notification
+#----------------------------------------------------------
+class Inotify:
+    ''' Minimal ctypes binding of Linux inotify (raises OSError where unavailable) '''
+    mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library('c'),use_errno=True)
+            self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (AttributeError,TypeError):
+            raise OSError('inotify is not available')
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(),'inotify_init1 failed')
+        self.dirs = set()
+
+    def add(self,d):
+        ''' Watches directory d (entries created, modified, moved or deleted) '''
+        d = str(d)
+        if d not in self.dirs and self.libc.inotify_add_watch(self.fd,os.fsencode(d),self.mask) >= 0:
+            self.dirs.add(d)
+
+    def wait(self,timeout=None):
+        ''' Returns True if events arrived within timeout (pending events are discarded) '''
+        ready,_,_ = select.select([self.fd],[],[],timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd,1<<16):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+class Watcher:
+    '''
+    Waits for changes of a set of files and returns once edits stopped for
+    debounce seconds. Uses inotify when available and polls otherwise.
+    :param interval polling interval in seconds (also the inotify safety timeout)
+    :param debounce quiet time that ends a burst of edits
+    :param poll do not use inotify
+    '''
+    def __init__(self,interval=1.0,debounce=0.3,poll=False):
+        self.interval = interval
+        self.debounce = debounce
+        self.inotify = None
+        if not poll:
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                pass
+        self.stamps = {}
+
+    def watch(self,paths,dirs=()):
+        ''' Sets files to compare and directories to watch (parents of files are watched as well) '''
+        self.paths = [str(p) for p in paths]
+        if self.inotify:
+            for d in set(str(Path(p).parent) for p in self.paths) | set(str(d) for d in dirs):
+                self.inotify.add(d)
+
+    def changed(self):
+        ''' Returns set of watched files whose stamp changed since the last call '''
+        stamps = {p: stamp(p) for p in self.paths}
+        changed = set(p for p,s in stamps.items() if self.stamps.get(p,s) != s)
+        changed |= set(p for p in self.stamps if p not in stamps)
+        self.stamps = stamps
+        return changed
+
+    def wake(self,timeout):
+        if self.inotify:
+            return self.inotify.wait(timeout)
+        time.sleep(timeout)
+        return True
+
+    def wait(self):
+        '''
+        Blocks for one wake up (directory event or poll interval) and until edits settled.
+        Returns (set of changed watched files,True if directories may have new files)
+        '''
+        woke = self.wake(self.interval)
+        # inotify misses changes made on other hosts of network file systems: compare stamps anyway
+        changed = self.changed()
+        if woke or changed:
+            changed |= self.settle()
+        return changed,woke
+
+    def settle(self):
+        ''' Waits until no more changes happen within debounce seconds. Returns everything that changed '''
+        changed = set()
+        while True:
+            if self.inotify:
+                more = self.inotify.wait(self.debounce)
+            else:
+                time.sleep(self.debounce)
+                more = False
+            now = self.changed()
+            changed |= now
+            if not more and not now:
+                return changed
+
+#----------------------------------------------------------
+# Incremental simulation reruns
+#----------------------------------------------------------
+class SimWatch:
+    '''
+    Keeps a PySilicon instance loaded and reruns the sim tasks whose task file
+    or hdl files changed.
+    :param ps PySilicon instance of the project
+    :param sim_types sim task types to watch (e.g. ["rtl"])
+    :param jobs number of simulations run in parallel
+    '''
+    def __init__(self,ps,sim_types=('rtl',),jobs=1,watcher=None):
+        self.ps = ps
+        self.sim_types = list(sim_types)
+        self.jobs = jobs
+        self.watcher = watcher or Watcher()
+        self.configs = {}
+        # Error of the last failed project reload (the previous project is kept until it is fixed)
+        self.project_error = None
+        self.scan()
+        self.watcher.changed()
+
+    def scan(self):
+        ''' Loads new or changed task files and updates the file -> task map and the watched files '''
+        tasks = {}
+        for sim_type in self.sim_types:
+            for f in self.ps.find_tasks(['sim_'+sim_type+'.yml']):
+                key = (sim_type,f)
+                old = self.configs.get(key)
+                if old is None or old[0] != stamp(f):
+                    try:
+                        old = (stamp(f),self.ps.load_sim_config(f,sim_type))
+                    except LOAD_ERRORS as err:
+                        # Invalid task file: keep watching it until it is fixed
+                        self.load_error(err,f)
+                        old = (stamp(f),None)
+                tasks[key] = old
+        self.configs = tasks
+        self.deps = defaultdict(set)
+        for key,(_,config) in tasks.items():
+            self.deps[key[1]].add(key)
+            if config is not None:
+                for f in config['hdl_files']:
+                    self.deps[str(f)].add(key)
+        self.globals = [str(self.ps.wd / 'filelist.yml'),str(self.ps.wd / 'config.yml')]
+        self.watcher.watch(list(self.deps)+self.globals,[d for d in self.task_dirs()])
+
+    def task_dirs(self):
+        ''' Task directories and their subdirectories (new task files can show up anywhere) '''
+        for d in self.ps.task_dirs:
+            d = self.ps.wd / d
+            yield d
+            for sub in d.rglob('*'):
+                if sub.is_dir():
+                    yield sub
+
+    def affected(self,changed):
+        ''' Returns list of (sim_type,task file) whose inputs are in changed (all tasks if global files changed) '''
+        if any(f in self.globals for f in changed):
+            try:
+                ps = type(self.ps)()
+            except LOAD_ERRORS as err:
+                # Broken config.yml/filelist.yml: keep the previous project until it is fixed
+                self.project_error = self.load_error(err,'project')
+            else:
+                self.ps = ps
+                self.project_error = None
+                self.configs = {}
+                self.scan()
+                return [key for key,(_,config) in self.configs.items() if config is not None]
+        keys = set(key for f in changed for key in self.deps.get(f,()))
+        known = set(self.configs)
+        self.scan()
+        # New task files are run as well
+        keys |= set(self.configs)-known
+        return sorted(key for key in keys if self.configs.get(key,(None,None))[1] is not None)
+
+    def load_error(self,err,what):
+        ''' Logs and returns message of failed load of what (SystemExit was already logged by PySilicon) '''
+        detail = '' if isinstance(err,SystemExit) else f': {err}'
+        msg = f'Loading {what} failed{detail}'
+        self.ps.logger.error(f'{msg}. Waiting for the next change')
+        return msg
+
+    def run(self,keys):
+        ''' Runs sims of keys (jobs at a time) and logs results as they complete. Returns dict key -> passed '''
+        results = {}
+        with ThreadPoolExecutor(self.jobs) as pool:
+            start = time.monotonic()
+            futures = {pool.submit(self.ps.sim_action,key[0],self.configs[key][1]): key for key in keys}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result() is not False
+                except Exception as err:
+                    self.ps.logger.error(f'{err!r}')
+                    results[key] = False
+                self.ps.logger.info(f'[{"PASS" if results[key] else "FAIL"}] sim_{key[0]}:{self.configs[key][1]["name"]} '
+                    f'({time.monotonic()-start:.1f} s)')
+        return results
+
+    def loop(self,cycles=None):
+        ''' Waits for changes and reruns affected sims (forever or for cycles reruns) '''
+        self.ps.logger.info(f'Watching {len(self.watcher.paths)} files of {len(self.configs)} sim task(s)'
+            f' ({"inotify" if self.watcher.inotify else "polling"})')
+        while cycles is None or cycles > 0:
+            changed,woke = self.watcher.wait()
+            if not changed and not woke:
+                continue
+            keys = self.affected(changed)
+            if not keys:
+                continue
+            self.ps.logger.info(f'{len(changed)} file(s) changed. Rerunning {len(keys)} sim task(s)')
+            self.run(keys)
+            if cycles is not None:
+                cycles -= 1
+
+#----------------------------------------------------------
+# Command line
+#----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reruns affected simulations whenever HDL or task files change.")
+    parser.add_argument('-t','--types',nargs='+',default=['rtl'],choices=['rtl','syn','par'],
+        help='Simulation types to watch. Default: rtl')
+    parser.add_argument('-j','--jobs',type=int,default=1,help='Number of simulations run in parallel. Default: 1')
+    parser.add_argument('-d','--debounce',type=float,default=0.3,help='Seconds without edits before rerunning. Default: 0.3')
+    parser.add_argument('-i','--interval',type=float,default=1.0,help='Polling interval in seconds. Default: 1.0')
+    parser.add_argument('--poll',action='store_true',help='Poll even if inotify is available.')
+    parser.add_argument('--initial',action='store_true',help='Run all watched sims once at startup.')
+    args = parser.parse_args(argv)
+    from pysilicon.dodo_utility import PySilicon
+    sw = SimWatch(PySilicon(),args.types,args.jobs,Watcher(args.interval,args.debounce,args.poll))
+    if args.initial:
+        sw.run([key for key,(_,config) in sw.configs.items() if config is not None])
+    try:
+        sw.loop()
+    except KeyboardInterrupt:
+        sys.exit(0)
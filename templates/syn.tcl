@@ -62,6 +62,7 @@ report_gates > reports/report_gates.txt
 # Export design
 write_hdl > {{top_module}}.mapped.v
 write_sdc > constraints.sdc
+write_sdf > {{top_module}}.sdf
 write_db -all_root_attributes -script snapshots/final.tcl
 #
 ## export design for Innovus
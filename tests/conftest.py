@@ -0,0 +1,36 @@
+import os
+import logging
+import pytest
+from pathlib import Path
+from pysilicon.dodo_utility import PySilicon
+
+home_dir = Path(__file__).resolve().parents[1]
+
+#----------------------------------------------------------
+# PySilicon stubs
+#----------------------------------------------------------
+def pysilicon_stub(wd,**attrs):
+    '''
+    PySilicon without config.yml/filelist.yml. Sets logger, wd, home_dir, rel_home,
+    prj_scratch_dir, task_dirs and schemata, attrs add or override attributes
+    (e.g. filelist, syn_configs, sim_action)
+    '''
+    ps = PySilicon.__new__(PySilicon)
+    ps.logger = logging.getLogger('pysilicon_test')
+    if not ps.logger.handlers:
+        ps.logger.addHandler(logging.StreamHandler())
+        ps.logger.setLevel(logging.INFO)
+    ps.wd = Path(wd)
+    ps.home_dir = home_dir
+    ps.rel_home = Path(os.path.relpath(home_dir,ps.wd))
+    ps.prj_scratch_dir = ps.wd / 'scratch' / 'build'
+    ps.task_dirs = []
+    ps.schemata = ps.get_schemata()
+    for name,value in attrs.items():
+        setattr(ps,name,value)
+    return ps
+
+@pytest.fixture
+def ps_stub(tmp_path):
+    ''' Returns factory ps_stub(**attrs) of PySilicon stubs working in tmp_path (see pysilicon_stub) '''
+    return lambda **attrs: pysilicon_stub(tmp_path,**attrs)
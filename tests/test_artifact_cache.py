@@ -0,0 +1,81 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pysilicon.artifact_cache import ArtifactCache, cache_key
+
+#----------------------------------------------------------
+# Artifact cache tests
+#----------------------------------------------------------
+def test_key_and_roundtrip(tmp_path):
+    ''' keys follow file contents and params, entries restore files and directories '''
+    src = tmp_path / 'a.v'
+    src.write_text('module a; endmodule\n')
+    key = cache_key([src],tool='genus',flags=['-batch'])
+    assert(key == cache_key([src],flags=['-batch'],tool='genus') != cache_key([src],tool='genus',flags=[]))
+    (tmp_path / 'snap').mkdir()
+    (tmp_path / 'snap' / 'lib').write_text('x')
+    cache = ArtifactCache(tmp_path / 'cache')
+    assert(cache.get(key,tmp_path) is None)
+    assert(cache.put(key,[src,tmp_path / 'snap'],task='syn:a'))
+    assert(not cache.put(key,[src]))
+    (tmp_path / 'out').mkdir()
+    assert(cache.get(key,tmp_path / 'out') == [tmp_path / 'out' / 'a.v',tmp_path / 'out' / 'snap'])
+    assert((tmp_path / 'out' / 'snap' / 'lib').read_text() == 'x')
+    assert(cache.stats() == {'misses': 1,'puts': 1,'hits': 1})
+    src.write_text('module b; endmodule\n')
+    assert(cache_key([src],tool='genus',flags=['-batch']) != key)
+
+def test_concurrent_put_and_lru(tmp_path):
+    ''' one of several concurrent writers wins and least recently used entries are evicted '''
+    f = tmp_path / 'net.v'
+    f.write_bytes(b'0'*1000)
+    cache = ArtifactCache(tmp_path / 'cache')
+    with ThreadPoolExecutor(8) as pool:
+        assert(sum(pool.map(lambda i: cache.put('k0',[f]),range(8))) == 1)
+    assert(list((tmp_path / 'cache' / 'tmp').iterdir()) == [])
+    for i in range(1,4):
+        cache.put(f'k{i}',[f])
+        os.utime(cache.entry_dir(f'k{i}') / 'meta.json',(i,i))
+    os.utime(cache.entry_dir('k0') / 'meta.json',(0,0))
+    assert(cache.get('k1',tmp_path / 'cache' / 'tmp') is not None)
+    assert(cache.evict(2000) == 2)
+    assert(sorted(e.name for _,_,e in cache.entries()) == ['k1','k3'])
+    assert('2 entries' in cache.summary() and 'evictions 2' in cache.summary())
+
+def test_shared_permissions(tmp_path,monkeypatch,request):
+    ''' entries are group writable and permission errors are misses/skipped stores '''
+    umask = os.umask(0o022)
+    request.addfinalizer(lambda: os.umask(umask))
+    f = tmp_path / 'net.v'
+    f.write_text('x')
+    cache = ArtifactCache(tmp_path / 'cache')
+    assert(cache.put('k0',[f]))
+    for path in (cache.root,cache.root / 'objects',cache.entry_dir('k0').parent,cache.entry_dir('k0')):
+        assert(path.stat().st_mode & 0o2070 == 0o2070)
+    for path in (cache.root / 'lock',cache.root / 'stats.json',cache.entry_dir('k0') / 'net.v',cache.entry_dir('k0') / 'meta.json'):
+        assert(path.stat().st_mode & 0o060 == 0o060)
+    def denied(*args,**kwargs):
+        raise PermissionError(13,'Permission denied')
+    monkeypatch.setattr('pysilicon.artifact_cache.copy_path',denied)
+    assert(cache.get('k0',tmp_path / 'out') is None and not cache.put('k1',[f]))
+    assert(list((cache.root / 'tmp').iterdir()) == [])
+
+def test_sim_snapshot_key(tmp_path,ps_stub):
+    ''' edited `include headers invalidate cached sim snapshots '''
+    (tmp_path / 'inc').mkdir()
+    (tmp_path / 'inc' / 'params.vh').write_text('`define W 8\n')
+    (tmp_path / 'tb.v').write_text('`include "params.vh"\nmodule tb; endmodule\n')
+    commands = []
+    def shell(command):
+        commands.append(command)
+        if '-elaborate' in command:
+            (exp_dir / 'xcelium.d').mkdir()
+        return 0
+    ps = ps_stub(artifact_cache=ArtifactCache(tmp_path / 'cache'),snapshots=None,shell=shell)
+    config = {'name': 'tb','testbench': 'tb','tcl_template': None,'hdl_files': [tmp_path / 'tb.v'],
+        'sim_flags': [f'-incdir {tmp_path / "inc"}']}
+    for edit,elaborated in ((None,1),(None,1),('`define W 16\n',2)):
+        if edit:
+            (tmp_path / 'inc' / 'params.vh').write_text(edit)
+        exp_dir = ps.create_scratch_dir('sim_rtl','tb')
+        assert(ps.sim_run('rtl',config,exp_dir))
+        assert(sum('-elaborate' in c for c in commands) == elaborated)
@@ -0,0 +1,85 @@
+import sys
+import time
+import threading
+import pytest
+from pysilicon.dodo_utility import PySilicon
+from pysilicon.watch import Watcher
+from pysilicon.daemon import serve, ProjectDaemon
+from pysilicon.daemon_client import request, wait_jobs, DaemonError
+
+#----------------------------------------------------------
+# Daemon tests
+#----------------------------------------------------------
+def test_daemon_queries_and_runs(tmp_path,monkeypatch,ps_stub):
+    ''' client queries the loaded project, submits runs and sees new task files '''
+    rtl = tmp_path / 'a.v'
+    rtl.write_text('module a; endmodule\n')
+    ps = ps_stub(task_dirs=['blocks'],syn_configs=None,filelist={'defines_src': [],'rtl_src': [rtl],'test_src': []},
+        sim_action=lambda sim_type,config: config['name'] == 'blk0')
+    def write_task(name):
+        (tmp_path / 'blocks' / name).mkdir(parents=True)
+        (tmp_path / 'blocks' / name / 'sim_rtl.yml').write_text(f'name: {name}\ntestbench: tb\ntcl_template:\n'
+            f'filelist:\n  defines_src:\n  rtl_src:\n  - {rtl}\n  test_src:\nsim_flags:\n')
+    write_task('blk0')
+    sock = tmp_path / 'ps.sock'
+    watcher = Watcher(interval=0.05,debounce=0.01,poll=True)
+    server = threading.Thread(target=serve,args=(ps,sock,1,watcher))
+    server.start()
+    try:
+        for _ in range(100):
+            if sock.exists():
+                break
+            time.sleep(0.05)
+        assert(request('ping',sock)['wd'] == str(tmp_path))
+        assert([t['name'] for t in request('tasks',sock)] == ['sim_rtl:blk0'])
+        assert(request('filelist',sock,task='sim_rtl:blk0') == [str(rtl)])
+        write_task('blk1')
+        for _ in range(100):
+            if len(request('tasks',sock,prefix='sim_rtl')) == 2:
+                break
+            time.sleep(0.05)
+        ids = request('run',sock,tasks=['sim_rtl:blk0','sim_rtl:blk1'])
+        assert(sorted((job['task'],job['passed']) for job in wait_jobs(ids,sock,0.01)) ==
+            [('sim_rtl:blk0',True),('sim_rtl:blk1',False)])
+        with pytest.raises(DaemonError):
+            request('run',sock,tasks=['sim_rtl:missing'])
+        with pytest.raises(DaemonError):
+            request('bogus',sock)
+        # Unexpected errors are answered instead of dropping the connection
+        monkeypatch.setattr(ps,'get_syn_configs',lambda: 1/0)
+        with pytest.raises(DaemonError,match='division by zero'):
+            request('tasks',sock)
+        monkeypatch.undo()
+        # Failed reloads are reported by ping and do not stop reloading
+        def until(cond):
+            for _ in range(100):
+                if cond():
+                    return True
+                time.sleep(0.05)
+        monkeypatch.setattr(ps,'find_tasks',lambda names: 1/0)
+        rtl.write_text('module a2; endmodule\n')
+        assert(until(lambda: 'ZeroDivisionError' in str(request('ping',sock)['error'])))
+        monkeypatch.undo()
+        monkeypatch.setattr(PySilicon,'__init__',lambda self: sys.exit(1))
+        (tmp_path / 'config.yml').write_text('broken')
+        assert(until(lambda: request('ping',sock)['error'] == 'Loading project failed'))
+        write_task('blk2')
+        assert(until(lambda: len(request('tasks',sock,prefix='sim_rtl')) == 3))
+    finally:
+        request('shutdown',sock)
+        server.join(5)
+    assert(not server.is_alive() and not sock.exists())
+
+def test_daemon_evicts_jobs(ps_stub):
+    ''' only the newest finished jobs are kept and job ids are never reused '''
+    ps = ps_stub(syn_configs={'s': {'name': 's'}},filelist={'defines_src': [],'rtl_src': [],'test_src': []},syn_action=lambda config: True)
+    daemon = ProjectDaemon(ps,watcher=Watcher(poll=True))
+    ids = [daemon.cmd_run(['syn:s'])[0] for _ in range(3)]
+    for _ in range(100):
+        if all(job['state'] == 'done' for job in daemon.jobs.values()):
+            break
+        time.sleep(0.01)
+    daemon.evict_jobs(keep=1)
+    assert(list(daemon.jobs) == [ids[2]] and daemon.cmd_run(['syn:s']) == [3])
+    with pytest.raises(ValueError):
+        daemon.cmd_status([0])
@@ -0,0 +1,34 @@
+import pytest
+from pysilicon.expr_eval import ExprEvaluator, ExprError, compile_expr
+
+#----------------------------------------------------------
+# Parameter expression tests
+#----------------------------------------------------------
+def test_integer_expressions():
+    ''' integer arithmetic, log functions and out-of-order parameter references '''
+    ev = ExprEvaluator({'a': 'b*2','b': 6,'depth': 'clog2(a)+flog2(a)'})
+    assert(ev.evaluate_params() == {'a': 12,'b': 6,'depth': 7})
+    assert(ev.evaluate('a*b+3') == 75)
+    assert(ev.evaluate('log2(1024)//(b-4)') == 5)
+    assert(ev.evaluate('a/4') == 3)
+    assert(ev.evaluate(17) == 17)
+    # Integer literals are evaluated natively (no sympy fallback)
+    assert(compile_expr('3') == ('const',3))
+
+def test_sympy_fallback():
+    ''' expressions outside of the integer subset are handed to sympy '''
+    ev = ExprEvaluator({'x': 5})
+    assert(ev.evaluate('ceiling(x/2)') == 3)
+    with pytest.raises(ExprError):
+        ev.evaluate('x/2')
+
+def test_errors():
+    ''' unknown and cyclic parameters are reported '''
+    with pytest.raises(ExprError):
+        ExprEvaluator({'a': 'b'}).evaluate_params()
+    with pytest.raises(ExprError):
+        ExprEvaluator({'a': 'b','b': 'a+1'}).evaluate_params()
+    with pytest.raises(ExprError):
+        compile_expr('__import__("os")')
+    with pytest.raises(ExprError):
+        compile_expr('len("abc")')
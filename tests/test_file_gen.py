@@ -0,0 +1,47 @@
+import pytest
+from pysilicon.file_gen import *
+
+#----------------------------------------------------------
+# Verilog IR tests
+#----------------------------------------------------------
+def test_helpers_match_ir():
+    ''' dict based helpers and IR objects render the same verilog '''
+    ports = [{'name': 'a','io': 'input','datatype': 'wire','vec': '[3:0]'},{'name': 'b','io': 'output','datatype': 'reg','vec': None}]
+    params = [{'param': 'W','value': 4}]
+    module = Module('m',[Param('W',4)],[Port('a',vec='[3:0]'),Port('b','output','reg')],[
+        Instance('sub','u0',[Param('W','W')],[Connection('a','a')]),
+        Task('t',[Port('x','input','',"[3:0]")],[Variable('i','integer')],[Statement.assign('i','x')])])
+    assert(vlog_mod_dec('m',ports,params) == module.declaration())
+    assert(''.join(iter_vlog_file('m',ports,params,[
+        vlog_mod_inst('sub','u0',[{'param': 'W','value': 'W'}],[{'port': 'a','signal': 'a'}]),
+        vlog_task('t',[{'name': 'x','io': 'input','datatype': '','vec': '[3:0]'}],
+            [{'name': 'i','datatype': 'integer','length': 1}],'i = x;\n')])) == str(module))
+    assert('    input [3:0] x\n);\n    integer i;\nbegin\n    i = x;\nend\nendtask\n' in str(module))
+
+def test_nested_blocks():
+    ''' nested blocks are indented once per level and empty bodies are allowed '''
+    node = Statement('x = 1;')
+    for i in range(300):
+        node = Block('begin\n',[node],'end\n')
+    lines = render(node).splitlines()
+    assert(len(lines) == 601 and lines[300] == 300*4*' '+'x = 1;')
+    assert('task t ();\nbegin\nend\nendtask\n' in vlog_task('t',[],[]))
+    assert('\tinput integer x\n);\nbegin\n\ty = x;\nend\nendfunction\n' in
+        vlog_function('f','[0:0]',[{'name': 'x','io': 'input','datatype': 'integer','vec': ''}],[],'y = x;\n',tab='\t'))
+
+def test_write_file_if_changed(tmp_path,monkeypatch):
+    ''' files are only replaced if changed and errors are not hidden by the cleanup '''
+    f = tmp_path / 'a.v'
+    assert(write_file_if_changed(f,['module a;\n','endmodule\n']) and not write_file_if_changed(f,['module a;\nendmodule\n']))
+    def chunks():
+        yield 'x'
+        raise RuntimeError('generator failed')
+    with pytest.raises(RuntimeError):
+        write_file_if_changed(f,chunks())
+    def no_space(*args,**kwargs):
+        raise OSError(28,'No space left on device')
+    monkeypatch.setattr('pysilicon.file_gen.open',no_space,raising=False)
+    with pytest.raises(OSError,match='No space'):
+        write_file_if_changed(f,['x'])
+    monkeypatch.undo()
+    assert(f.read_text() == 'module a;\nendmodule\n' and [p.name for p in tmp_path.iterdir()] == ['a.v'])
@@ -39,3 +39,19 @@ def test_gen_mod(monkeypatch):
     monkeypatch.setattr('builtins.input',fake_input)
     ps.gen_mod_action()
     assert(Popen("doit",shell=True).wait() == 0)
+
+def test_gen_mod_batch(tmp_path,ps_stub):
+    ''' manifest generates all modules (with template overrides) and reruns keep existing files '''
+    (tmp_path / 'custom.sdc').write_text('# sdc of {{top_module}} ({{clock}})\n')
+    (tmp_path / 'mods.yml').write_text('path: ip\nvars:\n  clock: clk\nmodules:\n'
+        + ''.join(f'  - name: m{i}\n' for i in range(20))
+        + '  - name: special\n    path: other\n    templates:\n      timing.sdc: custom.sdc\n    vars:\n      clock: sclk\n')
+    stub = ps_stub()
+    assert(stub.gen_mod_action(str(tmp_path / 'mods.yml'),4))
+    assert(len(list((tmp_path / 'ip').glob('m*/*'))) == 20*5)
+    assert((tmp_path / 'other/special/timing.sdc').read_text() == '# sdc of special (sclk)')
+    assert('sdc: ip/m3/timing.sdc' in (tmp_path / 'ip/m3/syn.yml').read_text())
+    stub.validate_yaml(tmp_path / 'ip/m3/syn.yml',ps.schemata['syn'])
+    (tmp_path / 'ip/m0/syn.yml').write_text('edited')
+    stub.gen_mod_action(str(tmp_path / 'mods.yml'))
+    assert((tmp_path / 'ip/m0/syn.yml').read_text() == 'edited')
@@ -0,0 +1,84 @@
+import gzip
+from pysilicon.lib_index import LibIndex, scan_file
+
+LIB = '''library (demo_tt) {
+  time_unit : "1ns" ;
+  nom_process : 1 ;
+  nom_voltage : 0.8 ;
+  nom_temperature : 25 ;
+  operating_conditions (tt_0p8v_25c) { process : 1 ; }
+  cell (INVX1) {
+    area : 1.5 ;
+    cell_footprint : "inv" ;
+    pin (A) { direction : input ; capacitance : 0.01 ; }
+    pin (Y) { direction : output ; function : "!A" ;
+      timing () { related_pin : "A" ; cell_rise (tbl) { values ("1, 2") ; } }
+    }
+    test_cell () { pin (A) { direction : input ; } }
+  }
+  cell ("DLY") {
+    area : 4 ;
+    dont_use : true ;
+    pin (A) { direction : input ; }
+    pin (Y) { direction : output ; }
+  }
+}
+'''
+
+LEF = '''VERSION 5.8 ;
+UNITS
+  DATABASE MICRONS 2000 ;
+END UNITS
+SITE core
+  SIZE 0.2 BY 1.4 ;
+END core
+MACRO INVX1
+  CLASS CORE ;
+  SIZE 0.6 BY 1.4 ;
+  SITE core ;
+  PIN A
+    DIRECTION INPUT ;
+  END A
+  PIN Y
+    DIRECTION OUTPUT ;
+  END Y
+END INVX1
+MACRO FILL1
+  CLASS CORE SPACER ;
+  SIZE 0.2 BY 1.4 ;
+END FILL1
+'''
+
+#----------------------------------------------------------
+# Liberty/LEF index tests
+#----------------------------------------------------------
+def test_scan_liberty_and_lef(tmp_path):
+    ''' cells, areas, pins and corner info are extracted from liberty and lef files '''
+    (tmp_path / 'demo.lib').write_text(LIB)
+    lib,inv,dly = scan_file(tmp_path / 'demo.lib')
+    assert(lib['name'] == 'demo_tt' and lib['nom_voltage'] == 0.8 and lib['time_unit'] == '1ns')
+    assert(lib['operating_conditions'] == ['tt_0p8v_25c'] and lib['cells'] == 2)
+    assert(inv == {'kind': 'cell','name': 'INVX1','area': 1.5,'cell_footprint': 'inv','dont_use': False,
+        'pins': {'A': 'input','Y': 'output'}})
+    assert(dly['name'] == 'DLY' and dly['dont_use'])
+    with gzip.open(tmp_path / 'demo.lef.gz','wt') as fp:
+        fp.write(LEF)
+    lef,inv,fill = scan_file(tmp_path / 'demo.lef.gz')
+    assert(lef['dbu_per_micron'] == 2000 and lef['sites'] == ['core'])
+    assert(inv['size'] == [0.6,1.4] and inv['pins'] == {'A': 'input','Y': 'output'} and fill['class'] == 'CORE SPACER')
+
+def test_lib_index(tmp_path):
+    ''' cells of all files are merged and unchanged files are not rescanned '''
+    (tmp_path / 'demo.lib').write_text(LIB)
+    (tmp_path / 'demo.lef').write_text(LEF)
+    files = [tmp_path / 'demo.lib',tmp_path / 'demo.lef']
+    index = LibIndex(tmp_path / 'index.json')
+    assert(len(index.update(files)) == 2)
+    index.save()
+    index = LibIndex(tmp_path / 'index.json')
+    assert(index.update(files) == [])
+    assert(index.cell_names() == ['DLY','FILL1','INVX1'] and index.cell_names(dont_use=False) == ['FILL1','INVX1'])
+    assert(index.area('INVX1') == 1.5 and abs(index.area('FILL1')-0.28) < 1e-9)
+    assert(index.cell('INVX1')['size'] == [0.6,1.4] and index.cell('INVX1')['libs'] == [str(files[0])])
+    assert(index.missing(['INVX1','NAND9']) == ['NAND9'])
+    assert([lib['name'] for lib in index.libraries()] == ['demo_tt'])
@@ -0,0 +1,66 @@
+import io
+import gzip
+from pysilicon.netlist import NetlistIndex, scan_netlist, iter_blocks
+
+NETLIST = '''// Generated by Genus(TM) Synthesis Solution, /* is not a comment here
+/* block comment; with a
+   semicolon module fake ( */
+module sub(a, y);
+  input [1:0] a;
+  output y;
+  wire n1;
+  NAND2X1 g1(.A(a[0]), .B(a[1]), .Y(n1));
+  INVX1 \\u_module/*inv//x (.A(n1), .Y(y));
+endmodule
+
+module top(clk, d, q);
+  input clk, d;
+  output q;
+  wire [1:0] w;
+  assign w = {d, d};
+  DFFX1 q_reg(.CK(clk), .D(d), .Q(q));
+  sub u0(.a(w), .y());
+  sub #(.W(8), .D((2))) u1 (.a(w), .y());
+  SRAM16 mem (.CK(clk));
+  and g2 (w[0], d, clk);
+endmodule
+'''
+
+#----------------------------------------------------------
+# Netlist tests
+#----------------------------------------------------------
+def test_scan_netlist(tmp_path):
+    ''' module cell counts do not depend on the chunking and gzipped netlists are read '''
+    modules = scan_netlist(io.BytesIO(NETLIST.encode()))
+    assert(modules == [
+        {'kind': 'module','name': 'sub','cells': {'NAND2X1': 1,'INVX1': 1}},
+        {'kind': 'module','name': 'top','cells': {'DFFX1': 1,'sub': 2,'SRAM16': 1}}])
+    for chunk_size in (7,64,100):
+        assert(scan_netlist(io.BytesIO(NETLIST.encode()),chunk_size) == modules)
+    with gzip.open(tmp_path / 'top.v.gz','wt') as fp:
+        fp.write(NETLIST)
+    index = NetlistIndex(tmp_path / 'index.json')
+    index.update([tmp_path / 'top.v.gz'])
+    assert(index.tops() == ['top'] and index.leaf_cells('top') == {'DFFX1': 1,'NAND2X1': 2,'INVX1': 2,'SRAM16': 1})
+    assert(index.unresolved({'NAND2X1','INVX1','DFFX1'}) == {'SRAM16': ['top']})
+
+def test_block_size():
+    ''' "/*" in line comments does not make blocks grow, block comments may span chunks '''
+    body = ''.join(f'  INVX1 g{i} (.A(a), .Y(y));\n' for i in range(2500))
+    netlist = f'// copied from a /* style note\nmodule m(a, y);\n{body}/* long\n{body}*/\nendmodule\n'.encode()
+    blocks = list(iter_blocks(io.BytesIO(netlist),4096))
+    assert(len(blocks) > 15 and max(len(b) for b in blocks) < 2*4096)
+    assert(scan_netlist(io.BytesIO(netlist),4096) == [{'kind': 'module','name': 'm','cells': {'INVX1': 2500}}])
+
+def test_check_netlists(tmp_path,ps_stub):
+    ''' gate level sims do not start if cells are missing from the std cell rtl '''
+    (tmp_path / 'top.v').write_text(NETLIST)
+    (tmp_path / 'cells.v').write_text('module NAND2X1(A,B,Y); endmodule\nmodule INVX1(A,Y); endmodule\n'
+        '`celldefine\nmodule DFFX1(CK,D,Q); endmodule\n`endcelldefine\n')
+    (tmp_path / 'sram.v').write_text('module SRAM16(CK); endmodule\n')
+    ps = ps_stub()
+    netlists,models = [tmp_path / 'top.v'],[tmp_path / 'cells.v']
+    assert(not ps.check_netlists(netlists,models,None,'sim_syn_top'))
+    assert(ps.check_netlists(netlists,models,[f'-v {tmp_path / "sram.v"}'],'sim_syn_top'))
+    assert(ps.check_netlists(netlists,models,['-y libs'],'sim_syn_top'))
+    assert(ps.check_netlists([],[],None,'sim_syn_top'))
@@ -0,0 +1,171 @@
+import yaml
+import pytest
+from pathlib import Path
+from pysilicon.scan_generator import ScanGenerator, ScanConfigError, main, translate_cfg, find_cfg_files
+
+test_dir = Path(__file__).resolve().parent
+test_config = test_dir / 'test_scan.yml'
+
+#----------------------------------------------------------
+# Scan generator tests
+#----------------------------------------------------------
+def load_test_config():
+    with open(test_config,'r') as fp:
+        return yaml.load(fp,Loader=yaml.SafeLoader)
+
+def test_layout():
+    ''' cells are evaluated and laid out back to back '''
+    sg = ScanGenerator(test_config)
+    assert(sg.full_width == 104)
+    assert([(c['min_pos'],c['max_pos']) for c in sg.config['cells']] == [(0,41),(42,86),(87,87),(88,103)])
+    defines = ''.join(sg.emit('defines'))
+    assert('`define test_scan_chain_ScanChainLength 104' in defines)
+    assert('`define test_scan_chain_test0_idx(n) (n * 6 + 0) +: 6' in defines)
+
+def test_render(tmp_path):
+    ''' dict configs and options are accepted and only requested outputs are written '''
+    sg = ScanGenerator(load_test_config(),read_write=True,prefix='X',bypass=True)
+    paths = sg.render(out_dir=tmp_path)
+    assert([p.name for p in paths] == ['test_scan_chain.v','test_scan_chain_defines.v',
+        'test_scan_chain_bypass_core.v','test_scan_chain_bypass.v'])
+    assert('ScanBitsWr[`X_test1]' in (tmp_path / 'test_scan_chain.v').read_text())
+    assert(len(sg.render(['defines'],tmp_path / 'defines')) == 1)
+
+def test_invalid_config():
+    ''' invalid configs raise instead of exiting '''
+    config = load_test_config()
+    config['cells'].append(dict(config['cells'][0]))
+    with pytest.raises(ScanConfigError):
+        ScanGenerator(config)
+    config['cells'].pop()
+    config['cells'][0]['width'] = 'undefined_param'
+    with pytest.raises(ScanConfigError):
+        ScanGenerator(config)
+
+def test_cli_batch(tmp_path):
+    ''' several configs are generated by one scan_gen call '''
+    config = load_test_config()
+    for i in range(3):
+        config['name'] = f'chain{i}'
+        with open(tmp_path / f'chain{i}.yml','w') as fp:
+            yaml.dump(config,fp)
+    main([str(tmp_path / f'chain{i}.yml') for i in range(3)]+['-o',str(tmp_path / 'out'),'-j','2'])
+    assert(sorted(p.name for p in (tmp_path / 'out').glob('*.v')) ==
+        sorted([f'chain{i}.v' for i in range(3)]+[f'chain{i}_defines.v' for i in range(3)]))
+
+def test_scan_tasks():
+    ''' scan tasks are sized to the chain instead of a fixed 4096 bits '''
+    tasks = ''.join(ScanGenerator(test_config,prefix='X',scan_tasks=True).emit('scan_tasks'))
+    assert('input [`X_ScanChainLength-1:0] scan_in_data' in tasks)
+    assert('reg [`X_ScanChainLength-1:0] scan_in_mem [0:`X_ScanVecDepth-1];' in tasks)
+    assert('$readmemh(in_fname,scan_in_mem);' in tasks and '4095' not in tasks)
+
+def test_parallel_chains():
+    ''' cells are split into balanced chains that each occupy a contiguous ScanBits range '''
+    sg = ScanGenerator(test_config,chains=2,scan_tasks=True)
+    assert([c['length'] for c in sg.chains] == [46,58])
+    assert([(c['sin'],c['sout']) for c in sg.config['cells'] if c['sin'].startswith('SIn')] ==
+        [('SIn[0]','test_scan_chain_test1_to_test_scan_chain_test2'),('SIn[1]','test_scan_chain_test0_to_test_scan_chain_test3')])
+    defines = ''.join(sg.emit('defines'))
+    assert('`define test_scan_chain_MaxChainLength 58' in defines and '`define test_scan_chain_Chain1 103:46' in defines)
+    assert('i < `test_scan_chain_MaxChainLength' in ''.join(sg.emit('scan_tasks')))
+    with pytest.raises(ScanConfigError):
+        ScanGenerator(test_config,chains=5)
+
+def test_sections():
+    ''' sections get a SIB cell, gated shift enable and a scan out mux '''
+    config = load_test_config()
+    config['cells'][1]['section'] = 'sec'
+    config['cells'][2]['section'] = 'sec'
+    sg = ScanGenerator(config,scan_tasks=True,chains=2)
+    assert([c['name'] for c in sg.config['cells']] == ['sec_SIB','test1','test2','test0','test3'])
+    assert(sg.active_length() == 58 and sg.active_length(chain=0) == 1 and sg.active_length(['sec'],0) == 47)
+    src = ''.join(sg.emit('src'))
+    assert('assign test_scan_chain_sec_SEnable = SEnable & ScanBits[`test_scan_chain_sec_SIB];' in src)
+    assert('assign SOut[0] = ScanBits[`test_scan_chain_sec_SIB] ? test_scan_chain_sec_SegmentOut' in src)
+    assert('`define test_scan_chain_sec_SectionLength 46' in ''.join(sg.emit('defines')))
+    tasks = ''.join(sg.emit('scan_tasks'))
+    assert('function integer test_scan_chain_active_length' in tasks)
+    # Parallel chains get the sections task as well (only chain 0 holds the section)
+    assert('task scan_test_scan_chain_sections (' in tasks and 'len1 = `test_scan_chain_Chain1Length;\n' in tasks)
+    assert('len0 = `test_scan_chain_Chain0Length - (sections[`test_scan_chain_sec_SectionIdx] ? 0 : `test_scan_chain_sec_SectionLength);' in tasks)
+    config['cells'][2]['section'] = 'other'
+    config['cells'][3]['section'] = 'sec'
+    with pytest.raises(ScanConfigError):
+        ScanGenerator(config)
+
+def test_incremental_render(tmp_path):
+    ''' unchanged outputs are skipped and only files with new contents are replaced '''
+    assert(len(ScanGenerator(test_config).render(out_dir=tmp_path)) == 2)
+    src = tmp_path / 'test_scan_chain.v'
+    mtime = src.stat().st_mtime_ns
+    sg = ScanGenerator(test_config)
+    assert(sg.render(out_dir=tmp_path) == [] and len(sg.unchanged) == 2)
+    assert(sg.render(out_dir=tmp_path,force=True) == [] and src.stat().st_mtime_ns == mtime)
+    src.write_text('edited')
+    assert(ScanGenerator(test_config).render(out_dir=tmp_path) == [src])
+    assert(ScanGenerator(test_config,read_write=True).render(out_dir=tmp_path) == [src])
+
+def test_subchains(tmp_path):
+    ''' sub-chains are instantiated mult times, generated once and flattened for the codec '''
+    sub = load_test_config()
+    with open(tmp_path / 'sub.yml','w') as fp:
+        yaml.dump(sub,fp)
+    top = {'name': 'top','parameters': {'n': 3},'cells': [
+        {'name': 'ctrl','width': 2,'mult': 1,'R/W': 'W'},
+        {'name': 'blk','subchain': 'sub.yml','mult': 'n'},
+        {'name': 'spare','subchain': str(tmp_path / 'sub.yml'),'mult': 1}]}
+    with open(tmp_path / 'top.yml','w') as fp:
+        yaml.dump(top,fp)
+    sg = ScanGenerator(tmp_path / 'top.yml')
+    assert(sg.full_width == 2+4*104 and sg.subchains['blk'] is sg.subchains['spare'])
+    # Mixed sub-chains stay writable, read only sub-chains are read cells
+    assert(sg.config['cells'][1]['R/W'] == 'W')
+    ro = dict(sub,name='ro_chain',cells=[dict(c,**{'R/W': 'R'}) for c in sub['cells']])
+    with open(tmp_path / 'ro.yml','w') as fp:
+        yaml.dump(ro,fp)
+    assert(ScanGenerator({'name': 'top_ro','parameters': {},'cells': [{'name': 'ro','subchain': str(tmp_path / 'ro.yml'),'mult': 1}]})
+        .config['cells'][0]['R/W'] == 'R')
+    fields = [f for f in sg.layout_fields() if f['name'] == 'blk[2].test3']
+    assert(fields[0]['min_pos'] == 2+2*104+88)
+    assert([p.name for p in sg.render(out_dir=tmp_path / 'out')] ==
+        ['top.v','top_defines.v','test_scan_chain.v','test_scan_chain_defines.v'])
+    src = (tmp_path / 'out' / 'top.v').read_text()
+    assert(') top_blk_2 (' in src and '.ScanBits(ScanBits[210 +: 104])' in src)
+    assert('`define top_blk_test3_idx(n,m) (`top_blk_Base(n) + m * 16 + 88) +: 16' in (tmp_path / 'out' / 'top_defines.v').read_text())
+    sub['cells'].append({'name': 'loop','subchain': 'sub.yml','mult': 1})
+    with open(tmp_path / 'sub.yml','w') as fp:
+        yaml.dump(sub,fp)
+    with pytest.raises(ScanConfigError):
+        ScanGenerator(tmp_path / 'top.yml')
+
+def test_bypass_table(tmp_path):
+    ''' table driven bypass core has a fixed set of tasks and a row per cell '''
+    sg = ScanGenerator(test_config,bypass=True,bypass_table=True)
+    paths = sg.render(out_dir=tmp_path)
+    assert(paths[-1].name == 'test_scan_chain_bypass_table.hex')
+    assert(paths[-1].read_text().splitlines()[2] == '0000002a0000002d0000000100000001')
+    core = (tmp_path / 'test_scan_chain_bypass_core.v').read_text()
+    assert(core.count('endtask') == 2 and 'task set_cell' in core and 'task get_cell' in core)
+    # Read only cells are not written
+    assert('read only",id);\n    else\n        for (i = 0; i < width; i = i + 1) ScanBits[offset+i] = in[i];' in core)
+    assert('`define test_scan_chain_test3_Id 3' in (tmp_path / 'test_scan_chain_defines.v').read_text())
+    core = ''.join(ScanGenerator(test_config,bypass=True,bypass_table=True,bypass_wrappers=True).emit('bypass_core'))
+    assert(core.count('endtask') == 2+6 and 'set_cell(`test_scan_chain_test1_Id,0,in);' in core)
+
+def test_translate_cfg_batch(tmp_path):
+    ''' legacy cfg trees are translated in parallel and up to date outputs are skipped '''
+    cfg = 'Name = legacy\n$param{"W"} = 8;\nctrl W $param{"W"} 1\nstatus R 4 2\n'
+    config = yaml.safe_load(translate_cfg(cfg))
+    assert(config['name'] == 'legacy' and config['parameters'] == {'W': 8})
+    assert(config['cells'][0] == {'name': 'ctrl','R/W': 'W','width': 'W','mult': 1})
+    for sub in ('a','a/b'):
+        (tmp_path / 'cfg' / sub).mkdir(parents=True)
+        (tmp_path / 'cfg' / sub / 'chain.cfg').write_text(cfg)
+    out = tmp_path / 'out'
+    assert([y for c,y in find_cfg_files([tmp_path / 'cfg'],out)] == [out / 'a' / 'chain.yml',out / 'a' / 'b' / 'chain.yml'])
+    main(['-c',str(tmp_path / 'cfg'),'-o',str(out),'-j','2'])
+    mtime = (out / 'a' / 'b' / 'chain.yml').stat().st_mtime_ns
+    main(['-c',str(tmp_path / 'cfg'),'-o',str(out)])
+    assert((out / 'a' / 'b' / 'chain.yml').stat().st_mtime_ns == mtime)
+    assert(ScanGenerator(out / 'a' / 'chain.yml').full_width == 16)
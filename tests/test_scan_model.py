@@ -0,0 +1,59 @@
+import yaml
+import numpy as np
+from pathlib import Path
+from pysilicon.scan_generator import ScanGenerator
+
+test_dir = Path(__file__).resolve().parent
+
+#----------------------------------------------------------
+# Scan chain model tests
+#----------------------------------------------------------
+def load_test_config():
+    with open(test_dir / 'test_scan.yml','r') as fp:
+        return yaml.load(fp,Loader=yaml.SafeLoader)
+
+def test_scan_update_capture():
+    ''' write cells take scanned values on update and read cells are shifted out '''
+    sg = ScanGenerator(test_dir / 'test_scan.yml',chains=2)
+    model = sg.model()
+    codec = model.codec
+    model.set_read({'test0': np.arange(7)[None,:],'test3': 0xbeef})
+    vectors = codec.encode({'test1': [0x1234,0x777],'test2': [1,0]})
+    out = model.scan_vectors(vectors)
+    assert(codec.decode(out[1:],['test1'])['test1'][0] == 0x1234)
+    assert(all(codec.decode(out,['test3'])['test3'] == 0xbeef))
+    bits = np.packbits(model.scan_bits(),bitorder='little')
+    assert(codec.decode(bits[None,:],['test1'])['test1'][0] == 0x777)
+    assert(model.cycles == 2*max(c['length'] for c in sg.chains))
+
+def test_two_phase_matches_shift():
+    ''' bit level SClkP/SClkN clocking gives the same result as a bulk shift '''
+    sg = ScanGenerator(test_dir / 'test_scan.yml')
+    bits = np.random.default_rng(1).integers(0,2,300,dtype=np.uint8)
+    bulk,phased = sg.model(),sg.model()
+    out = bulk.shift(bits)
+    phased_out = []
+    for b in bits:
+        phased_out.append(phased.s_out()[0])
+        phased.phase_p([b])
+        assert(phased.s_out()[0] == phased_out[-1])
+        phased.phase_n()
+    assert(np.array_equal(out,phased_out) and np.array_equal(bulk.shift_bits,phased.shift_bits))
+
+def test_sections_and_check(tmp_path):
+    ''' deselected sections are skipped and simulation output is diffed against the model '''
+    config = load_test_config()
+    config['cells'][1]['section'] = 'sec'
+    sg = ScanGenerator(config)
+    model = sg.model()
+    assert(len(model.active()) == sg.active_length())
+    vectors = model.codec.encode({'sec_SIB': [1,0,0],'test1': [5,6,7]})
+    model.scan(vectors[0],capture=False)
+    assert(model.selected() == ['sec'] and len(model.active()) == sg.active_length(['sec']))
+    model.reset()
+    sim_out = model.scan_vectors(vectors)
+    model.codec.write_hex(tmp_path / 'in.hex',vectors)
+    sim_out[2,0] ^= 1
+    model.codec.write_hex(tmp_path / 'out.hex',sim_out)
+    model.reset()
+    assert(list(model.check(tmp_path / 'in.hex',tmp_path / 'out.hex')) == [2])
@@ -0,0 +1,46 @@
+import os
+import json
+import threading
+from pathlib import Path
+
+#----------------------------------------------------------
+# Scratch directory tests
+#----------------------------------------------------------
+def test_parallel_scratch_dirs(tmp_path,ps_stub):
+    ''' parallel tasks get their own run dir, log and consistent symlinks '''
+    ps = ps_stub()
+    exp_dirs = []
+    def task(i):
+        exp_dir = ps.create_scratch_dir('sim_rtl','blk')
+        with ps.task_log(exp_dir):
+            ps.logger.info(f'task {i}')
+        exp_dirs.append(exp_dir)
+    threads = [threading.Thread(target=task,args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert(len(set(exp_dirs)) == 16)
+    assert(sorted((d / 'dodo.log').read_text() for d in exp_dirs) ==
+        sorted(f'task {i}\n' for i in range(16)))
+    assert(Path(os.readlink(tmp_path / 'build')) == ps.prj_scratch_dir)
+    assert((ps.prj_scratch_dir / 'sim_rtl' / 'blk' / 'current').resolve() in exp_dirs)
+    assert([p.name for p in (ps.prj_scratch_dir / 'sim_rtl' / 'blk').iterdir() if p.name.startswith('.')] == [])
+
+def test_publish_syn(tmp_path,ps_stub):
+    ''' syn results are copied to stable paths with a manifest (missing outputs publish nothing) '''
+    ps = ps_stub()
+    (tmp_path / 'blk.v').write_text('module blk; endmodule\n')
+    (tmp_path / 'timing.sdc').write_text('')
+    config = {'name': 'blk_syn','top': 'blk','sdc': 'timing.sdc','hdl_files': [tmp_path / 'blk.v']}
+    exp_dir = ps.create_scratch_dir('syn','blk_syn')
+    for f in ('blk.mapped.v','constraints.sdc'):
+        (exp_dir / f).write_text(f)
+    assert(not ps.publish_syn(config,exp_dir))
+    (exp_dir / 'blk.sdf').write_text('sdf')
+    assert(ps.publish_syn(config,exp_dir))
+    artifacts = ps.syn_artifacts(config)
+    assert(artifacts['netlist'] == ps.prj_scratch_dir / 'syn' / 'blk_syn' / 'published' / 'blk.mapped.v')
+    assert(artifacts['netlist'].read_text() == 'blk.mapped.v')
+    manifest = json.loads(artifacts['manifest'].read_text())
+    assert(manifest['run_dir'] == str(exp_dir) and list(manifest['inputs']) == [str(tmp_path / 'blk.v'),str(tmp_path / 'timing.sdc')])
@@ -0,0 +1,58 @@
+import os
+import shutil
+from pysilicon.run_snapshot import SnapshotStore, read_manifest, substitute
+
+#----------------------------------------------------------
+# Run snapshot tests
+#----------------------------------------------------------
+def test_snapshot_dedup(tmp_path):
+    ''' unchanged inputs of later runs are hardlinks of one stored object, large files are only hashed '''
+    rtl,lib = tmp_path / 'a.v',tmp_path / 'big.lib'
+    rtl.write_text('module a; endmodule\n')
+    lib.write_text('library (x) { }\n'*100)
+    store = SnapshotStore(tmp_path / 'objects',max_copy_size=1000)
+    run0 = store.snapshot([rtl,lib],tmp_path / 'run0',tmp_path)
+    run1 = store.snapshot([rtl,lib],tmp_path / 'run1',tmp_path)
+    assert(run0 == run1 and run0[str(lib)]['snapshot'] is None)
+    assert(os.stat(tmp_path / 'run0/a.v').st_ino == os.stat(tmp_path / 'run1/a.v').st_ino)
+    rtl.write_text('module a(input x); endmodule\n')
+    run2 = store.snapshot([rtl],tmp_path / 'run2',tmp_path)
+    assert(run2[str(rtl)]['sha1'] != run0[str(rtl)]['sha1'])
+    assert((tmp_path / 'run0/a.v').read_text() == 'module a; endmodule\n')
+    assert(substitute('x /a/b /a/bc',{'/a/b': '/n','/a/bc': '/m'}) == 'x /n /m')
+
+def test_snapshot_gc(tmp_path,ps_stub):
+    ''' objects are deleted once every run dir linking them was cleaned '''
+    rtl,other = tmp_path / 'a.v',tmp_path / 'b.v'
+    rtl.write_text('module a; endmodule\n')
+    other.write_text('module b; endmodule\n')
+    ps = ps_stub()
+    store = SnapshotStore(ps.prj_scratch_dir / 'objects')
+    run0 = store.snapshot([rtl,other],tmp_path / 'run0',tmp_path)
+    store.snapshot([rtl],tmp_path / 'run1',tmp_path)
+    shutil.rmtree(tmp_path / 'run0')
+    ps.gc_snapshots_action()
+    assert(store.object_path(run0[str(rtl)]['sha1']).exists() and not store.object_path(run0[str(other)]['sha1']).exists())
+    shutil.rmtree(tmp_path / 'run1')
+    assert(store.gc() == (1,len('module a; endmodule\n')) and list((store.root / 'objects').iterdir()) == [])
+
+def test_rerun(tmp_path,ps_stub):
+    ''' rerun executes the recorded command on the snapshot even after the sources changed '''
+    rtl = tmp_path / 'a.v'
+    rtl.write_text('module a; endmodule\n')
+    ps = ps_stub()
+    ps.snapshots = SnapshotStore(ps.prj_scratch_dir / 'objects')
+    commands = []
+    ps.shell = lambda command: commands.append(command) or 0
+    run_dir = ps.prj_scratch_dir / 'sim_rtl' / 'a' / 'run0'
+    run_dir.mkdir(parents=True)
+    (run_dir / 'sim.tcl').write_text(f'source {rtl}\nrun\n')
+    ps.snapshot_run(run_dir,'sim_rtl:a',[rtl],f'cd {run_dir}; xrun {rtl} -input {run_dir / "sim.tcl"}',['sim.tcl'])
+    rtl.write_text('module b; endmodule\n')
+    assert(ps.rerun_action(str(run_dir)))
+    new_dir = ps.prj_scratch_dir / 'sim_rtl' / 'a' / 'current'
+    snap = new_dir.resolve() / 'inputs' / 'a.v'
+    assert(commands == [f'cd {new_dir.resolve()}; xrun {snap} -input {new_dir.resolve() / "sim.tcl"}'])
+    assert(snap.read_text() == 'module a; endmodule\n')
+    assert((new_dir / 'sim.tcl').read_text() == f'source {snap}\nrun\n')
+    assert(read_manifest(new_dir)['rerun_of'] == str(run_dir))
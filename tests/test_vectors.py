@@ -0,0 +1,66 @@
+import numpy as np
+from pysilicon.vectors import VectorBench, iter_vectors, chunk_fname
+
+PORTS = [
+    {'name': 'clk','io': 'input','datatype': 'wire','vec': None},
+    {'name': 'rst_n','io': 'input','datatype': 'wire','vec': None},
+    {'name': 'a','io': 'input','datatype': 'wire','vec': '[WIDTH-1:0]'},
+    {'name': 'b','io': 'input','datatype': 'wire','vec': None},
+    {'name': 'y','io': 'output','datatype': 'reg','vec': '[WIDTH:0]'},
+    {'name': 'v','io': 'output','datatype': 'wire','vec': None},
+]
+
+#----------------------------------------------------------
+# Vector file tests
+#----------------------------------------------------------
+def bench():
+    return VectorBench('adder_vectors',PORTS,[{'param': 'WIDTH','value': 8}],ignore=['rst_n'],depth=100)
+
+def test_stream_and_module(tmp_path):
+    ''' batches and generator rows are streamed into depth sized chunks that the generated module reads '''
+    vb = bench()
+    assert([(p['name'],p['width']) for p in vb.stim_ports] == [('a',8),('b',1)] and vb.resp_codec.length == 10)
+    with vb.stimulus_writer(tmp_path / 'stim') as w:
+        w.write({'a': np.arange(150) % 256,'b': 1})
+        w.write_rows({'a': i,'b': 0} for i in range(100))
+    assert(w.count == 250 and [len(open(chunk_fname(tmp_path / 'stim',k)).readlines()) for k in range(3)] == [100,100,50])
+    assert(open(chunk_fname(tmp_path / 'stim',0)).readline() == '100\n')
+    vectors = np.concatenate(list(iter_vectors(vb.stim_codec,tmp_path / 'stim')))
+    assert(vb.stim_codec.decode(vectors)['a'].tolist() == list(range(150))+list(range(100)))
+    fstr = str(vb.module())
+    assert('output reg [7:0] a,' in fstr and 'input wire [8:0] y,' in fstr and 'rst_n' not in fstr)
+    assert('{b,a} = stim_mem[g % DEPTH];' in fstr and 'resp_mem[(g-1) % DEPTH] = {v,y};' in fstr)
+    assert(vb.write_module(tmp_path / 'adder_vectors.v') and not vb.write_module(tmp_path / 'adder_vectors.v'))
+
+def test_compare(tmp_path):
+    ''' responses are compared per port with latency, masks and x bits '''
+    vb = bench()
+    a = np.arange(250) % 256
+    with vb.expected_writer(tmp_path / 'exp') as w:
+        w.write({'y': a+1,'v': 1})
+    with vb.expected_writer(tmp_path / 'resp') as w:
+        # One cycle of latency, two bad y values and one x
+        y = np.concatenate([[0],a+1])
+        y[[10,200]] ^= 0x100
+        w.write({'y': y,'v': 1})
+    lines = chunk_fname(tmp_path / 'resp',0).read_bytes().splitlines(True)
+    lines[51] = b'2x' + lines[51][2:]
+    chunk_fname(tmp_path / 'resp',0).write_bytes(b''.join(lines))
+    report = vb.compare(tmp_path / 'exp',tmp_path / 'resp',latency=1)
+    assert(report['vectors'] == 250 and report['failed'] == 3 and report['ports'] == {'y': 3,'v': 0})
+    assert([r[:2] for r in report['first']] == [(9,'y'),(50,'y'),(199,'y')] and report['first'][0][2:] == (10,266))
+    # Bad MSBs are masked, the x in y[7:4] is not
+    report = vb.compare(tmp_path / 'exp',tmp_path / 'resp',masks={'y': 0xff},latency=1)
+    assert(report['failed'] == 1 and report['first'][0][:2] == (50,'y'))
+    assert(vb.compare(tmp_path / 'exp',tmp_path / 'resp')['failed'] == 250)
+    # Responses of a sim that stopped early fail, mismatching ports are reported until max_report is reached
+    with vb.expected_writer(tmp_path / 'short') as w:
+        w.write({'y': y[:100] ^ 1,'v': 0})
+    report = vb.compare(tmp_path / 'exp',tmp_path / 'short',latency=1,max_report=3)
+    assert(report['vectors'] == 250 and report['missing'] == 151 and report['failed'] == 250)
+    assert([r[:2] for r in report['first']] == [(0,'y'),(0,'v'),(1,'y')])
+    # Missing response files count as no (more) responses
+    assert(vb.compare(tmp_path / 'exp',tmp_path / 'none')['missing'] == 250)
+    chunk_fname(tmp_path / 'short',0).unlink()
+    report = vb.compare(tmp_path / 'exp',tmp_path / 'short')
+    assert(report['vectors'] == 250 and report['missing'] == 250 and report['failed'] == 250)
@@ -0,0 +1,37 @@
+from pathlib import Path
+from pysilicon.vlog_index import VlogIndex
+from pysilicon.file_gen import vlog_mod_inst
+
+test_dir = Path(__file__).resolve().parent
+
+#----------------------------------------------------------
+# Module interface index tests
+#----------------------------------------------------------
+def test_index_lookup(tmp_path):
+    ''' ports and parameters of test modules are indexed and usable for instantiation '''
+    index = VlogIndex(tmp_path / 'index.json')
+    files = [test_dir / 'test_module_0.v',test_dir / 'test_module_1.v']
+    assert(len(index.update(files)) == 2)
+    assert([p['name'] for p in index.ports('test_module_0')] == ['i_clk','i_rst_n','i_d','o_q'])
+    assert(index.ports('test_module_0')[2]['vec'] == '[WIDTH-1:0]')
+    assert(index.parameters('test_module_0') == [{'param': 'WIDTH','value': '10'}])
+    inst = vlog_mod_inst('test_module_0','dut',index.inst_params('test_module_0'),
+        index.inst_ports('test_module_0',{'i_clk': 'clk'}))
+    assert('.i_clk(clk)' in inst and '.WIDTH(10)' in inst)
+
+def test_index_incremental(tmp_path):
+    ''' only changed files are parsed again '''
+    src = tmp_path / 'a.v'
+    src.write_text('module a (input wire x, output wire y);\nendmodule\n')
+    index = VlogIndex(tmp_path / 'index.json')
+    index.update([src])
+    index.save()
+    index = VlogIndex(tmp_path / 'index.json')
+    assert(index.update([src]) == [])
+    assert(index.module('a') is not None)
+    src.write_text('module a (input wire x, input wire z);\nendmodule\n')
+    assert(index.update([src]) == [str(src.resolve())])
+    assert([p['name'] for p in index.ports('a')] == ['x','z'])
+    # Deleted files are dropped even without pruning
+    src.unlink()
+    assert(index.update([src],prune=False) == [] and index.module('a') is None)
@@ -0,0 +1,62 @@
+import sys
+import time
+import threading
+import pytest
+from pysilicon.dodo_utility import PySilicon
+from pysilicon.watch import Watcher, SimWatch
+
+#----------------------------------------------------------
+# Watch mode tests
+#----------------------------------------------------------
+def write_task(tmp_path,name,rtl):
+    d = tmp_path / 'blocks' / name
+    d.mkdir(parents=True,exist_ok=True)
+    (d / 'sim_rtl.yml').write_text(f'name: {name}\ntestbench: {name}_tb\ntcl_template:\n'
+        f'filelist:\n  defines_src:\n  rtl_src:\n  - {rtl}\n  test_src:\nsim_flags:\n')
+    return str((d / 'sim_rtl.yml').resolve())
+
+def test_affected_sims(tmp_path,monkeypatch,ps_stub):
+    ''' only sims whose hdl or task files changed (or new sims) are rerun '''
+    files = [tmp_path / 'a.v',tmp_path / 'b.v']
+    for f in files:
+        f.write_text('module m; endmodule\n')
+    ps = ps_stub(task_dirs=['blocks'],syn_configs={},
+        filelist={'defines_src': [],'rtl_src': [f.resolve() for f in files],'test_src': []})
+    tasks = [write_task(tmp_path,'blk0',files[0]),write_task(tmp_path,'blk1',files[1])]
+    sw = SimWatch(ps,watcher=Watcher(0.01,0.01,poll=True))
+    files[0].write_text('module m2; endmodule\n')
+    changed,woke = sw.watcher.wait()
+    assert(changed == {str(files[0])} and sw.affected(changed) == [('rtl',tasks[0])])
+    tasks.append(write_task(tmp_path,'blk2',files[1]))
+    assert(sw.affected(sw.watcher.wait()[0]) == [('rtl',tasks[2])])
+    (tmp_path / 'blocks' / 'blk1' / 'sim_rtl.yml').write_text('name: broken\n')
+    assert(sw.affected(sw.watcher.wait()[0]) == [])
+    # Half edited task file and broken config.yml do not stop watching
+    (tmp_path / 'blocks' / 'blk1' / 'sim_rtl.yml').write_text('name: [broken\n')
+    assert(sw.affected(sw.watcher.wait()[0]) == [])
+    monkeypatch.setattr(PySilicon,'__init__',lambda self: sys.exit(1))
+    (tmp_path / 'config.yml').write_text('broken')
+    files[1].write_text('module m2; endmodule\n')
+    assert(sw.affected(sw.watcher.wait()[0]) == [('rtl',tasks[2])] and sw.ps is ps)
+    ran = []
+    monkeypatch.setattr(ps,'sim_action',lambda sim_type,config: ran.append(config['name']) or config['name'] != 'blk2')
+    assert(sw.run([('rtl',t) for t in (tasks[0],tasks[2])]) == {('rtl',tasks[0]): True,('rtl',tasks[2]): False})
+    assert(sorted(ran) == ['blk0','blk2'])
+
+def test_inotify_debounce(tmp_path):
+    ''' a burst of edits wakes the watcher once and is reported after it settled '''
+    watcher = Watcher(interval=10,debounce=0.2)
+    if watcher.inotify is None:
+        pytest.skip('inotify not available')
+    f = tmp_path / 'a.v'
+    f.write_text('')
+    watcher.watch([f])
+    watcher.changed()
+    def edit():
+        for i in range(5):
+            time.sleep(0.05)
+            f.write_text('x'*(i+1))
+    threading.Thread(target=edit).start()
+    start = time.monotonic()
+    assert(watcher.wait() == ({str(f)},True))
+    assert(f.read_text() == 'xxxxx' and time.monotonic()-start < 5)